@@ -1,123 +1,633 @@
 import re
-import requests
-from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd
+import argparse
+import asyncio
 import time
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from discography_parser import DISCOGRAPHY_COLUMNS, extract_discography
+from discography_planner import PRIORITIES, band_frame, parse_priority, plan
+from http_engine import FetchEngine, FetchError
+from main import CHANGED_BANDS_FILE
+from id_set import IdSet
+from metrics import METRICS, add_metrics_args, report
+from response_cache import ResponseCache
+from storage import DEFAULT_DB, Store
+from work_queue import DEFAULT_QUEUE, WorkQueue
+
+try:
+    from parquet_output import DatasetWriter, letter_category, read_dataset
+except ImportError:  # pyarrow is only needed for --parquet
+    DatasetWriter = letter_category = read_dataset = None
+
+try:
+    from page_archive import PageArchive, iter_segment
+except ImportError:  # zstandard is only needed for --archive and --reextract
+    PageArchive = iter_segment = None
 
 MASTER_DISCO_FILE = "all_bands_discography.csv"
+# Every band written to the master file, including those without albums.
+DONE_BANDS_FILE = "discography_done.csv"
+# Rows per flush when --rescrape rewrites the master file on each flush.
+REPLACE_BATCH_SIZE = 20_000
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 2.0  # requests per second across all workers
+DISCOGRAPHY_URL_RE = re.compile(r"/band/discography/id/(\d+)/")
 
 
-def get_last_processed_band_id():
-    if not os.path.exists(MASTER_DISCO_FILE):
-        return None
-    df = pd.read_csv(MASTER_DISCO_FILE)
-    if df.empty:
-        return None
-    return str(df["Band ID"].iloc[-1])
+def parse_discography(body, band_id):
+    with METRICS.timed_parse("discography"):
+        discography = extract_discography(body, band_id)
+    if discography is None:
+        print(f"No discography table found for Band ID: {band_id}.")
+        return []
+    return discography
 
 
-def extract_discography(soup, band_id):
-    discography = []
-    disco_table = soup.select_one("table.display.discog")
-    if disco_table:
-        rows = disco_table.select("tbody tr")
-        for row in rows:
-            name_element = row.select_one("td a")
-            name = name_element.text.strip() if name_element else "Unknown Album"
+async def scrape_band_page(engine, band_name, band_id):
+    """Discography records of a band, or None when the page could not be fetched.
 
-            type_element = row.select_one("td:nth-child(2)")
-            type_ = type_element.text.strip() if type_element else "Unknown Type"
+    Failed bands are not written anywhere, so they stay pending for the next run.
+    """
+    # Pacing and retry backoff are handled by the engine's rate limiter.
+    base_url = f"https://www.metal-archives.com/band/discography/id/{band_id}/tab/all"
+    try:
+        response = await engine.get(base_url)
+    except FetchError as e:
+        print(f"Failed to retrieve data for {band_name}: {e}")
+        return None
+    if response.status == 200:
+        return parse_discography(response.body, band_id)
+    print(
+        f"Failed to retrieve data for {band_name} (Band ID {band_id}) - Status Code: {response.status}"
+    )
+    return None
 
-            year_element = row.select_one("td:nth-child(3)")
-            year = year_element.text.strip() if year_element else "Unknown Year"
 
-            reviews_element = row.select_one("td:nth-child(4) a")
-            reviews_text = (
-                reviews_element.text.strip() if reviews_element else "No Reviews"
+def check_master_file(path=MASTER_DISCO_FILE):
+    """Refuse to append typed rows to a master file written with the old columns."""
+    if os.path.exists(path):
+        header = pd.read_csv(path, nrows=0).columns.tolist()
+        if header != DISCOGRAPHY_COLUMNS:
+            raise SystemExit(
+                f"{path} has the old columns {header}; rebuild it with --reextract "
+                "--output from a page archive or move it aside to scrape again."
             )
 
-            discography.append([name, type_, year, reviews_text, band_id])
+
+def save_to_master_file(discographies, path=MASTER_DISCO_FILE):
+    df_disco = pd.DataFrame(discographies, columns=DISCOGRAPHY_COLUMNS)
+    # Nullable integers keep counts and years from being written as floats.
+    df_disco = df_disco.astype(
+        {column: "Int64" for column in ["Album ID", "Year", "Review Count", "Band ID"]}
+    )
+    METRICS.rows_written("discography", len(df_disco))
+    if os.path.exists(path):
+        df_disco.to_csv(path, mode="a", header=False, index=False)
     else:
-        print(f"No discography table found for Band ID: {band_id}.")
-    return discography
+        df_disco.to_csv(path, mode="w", header=True, index=False)
+    print(f"Batch of data appended to {path} successfully.")
 
 
-def scrape_band_page(band_name, band_id, retries=3):
-    base_url = f"https://www.metal-archives.com/band/discography/id/{band_id}/tab/all"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-    }
-    for attempt in range(retries):
-        time.sleep(3)
-        response = requests.get(base_url, headers=headers)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, "html.parser")
-            return extract_discography(soup, band_id)
-        else:
-            print(f"Attempt {attempt + 1} failed for Band ID {band_id}. Retrying...")
-            time.sleep(3)
-    print(f"Failed to retrieve data for {band_name} after {retries} attempts.")
-    return []
+def replace_in_master_file(discographies, band_ids, path=MASTER_DISCO_FILE, chunk_size=200_000):
+    """Rewrite ``path`` with the rows of ``band_ids`` replaced by ``discographies``.
+
+    Old rows are copied as text, so the rows kept are written back unchanged.
+    The new file only replaces the old one once it is complete.
+    """
+    if not os.path.exists(path):
+        save_to_master_file(discographies, path)
+        return
+    replaced = IdSet(band_ids)
+    temp_path = path + ".tmp"
+    header = True
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size):
+        keep = ~replaced.contains(chunk["Band ID"])
+        chunk[keep].to_csv(temp_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+    save_to_master_file(discographies, temp_path)
+    os.replace(temp_path, path)
+
+
+def done_file_for(output):
+    """Done-bands file that goes with the discography CSV ``output``."""
+    if os.path.abspath(output) == os.path.abspath(MASTER_DISCO_FILE):
+        return DONE_BANDS_FILE
+    return os.path.splitext(output)[0] + "_done.csv"
+
+
+def save_done_bands(band_ids, path=DONE_BANDS_FILE):
+    pd.DataFrame({"Band ID": band_ids}).to_csv(
+        path, mode="a", header=not os.path.exists(path), index=False
+    )
+
+
+class CsvDiscographyWriter:
+    """Collects per-band results from workers and appends them in batches.
+
+    Bands go to the done file only after their rows reach the master file,
+    so the planner never skips a band whose rows were lost. With ``replace``
+    the old rows of each band are dropped in the same rewrite that adds its
+    new rows, so a band that fails keeps what it had.
+    """
+
+    def __init__(self, batch_size, replace=False):
+        self.batch_size = batch_size
+        self.replace = replace
+        self.rows = []
+        self.band_ids = []
+
+    def add(self, band_id, rows):
+        if rows is None:
+            return
+        self.rows.extend(rows)
+        self.band_ids.append(band_id)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.replace and self.band_ids:
+            replace_in_master_file(self.rows, self.band_ids)
+        elif self.rows:
+            save_to_master_file(self.rows)
+        if self.band_ids:
+            save_done_bands(self.band_ids)
+        self.rows = []
+        self.band_ids = []
+
+
+class StoreDiscographyWriter:
+    """Writes each band's discography to the store as soon as it arrives.
+
+    The store records finished bands itself, so no ordering is needed.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def add(self, band_id, rows):
+        if rows is None:
+            return  # a failed fetch must not replace the stored discography
+        self.store.replace_discography(band_id, rows)
+        METRICS.rows_written("discography", len(rows))
+
+    def flush(self):
+        self.store.flush()
+
+
+class DiscographyDataset:
+    """Discography Parquet output partitioned like the bands dataset.
+
+    Each band's rows go under the letter it was listed under, from
+    ``letters`` (``{band_id: letter}``); bands missing there fall back to
+    the letter of their name.
+    """
+
+    def __init__(self, root, letters):
+        self.writer = DatasetWriter(root, "discography")
+        self.letters = letters
+
+    def add(self, band_id, band_name, rows):
+        if rows is None:
+            return
+        letter = self.letters.get(str(band_id)) or letter_category(band_name)
+        self.writer.add(letter, rows)
+
+    def flush(self):
+        self.writer.flush()
+
+
+def band_letters(frame):
+    """``{band_id: letter}`` for the bands of a band_frame whose listing letter is known."""
+    known = frame[frame["Letter"].notna()]
+    return dict(zip(known["Band ID"].astype(str), known["Letter"].astype(str)))
+
 
+async def discography_worker(engine, queue, writer, parquet=None):
+    while True:
+        item = await queue.get()
+        if item is None:
+            queue.task_done()
+            return
+        band_name, band_id = item
+        discography = await scrape_band_page(engine, band_name, band_id)
+        writer.add(band_id, discography)
+        if parquet is not None:
+            parquet.add(band_id, band_name, discography)
+        METRICS.advance()
+        queue.task_done()
 
-def save_to_master_file(discographies):
-    columns = ["Album Name", "Type", "Year", "Reviews", "Band ID"]
-    df_disco = pd.DataFrame(discographies, columns=columns)
-    if os.path.exists(MASTER_DISCO_FILE):
-        df_disco.to_csv(MASTER_DISCO_FILE, mode="a", header=False, index=False)
+
+def store_band_frame(store):
+    rows = store.iter_bands(("band_id", "name", "status", "letter"))
+    return band_frame(pd.DataFrame(rows, columns=["Band ID", "Name", "Status", "Letter"]))
+
+
+def done_band_ids(store=None):
+    """IDs of the bands whose discography is already in the output."""
+    if store is not None:
+        return IdSet(np.fromiter(store.scraped_band_ids(), dtype=np.int64))
+    done = IdSet()
+    for path in (MASTER_DISCO_FILE, DONE_BANDS_FILE):
+        if os.path.exists(path):
+            done.add(IdSet.from_csv(path, "Band ID").ids)
+    return done
+
+
+def new_band_ids(path):
+    if not os.path.exists(path):
+        print(f"{path} not found; no bands are prioritised as new.")
+        return IdSet()
+    return IdSet.from_csv(path, "Band ID", url_column="URL")
+
+
+async def scrape_discographies(
+    bands,
+    workers,
+    rate,
+    cache=None,
+    store=None,
+    parquet=None,
+    batch_size=500,
+    archive=None,
+    replace=False,
+):
+    if store is not None:
+        writer = StoreDiscographyWriter(store)
+    elif replace:
+        # Every flush rewrites the whole master file, so batch more bands.
+        writer = CsvDiscographyWriter(max(batch_size, REPLACE_BATCH_SIZE), replace=True)
     else:
-        df_disco.to_csv(MASTER_DISCO_FILE, mode="w", header=True, index=False)
-    print(f"Batch of data appended to {MASTER_DISCO_FILE} successfully.")
+        writer = CsvDiscographyWriter(batch_size)
+    queue = asyncio.Queue(maxsize=workers * 2)
+    METRICS.expect(len(bands))
 
+    async with FetchEngine(
+        concurrency=workers, rate=rate, cache=cache, archive=archive
+    ) as engine:
+        tasks = [
+            asyncio.create_task(discography_worker(engine, queue, writer, parquet))
+            for _ in range(workers)
+        ]
+        for band_name, band_id in bands:
+            await queue.put((band_name, band_id))
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
 
-def main():
-    start_time = time.time()
-    bands_df = pd.read_csv("metal_bands.csv", low_memory=False)
+    writer.flush()
+    if parquet is not None:
+        parquet.flush()
 
-    if "Name" not in bands_df.columns or "URL" not in bands_df.columns:
-        print("CSV file is missing 'Name' or 'URL' columns.")
-        return
 
-    last_processed_band_id = get_last_processed_band_id()
-    start_processing = False if last_processed_band_id else True
+async def scrape_queue(
+    queue, workers, rate, cache, store, parquet=None, claim_size=50, archive=None
+):
+    """Scrape band IDs claimed from a work queue shared with other workers."""
+    writer = StoreDiscographyWriter(store)
+
+    async with FetchEngine(
+        concurrency=workers, rate=queue.rate_share(rate), cache=cache, archive=archive
+    ) as engine:
+        while True:
+            units = queue.claim("band", claim_size)
+            if not units:
+                if queue.outstanding("band"):
+                    await asyncio.sleep(5)
+                    continue
+                break
+            if engine.limiter:
+                engine.limiter.rate = queue.rate_share(rate)
+
+            keys = [band_id for band_id, _ in units]
+            async with queue.renewing("band", keys):
+                discographies = await asyncio.gather(
+                    *(scrape_band_page(engine, band_name, band_id) for band_id, band_name in units)
+                )
+                for (band_id, band_name), discography in zip(units, discographies):
+                    writer.add(band_id, discography)
+                    if parquet is not None:
+                        parquet.add(band_id, band_name, discography)
+                # Units are only completed once their rows are committed.
+                writer.flush()
+                if archive is not None:
+                    archive.flush()
+            finished = [key for key, discography in zip(keys, discographies) if discography is not None]
+            failed = [key for key, discography in zip(keys, discographies) if discography is None]
+            queue.complete("band", finished)
+            # Failed bands go back to the queue until they run out of attempts.
+            queue.release("band", failed)
+            METRICS.advance(len(finished))
+            print(f"Finished {len(finished)} bands ({len(failed)} failed), queue: {queue.counts('band')}")
+
+    if parquet is not None:
+        parquet.flush()
+
+
+def reextract_chunk(directory, chunk):
+    """Re-run the extractor over one archived chunk; returns ``(band_id, rows)`` pairs."""
+    segment, first_offset, last_offset = chunk
+    results = []
+    for url, body in iter_segment(
+        directory, segment, "discography", first_offset, last_offset
+    ):
+        band_id = DISCOGRAPHY_URL_RE.search(url).group(1)
+        results.append((band_id, parse_discography(body, band_id)))
+    return results
+
+
+def reextract(directory, workers=None, store=None, output=MASTER_DISCO_FILE, overwrite=False):
+    """Rebuild discographies from archived pages on all cores, without the network.
+
+    Without a store the rows go to a new CSV at ``output``. It only holds the
+    archived bands, so an existing file is kept unless ``overwrite`` is set.
+    """
+    done_file = done_file_for(output)
+    if store is None and not overwrite:
+        existing = [path for path in (output, done_file) if os.path.exists(path)]
+        if existing:
+            raise SystemExit(
+                f"{' and '.join(existing)} already exist; re-extraction only holds the "
+                "archived bands, so choose another --output or pass --overwrite."
+            )
+    archive = PageArchive(directory)
+    chunks = archive.chunks("discography")
+    total = archive.count("discography")
+    archive.close()
+    print(f"Re-extracting {total} archived discography pages in {len(chunks)} chunks")
+
+    if store is None:
+        for path in (output, done_file):
+            if os.path.exists(path):
+                os.remove(path)
+    bands = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for results in pool.map(partial(reextract_chunk, directory), chunks):
+            if store is not None:
+                for band_id, rows in results:
+                    store.replace_discography(band_id, rows)
+                store.flush()
+            else:
+                rows = [row for _, band_rows in results for row in band_rows]
+                if rows:
+                    save_to_master_file(rows, output)
+                if results:
+                    save_done_bands([band_id for band_id, _ in results], done_file)
+            bands += len(results)
+    print(f"Re-extracted {bands} bands")
 
-    discographies = []
-    batch_size = 500
-    counter = 1
 
-    for _, row in bands_df.iterrows():
+def read_bands_file(path):
+    if os.path.isdir(path):
+        # A Parquet root written with main.py --parquet; only the needed columns are read.
+        return read_dataset(path, "bands", columns=["Band ID", "Name", "URL", "Status", "Letter"])
+    columns = {"Band ID", "Name", "URL", "Status"}
+    return pd.read_csv(path, usecols=lambda c: c in columns, dtype=str)
 
-        band_name = row["Name"]
-        band_url = row["URL"]
-        band_id = band_url.split("/")[-1]
 
-        if not start_processing:
-            if band_id == last_processed_band_id:
-                start_processing = True
-            continue
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape band discographies.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="number of concurrent discography workers",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="global request budget in requests per second",
+    )
+    parser.add_argument(
+        "--bands-file",
+        default="metal_bands.csv",
+        help="band list to scrape: a CSV such as changed_bands.csv from "
+        "main.py --incremental, or a Parquet root from main.py --parquet; "
+        "bands that already have a discography are skipped unless --rescrape is given",
+    )
+    parser.add_argument(
+        "--rescrape",
+        action="store_true",
+        help="scrape every listed band again, e.g. the changed bands from "
+        "main.py --incremental, replacing its old rows or stored discography once "
+        "the new ones are written; with --queue --seed, done bands are queued again",
+    )
+    parser.add_argument(
+        "--priority",
+        default="",
+        help="comma-separated keys to scrape first, in order of importance: "
+        + "; ".join(f"{key}: {text}" for key, text in PRIORITIES.items()),
+    )
+    parser.add_argument(
+        "--new-bands",
+        default=CHANGED_BANDS_FILE,
+        help="band list that the 'new' priority puts first",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="split the pending bands by ID into this many shards for parallel "
+        "workers; requires --store",
+    )
+    parser.add_argument(
+        "--shard",
+        type=int,
+        default=0,
+        help="shard this worker scrapes, from 0 to --shards - 1",
+    )
+    parser.add_argument(
+        "--parquet",
+        metavar="DIR",
+        help="also write discographies to a Parquet dataset under DIR, "
+        "partitioned by the band's letter",
+    )
+    parser.add_argument(
+        "--store",
+        nargs="?",
+        const=DEFAULT_DB,
+        help=f"read bands from and write discographies to the SQLite store "
+        f"(default {DEFAULT_DB}); bands already scraped there are skipped",
+    )
+    parser.add_argument(
+        "--queue",
+        nargs="?",
+        const=DEFAULT_QUEUE,
+        help=f"claim band IDs from a shared work queue (default {DEFAULT_QUEUE}) "
+        "so several processes or hosts can split the crawl; requires --store. "
+        "--rate is then shared evenly by all active workers",
+    )
+    parser.add_argument(
+        "--seed",
+        action="store_true",
+        help="with --queue, enqueue every band still missing a discography first",
+    )
+    parser.add_argument(
+        "--cache-dir", default="http_cache", help="directory of the response cache"
+    )
+    parser.add_argument(
+        "--cache-size-mb",
+        type=int,
+        default=2048,
+        help="disk cap of the response cache before LRU eviction",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="always download pages again"
+    )
+    parser.add_argument(
+        "--archive",
+        metavar="DIR",
+        help="also append every downloaded discography page to a zstd page archive under DIR",
+    )
+    parser.add_argument(
+        "--reextract",
+        metavar="DIR",
+        help="rebuild discographies from the page archive under DIR on all cores, "
+        "without the network, into the store with --store or a new CSV at --output",
+    )
+    parser.add_argument(
+        "--output",
+        default=MASTER_DISCO_FILE,
+        help="discography CSV that --reextract writes without --store",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="let --reextract replace an existing --output; bands that are not "
+        "in the archive are dropped from it",
+    )
+    add_metrics_args(parser)
+    return parser.parse_args()
 
+
+def main():
+    args = parse_args()
+    start_time = time.time()
+    if args.queue and not args.store:
+        print("--queue needs --store so all workers write to one place.")
+        return
+    if args.shards > 1 and not args.store:
+        print("--shards needs --store so all workers write to one place.")
+        return
+    if args.shards > 1 and args.queue:
+        print("--shards and --queue both split the crawl; use one of them.")
+        return
+    if not 0 <= args.shard < args.shards:
+        print(f"--shard must be between 0 and {args.shards - 1}.")
+        return
+    try:
+        priority = parse_priority(args.priority)
+    except ValueError as e:
+        print(f"--priority: {e}")
+        return
+    if (args.parquet or os.path.isdir(args.bands_file)) and DatasetWriter is None:
+        print("--parquet and Parquet band lists need pyarrow (pip install pyarrow).")
+        return
+    if (args.archive or args.reextract) and PageArchive is None:
+        print("--archive and --reextract need zstandard (pip install zstandard).")
+        return
+    store = Store(args.store) if args.store else None
+
+    if args.reextract:
+        try:
+            reextract(args.reextract, store=store, output=args.output, overwrite=args.overwrite)
+        finally:
+            if store is not None:
+                store.close()
+        return
+
+    if store is not None and args.bands_file == "metal_bands.csv" and store.count("bands"):
+        bands_df = None
+    else:
+        bands_df = read_bands_file(args.bands_file)
+
+        if "Name" not in bands_df.columns or "URL" not in bands_df.columns:
+            print("CSV file is missing 'Name' or 'URL' columns.")
+            return
+
+    if store is None:
+        check_master_file()
+    bands = []
+    plan_start = time.perf_counter()
+    if not args.queue or args.seed or args.parquet:
+        frame = store_band_frame(store) if bands_df is None else band_frame(bands_df)
+    if not args.queue or args.seed:
+        # Listed bands changed, so their stored discographies do not count as done.
+        done = IdSet() if args.rescrape else done_band_ids(store)
+        new_ids = new_band_ids(args.new_bands) if "new" in priority else None
+        bands = plan(frame, done, priority, new_ids, args.shards, args.shard)
         print(
-            f"{counter}/{len(bands_df['Name'])} - Scraping {band_name}, ID: {band_id}"
+            f"Planned {len(bands)} of {len(frame)} bands"
+            + (f" (shard {args.shard}/{args.shards})" if args.shards > 1 else "")
+            + f" in {time.perf_counter() - plan_start:.2f}s"
         )
-        counter = counter + 1
-        band_discography = scrape_band_page(band_name, band_id)
-        if band_discography:
-            discographies.extend(band_discography)
-
-        if len(discographies) >= batch_size:
-            save_to_master_file(discographies)
-            discographies = []
-
-        # elapsed_time = time.time() - start_time
-        # hours, rem = divmod(elapsed_time, 3600)
-        # minutes, seconds = divmod(rem, 60)
-        # print(f"Time elapsed: {int(hours):02}:{int(minutes):02}:{int(seconds):02}")
-        # os.system("cls" if os.name == "nt" else "clear")
-
-    if discographies:
-        save_to_master_file(discographies)
+
+    cache = (
+        None
+        if args.no_cache
+        else ResponseCache(args.cache_dir, max_bytes=args.cache_size_mb * 1024**2)
+    )
+    parquet = DiscographyDataset(args.parquet, band_letters(frame)) if args.parquet else None
+    archive = PageArchive(args.archive) if args.archive else None
+    try:
+        if args.queue:
+            queue = WorkQueue(args.queue)
+            try:
+                if args.seed:
+                    queue.enqueue(
+                        "band", [(band_id, name) for name, band_id in bands], reset=args.rescrape
+                    )
+                    print(f"Queued {len(bands)} bands")
+                asyncio.run(
+                    report(
+                        scrape_queue(
+                            queue,
+                            args.workers,
+                            args.rate,
+                            cache,
+                            store,
+                            parquet,
+                            archive=archive,
+                        ),
+                        args.metrics,
+                        args.metrics_interval,
+                    )
+                )
+            finally:
+                queue.close()
+        else:
+            asyncio.run(
+                report(
+                    scrape_discographies(
+                        bands,
+                        args.workers,
+                        args.rate,
+                        cache,
+                        store,
+                        parquet,
+                        archive=archive,
+                        replace=args.rescrape,
+                    ),
+                    args.metrics,
+                    args.metrics_interval,
+                )
+            )
+    finally:
+        if cache is not None:
+            cache.close()
+        if store is not None:
+            store.close()
+        if archive is not None:
+            archive.close()
+
+    elapsed_time = time.time() - start_time
+    hours, rem = divmod(elapsed_time, 3600)
+    minutes, seconds = divmod(rem, 60)
+    print(f"Time elapsed: {int(hours):02}:{int(minutes):02}:{int(seconds):02}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+"""Pages/sec of discography extraction: per-cell select_one vs discography_parser.
+
+Runs over the discography pages of a page archive written with
+band_scraper.py --archive, or over pages synthesized the way the mock server
+serves them (sample_data/metal_bands.csv, repeated --band-copies times).
+
+    python benchmarks/bench_discography_parser.py [--archive DIR] [--pages N] [--band-copies 10]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import discography_parser  # noqa: E402
+from mock_server import BANDS_FILE, discography_page, load_bands  # noqa: E402
+
+DISCOGRAPHY_URL_RE = re.compile(r"/band/discography/id/(\d+)/")
+
+
+def archived_pages(directory, limit=None):
+    from page_archive import PageArchive, iter_segment
+
+    archive = PageArchive(directory)
+    chunks = archive.chunks("discography")
+    archive.close()
+    pages = []
+    for segment, first_offset, last_offset in chunks:
+        for url, body in iter_segment(directory, segment, "discography", first_offset, last_offset):
+            pages.append((DISCOGRAPHY_URL_RE.search(url).group(1), body))
+            if limit and len(pages) >= limit:
+                return pages
+    return pages
+
+
+def synthetic_pages(copies, limit=None):
+    pages = []
+    for band in load_bands(BANDS_FILE, copies):
+        pages.append((str(band["id"]), discography_page(band["id"]).encode("utf-8")))
+        if limit and len(pages) >= limit:
+            break
+    return pages
+
+
+def parse_with_select_one(body, band_id):
+    """The extractor band_scraper used before discography_parser."""
+    from bs4 import BeautifulSoup
+
+    discography = []
+    disco_table = BeautifulSoup(body, "html.parser").select_one("table.display.discog")
+    if disco_table:
+        for row in disco_table.select("tbody tr"):
+            name_element = row.select_one("td a")
+            type_element = row.select_one("td:nth-child(2)")
+            year_element = row.select_one("td:nth-child(3)")
+            reviews_element = row.select_one("td:nth-child(4) a")
+            discography.append(
+                [
+                    name_element.text.strip() if name_element else "Unknown Album",
+                    type_element.text.strip() if type_element else "Unknown Type",
+                    year_element.text.strip() if year_element else "Unknown Year",
+                    reviews_element.text.strip() if reviews_element else "No Reviews",
+                    band_id,
+                ]
+            )
+    return discography
+
+
+def time_parser(name, func, pages):
+    start = time.perf_counter()
+    results = [func(body, band_id) for band_id, body in pages]
+    elapsed = time.perf_counter() - start
+    rows = sum(len(result or ()) for result in results)
+    print(
+        f"{name:<20} {len(pages):>7} pages {rows:>8} rows  {elapsed:8.3f} s  "
+        f"{len(pages) / elapsed:>9.0f} pages/sec"
+    )
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--archive", metavar="DIR", help="page archive to read discography pages from")
+    parser.add_argument("--pages", type=int, default=None, help="limit the number of pages")
+    parser.add_argument("--band-copies", type=int, default=10, help="copies of the sample bands to synthesize")
+    args = parser.parse_args()
+
+    pages = archived_pages(args.archive, args.pages) if args.archive else synthetic_pages(args.band_copies, args.pages)
+    print(f"{len(pages)} pages, {sum(len(body) for _, body in pages) / 1024**2:.1f} MB")
+
+    results = {}
+    if discography_parser.lxml is not None:
+        results["lxml"] = time_parser("discography_parser", discography_parser._extract_lxml, pages)
+    else:
+        print("lxml is not installed; skipping the lxml walk.")
+
+    try:
+        import bs4  # noqa: F401
+    except ImportError:
+        print("beautifulsoup4 is not installed; skipping the soup walk and the baseline.")
+    else:
+        results["soup"] = time_parser("soup fallback", discography_parser._extract_soup, pages)
+        results["select_one"] = time_parser("select_one baseline", parse_with_select_one, pages)
+
+    fast = results.get("lxml") or results.get("soup")
+    if fast is None:
+        return
+    if "lxml" in results and "soup" in results:
+        mismatches = sum(1 for a, b in zip(results["lxml"][0], results["soup"][0]) if (a or []) != (b or []))
+        print(f"lxml vs soup fallback, mismatched pages: {mismatches}")
+    if "select_one" in results:
+        baseline, baseline_elapsed = results["select_one"]
+        # Names and types are the columns both extractors report as text.
+        mismatches = sum(
+            1
+            for new, old in zip(fast[0], baseline)
+            if [row[1:3] for row in new or []] != [row[:2] for row in old]
+        )
+        print(f"speedup vs select_one: {baseline_elapsed / fast[1]:.1f}x, mismatched pages: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
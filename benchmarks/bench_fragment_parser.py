@@ -0,0 +1,115 @@
+"""Rows/sec of aaData cell parsing: per-cell BeautifulSoup vs fragment_parser.
+
+Builds label-list rows shaped like the ajax-list endpoint's aaData from
+labels/labels.csv (about 45k rows) and times both extraction paths.
+
+    python benchmarks/bench_fragment_parser.py [--rows N]
+"""
+
+import argparse
+import csv
+import html
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fragment_parser import anchor, text  # noqa: E402
+
+
+def build_rows(limit=None):
+    rows = []
+    with open(os.path.join(ROOT, "labels", "labels.csv"), newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            name = html.escape(record["Name"])
+            url = f"https://www.metal-archives.com/labels/{name.replace(' ', '_')}/{record['Label ID']}"
+            website = (
+                f'<a href="{html.escape(record["Website"])}" target="_blank">&nbsp;</a>'
+                if record["Website"]
+                else ""
+            )
+            rows.append(
+                [
+                    '<input type="checkbox" />',
+                    f'<a href="{url}">{name}</a>',
+                    html.escape(record["Specialization"]),
+                    f'<span class="{record["Status"]}">{record["Status"]}</span>',
+                    html.escape(record["Country"]),
+                    website,
+                    record["Online Shopping"],
+                ]
+            )
+            if limit and len(rows) >= limit:
+                break
+    return rows
+
+
+def parse_with_beautifulsoup(label):
+    from bs4 import BeautifulSoup
+
+    def clean_text(text):
+        return (
+            BeautifulSoup(text, "html.parser").get_text().replace("\xa0", " ").strip()
+            if text
+            else ""
+        )
+
+    label_name = clean_text(label[1])
+    specialization = clean_text(label[2])
+    status = clean_text(label[3])
+    country = clean_text(label[4])
+    label_url_soup = BeautifulSoup(label[1], "html.parser").a
+    label_url = label_url_soup["href"] if label_url_soup else None
+    website = None
+    if label[5]:
+        website_soup = BeautifulSoup(label[5], "html.parser").find("a")
+        website = website_soup["href"] if website_soup else None
+    online_shopping = clean_text(label[6])
+    return [label_url, label_name, specialization, status, country, website, online_shopping]
+
+
+def parse_with_fragment_parser(label):
+    label_name, label_url = anchor(label[1])
+    website = anchor(label[5])[1] if label[5] else None
+    return [
+        label_url,
+        label_name,
+        text(label[2]),
+        text(label[3]),
+        text(label[4]),
+        website,
+        text(label[6]),
+    ]
+
+
+def time_parser(name, func, rows):
+    start = time.perf_counter()
+    results = [func(row) for row in rows]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} {len(rows):>7} rows  {elapsed:8.3f} s  {len(rows) / elapsed:>10.0f} rows/sec")
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=None, help="limit the number of rows")
+    args = parser.parse_args()
+
+    rows = build_rows(args.rows)
+    fast, fast_elapsed = time_parser("fragment_parser", parse_with_fragment_parser, rows)
+
+    try:
+        import bs4  # noqa: F401
+    except ImportError:
+        print("beautifulsoup4 is not installed; skipping the baseline.")
+        return
+
+    slow, slow_elapsed = time_parser("beautifulsoup", parse_with_beautifulsoup, rows)
+    mismatches = sum(1 for a, b in zip(fast, slow) if a != b)
+    print(f"speedup: {slow_elapsed / fast_elapsed:.1f}x, mismatched rows: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
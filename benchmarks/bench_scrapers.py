@@ -0,0 +1,183 @@
+"""End-to-end scraper benchmarks against the local mock server.
+
+Starts benchmarks/mock_server.py in-process, then runs each scraper entry
+point as a child process in a scratch directory with METAL_ARCHIVES_URL
+pointing at it. Reports wall time, requests and pages/sec as seen by the
+server, output rows and rows/sec, child CPU time and peak RSS.
+
+    python benchmarks/bench_scrapers.py [--only labels,listing,roster,discography,photos]
+        [--labels 2000] [--workers 8] [--band-copies 10] [--latency 0.02] [--jitter 0.01]
+        [--burst-rate 0.0] [--burst-length 5] [--drop-rate 0.0] [--keep]
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_server import (  # noqa: E402
+    BANDS_FILE,
+    LABELS_FILE,
+    add_fault_args,
+    archive_from_args,
+    photo_url,
+    start_in_thread,
+)
+
+
+def write_labels(path, limit):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(LABELS_FILE, newline="", encoding="utf-8") as src, open(
+        path, "w", newline="", encoding="utf-8"
+    ) as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        writer.writerow(next(reader))
+        for i, row in enumerate(reader):
+            if i >= limit:
+                break
+            writer.writerow(row)
+
+
+def write_bands(path, archive):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Band ID", "Name", "URL", "Country", "Genre", "Status", "Photo_URL"])
+        for band in archive.bands.values():
+            writer.writerow(
+                [
+                    band["id"],
+                    band["name"],
+                    band["url"],
+                    band["country"],
+                    band["genre"],
+                    band["status"],
+                    photo_url(band["id"]),
+                ]
+            )
+
+
+def count_rows(path):
+    """Data rows of a CSV output, or files under an output directory."""
+    if not os.path.exists(path):
+        return 0
+    if os.path.isdir(path):
+        return sum(len(files) for _, _, files in os.walk(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+def scenarios(args, archive):
+    """(name, script, arguments, prepare(workdir), output file) per entry point."""
+    return [
+        ("labels", "labels_scraper.py", [], lambda workdir: None, os.path.join("labels", "labels.csv")),
+        ("listing", "main.py", [], lambda workdir: None, "metal_bands.csv"),
+        (
+            "roster",
+            "label_roster.py",
+            [],
+            lambda workdir: write_labels(os.path.join(workdir, "labels", "labels.csv"), args.labels),
+            os.path.join("labels_rosters", "combined_roster.csv"),
+        ),
+        (
+            "discography",
+            "band_scraper.py",
+            ["--workers", str(args.workers), "--rate", "0", "--no-cache"],
+            lambda workdir: write_bands(os.path.join(workdir, "metal_bands.csv"), archive),
+            "all_bands_discography.csv",
+        ),
+        (
+            "photos",
+            "photo_mirror.py",
+            ["--workers", str(args.workers), "--rate", "0"],
+            lambda workdir: write_bands(os.path.join(workdir, "metal_bands.csv"), archive),
+            os.path.join("photos", "objects"),
+        ),
+    ]
+
+
+def run_scenario(name, script, arguments, prepare, output, archive, base_url, keep):
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    prepare(workdir)
+    env = dict(os.environ, METAL_ARCHIVES_URL=base_url)
+    requests_before = sum(archive.requests.values())
+    bytes_before = archive.bytes
+
+    start = time.perf_counter()
+    with open(os.path.join(workdir, "run.log"), "w") as log:
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, script), *arguments],
+            cwd=workdir,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - start
+
+    rows = count_rows(os.path.join(workdir, output))
+    requests = sum(archive.requests.values()) - requests_before
+    result = {
+        "scenario": name,
+        "exit": os.waitstatus_to_exitcode(status),
+        "wall_s": wall,
+        "requests": requests,
+        "pages_per_s": requests / wall,
+        "mb": (archive.bytes - bytes_before) / 1024**2,
+        "rows": rows,
+        "rows_per_s": rows / wall,
+        "cpu_s": usage.ru_utime + usage.ru_stime,
+        "peak_rss_mb": usage.ru_maxrss / 1024,  # KiB on Linux
+        "workdir": workdir,
+    }
+    if not keep and result["exit"] == 0:
+        shutil.rmtree(workdir)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against a mock server.")
+    parser.add_argument("--only", help="comma-separated scenarios to run")
+    parser.add_argument("--labels", type=int, default=2000, help="labels in the roster scenario")
+    parser.add_argument("--workers", type=int, default=8, help="discography and photo workers")
+    parser.add_argument("--keep", action="store_true", help="keep scratch directories")
+    add_fault_args(parser)
+    parser.set_defaults(band_copies=10, latency=0.02, jitter=0.01)
+    args = parser.parse_args()
+
+    archive = archive_from_args(args)
+    base_url = start_in_thread(archive)
+    print(
+        f"Mock server at {base_url}: {len(archive.bands)} bands from {os.path.relpath(BANDS_FILE, ROOT)}, "
+        f"latency {args.latency}s +/- {args.jitter}s, 429 bursts {args.burst_rate}, drops {args.drop_rate}"
+    )
+
+    selected = set(args.only.split(",")) if args.only else None
+    header = f"{'scenario':<12} {'exit':>4} {'wall s':>8} {'requests':>9} {'pages/s':>8} {'MB':>7} {'rows':>8} {'rows/s':>9} {'CPU s':>7} {'peak RSS MB':>11}"
+    results = []
+    for scenario in scenarios(args, archive):
+        if selected and scenario[0] not in selected:
+            continue
+        print(f"Running {scenario[0]}...")
+        results.append(run_scenario(*scenario, archive, base_url, args.keep))
+
+    print(header)
+    for r in results:
+        print(
+            f"{r['scenario']:<12} {r['exit']:>4} {r['wall_s']:>8.2f} {r['requests']:>9} "
+            f"{r['pages_per_s']:>8.1f} {r['mb']:>7.1f} {r['rows']:>8} {r['rows_per_s']:>9.1f} "
+            f"{r['cpu_s']:>7.2f} {r['peak_rss_mb']:>11.1f}"
+        )
+        if r["exit"] != 0 or args.keep:
+            print(f"  log: {os.path.join(r['workdir'], 'run.log')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Local stand-in for the Metal Archives endpoints the scrapers use.
+
+Serves synthetic ajax-letter, ajax-list, ajax-bands, band page,
+discography and band photo responses built from sample_data/metal_bands.csv and
+labels/labels.csv, with configurable latency, jitter, bursts of 429s and
+dropped connections. Point a scraper at it with METAL_ARCHIVES_URL (see
+http_engine.FetchEngine):
+
+    python benchmarks/mock_server.py [--port 8765] [--latency 0.05] [--jitter 0.02]
+        [--burst-rate 0.01] [--burst-length 5] [--drop-rate 0.005] [--band-copies 10]
+    METAL_ARCHIVES_URL=http://127.0.0.1:8765 python main.py
+"""
+
+import argparse
+import asyncio
+import csv
+import functools
+import hashlib
+import html
+import os
+import random
+import re
+import sys
+import struct
+import threading
+import zlib
+from collections import Counter
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from metrics import endpoint_of  # noqa: E402
+
+SITE_URL = "https://www.metal-archives.com"
+BANDS_FILE = os.path.join(ROOT, "sample_data", "metal_bands.csv")
+LABELS_FILE = os.path.join(ROOT, "labels", "labels.csv")
+# Non-ASCII titles keep the parsers honest about the page encoding.
+ALBUM_TITLES = ["Album", "Ænima", "Ólafsvaka", "黒い太陽", "Über Tod & Teufel", "Смерть"]
+ALBUM_TYPES = ["Full-length", "Demo", "EP", "Single", "Split", "Live album", "Compilation"]
+
+
+def category(name):
+    first = (name or "")[:1].upper()
+    if "A" <= first <= "Z":
+        return first
+    if first.isdigit():
+        return "NBR"
+    return "~"
+
+
+def link(url, name):
+    return f'<a href="{html.escape(url)}">{html.escape(name)}</a>'
+
+
+def photo_url(band_id):
+    return f"{SITE_URL}/images/{'/'.join(str(band_id)[:4])}/{band_id}_photo.jpg?{band_id % 9999}"
+
+
+def photo_image(band_id):
+    """A PNG photo; bands sharing ``band_id % 50`` share the same image."""
+    return shaded_png(band_id % 50)
+
+
+@functools.lru_cache(maxsize=None)
+def shaded_png(shade, size=160):
+    raw = b"".join(
+        b"\x00" + bytes((x * 5 + shade) % 256 for x in range(size)) * 3 for _ in range(size)
+    )
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+def discography_page(band_id):
+    """Discography tab of a band: ``band_id % 13`` albums, some with reviews."""
+    rows = []
+    for k in range(band_id % 13):
+        album_id = band_id * 100 + k
+        reviews = (
+            f'<a href="{SITE_URL}/reviews/x/{album_id}/">{k % 4} ({60 + k * 3}%)</a>'
+            if k % 4
+            else "&nbsp;"
+        )
+        rows.append(
+            f'<tr><td><a href="{SITE_URL}/albums/x/Album_{k}/{album_id}" class="album">'
+            f"{html.escape(ALBUM_TITLES[k % len(ALBUM_TITLES)])} {k}</a></td>"
+            f'<td class="album">{ALBUM_TYPES[k % len(ALBUM_TYPES)]}</td>'
+            f'<td class="album">{1985 + k}</td><td>{reviews}</td></tr>'
+        )
+    return (
+        '<table class="display discog" cellpadding="0" cellspacing="0">'
+        "<thead><tr><th>Name</th><th>Type</th><th>Year</th><th>Reviews</th></tr></thead>"
+        f"<tbody>{''.join(rows)}</tbody></table>"
+    )
+
+
+def load_bands(path, copies=1):
+    """Sample bands, repeated ``copies`` times under new IDs to scale the crawl."""
+    with open(path, newline="", encoding="utf-8") as f:
+        sample = list(csv.DictReader(f))
+    bands = []
+    for copy in range(copies):
+        for record in sample:
+            band_id = int(re.search(r"/(\d+)$", record["URL"]).group(1)) + copy * 10**10
+            name = record["Name"] if copy == 0 else f"{record['Name']} {copy}"
+            bands.append(
+                {
+                    "id": band_id,
+                    "name": name,
+                    "url": f"{SITE_URL}/bands/{name.replace(' ', '_')}/{band_id}",
+                    "country": record["Country"],
+                    "genre": record["Genre"],
+                    "status": record["Status"],
+                }
+            )
+    return bands
+
+
+def load_labels(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return [record for record in csv.DictReader(f) if record["Label ID"]]
+
+
+class MockArchive:
+    def __init__(
+        self,
+        bands,
+        labels,
+        latency=0.0,
+        jitter=0.0,
+        burst_rate=0.0,
+        burst_length=5,
+        drop_rate=0.0,
+        seed=0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.burst_rate = burst_rate
+        self.burst_length = burst_length
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.statuses = Counter()
+        self.bytes = 0
+        self._burst_left = 0
+
+        self.bands = {band["id"]: band for band in bands}
+        self.bands_by_letter = {}
+        for band in sorted(bands, key=lambda band: band["name"].lower()):
+            self.bands_by_letter.setdefault(category(band["name"]), []).append(band)
+        self.labels_by_letter = {}
+        for label in sorted(labels, key=lambda label: label["Name"].lower()):
+            self.labels_by_letter.setdefault(category(label["Name"]), []).append(label)
+        # Every band is on one label by position, and the first label carries
+        # the whole roster so roster pagination gets exercised.
+        self.rosters = {}
+        for i, band in enumerate(bands):
+            if labels:
+                self.rosters.setdefault(labels[i % len(labels)]["Label ID"], []).append(band)
+        if labels:
+            self.rosters[labels[0]["Label ID"]] = list(bands)
+
+    def app(self):
+        app = web.Application(middlewares=[self.faults])
+        app.router.add_get("/browse/ajax-letter/l/{letter}/json/1", self.ajax_letter)
+        app.router.add_get("/label/ajax-list/json/1/l/{letter}", self.label_list)
+        app.router.add_get(
+            "/label/ajax-bands/nbrPerPage/{size}/id/{label_id}", self.ajax_bands
+        )
+        app.router.add_get("/bands/{name:.+}/{band_id}", self.band_page)
+        app.router.add_get("/band/discography/id/{band_id}/tab/all", self.discography)
+        app.router.add_get("/images/{path:.+}/{band_id:\\d+}_photo.jpg", self.photo)
+        return app
+
+    @web.middleware
+    async def faults(self, request, handler):
+        self.requests[endpoint_of(request.path)] += 1
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._burst_left == 0 and self.random.random() < self.burst_rate:
+            self._burst_left = self.burst_length
+        if self._burst_left:
+            self._burst_left -= 1
+            self.statuses[429] += 1
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        if self.random.random() < self.drop_rate:
+            self.statuses["dropped"] += 1
+            request.transport.close()
+            return web.Response(status=500)
+        response = await handler(request)
+        self.statuses[response.status] += 1
+        self.bytes += len(response.body or b"")
+        return response
+
+    def page(self, request, rows):
+        start = int(request.query.get("iDisplayStart", 0))
+        length = int(request.query.get("iDisplayLength", 500))
+        return {
+            "iTotalRecords": len(rows),
+            "iTotalDisplayRecords": len(rows),
+            "sEcho": int(request.query.get("sEcho", 1)),
+        }, rows[start : start + length]
+
+    async def ajax_letter(self, request):
+        bands = self.bands_by_letter.get(request.match_info["letter"], [])
+        data, rows = self.page(request, bands)
+        data["aaData"] = [
+            [
+                link(band["url"], band["name"]),
+                band["country"],
+                band["genre"],
+                f'<span class="{band["status"].lower()}">{band["status"]}</span>',
+            ]
+            for band in rows
+        ]
+        return web.json_response(data)
+
+    async def label_list(self, request):
+        labels = self.labels_by_letter.get(request.match_info["letter"], [])
+        data, rows = self.page(request, labels)
+        data["aaData"] = [
+            [
+                '<input type="checkbox" />',
+                link(
+                    f"{SITE_URL}/labels/{label['Name'].replace(' ', '_')}/{label['Label ID']}",
+                    label["Name"],
+                ),
+                html.escape(label["Specialization"]),
+                f'<span class="{label["Status"]}">{label["Status"]}</span>',
+                html.escape(label["Country"]),
+                f'<a href="{html.escape(label["Website"])}" target="_blank">&nbsp;</a>'
+                if label["Website"]
+                else "",
+                label["Online Shopping"],
+            ]
+            for label in rows
+        ]
+        return web.json_response(data)
+
+    async def ajax_bands(self, request):
+        bands = self.rosters.get(request.match_info["label_id"], [])
+        data, rows = self.page(request, bands)
+        data["aaData"] = [
+            [link(band["url"], band["name"]), band["genre"], band["country"]] for band in rows
+        ]
+        return web.json_response(data)
+
+    async def band_page(self, request):
+        band = self.bands.get(int(request.match_info["band_id"]))
+        if band is None:
+            raise web.HTTPNotFound()
+        band_id = band["id"]
+        photo = photo_url(band_id)
+        body = f"""<!DOCTYPE html>
+<html><head><title>{html.escape(band["name"])} - Encyclopaedia Metallum</title></head>
+<body><div id="wrapper"><div id="content_wrapper">
+<div id="band_sidebar"><a class="image" id="photo" title="{html.escape(band["name"])}" href="{photo}">
+<img src="{photo}" /></a></div>
+<div id="band_info"><h1 class="band_name">{link(band["url"], band["name"])}</h1>
+<div id="band_stats">
+<dl class="float_left"><dt>Country of origin:</dt><dd>{html.escape(band["country"])}</dd>
+<dt>Location:</dt><dd>Somewhere</dd><dt>Status:</dt><dd>{band["status"]}</dd>
+<dt>Formed in:</dt><dd>{1970 + band_id % 50}</dd></dl>
+<dl class="float_right"><dt>Genre:</dt><dd>{html.escape(band["genre"])}</dd>
+<dt>Themes:</dt><dd>Darkness, Death</dd>
+<dt>Current label:</dt><dd>Unsigned/independent</dd></dl>
+</div></div>
+<div id="band_tabs"><ul><li><a href="#band_tab_discography">Discography</a></li></ul></div>
+{"<p>" + "Filler text standing in for the band comment and links. " * 300 + "</p>"}
+</div></div></body></html>"""
+        return web.Response(text=body, content_type="text/html")
+
+    async def discography(self, request):
+        band_id = int(request.match_info["band_id"])
+        if band_id not in self.bands:
+            raise web.HTTPNotFound()
+        body = discography_page(band_id)
+        return web.Response(text=body, content_type="text/html")
+
+    async def photo(self, request):
+        band_id = int(request.match_info["band_id"])
+        if band_id not in self.bands:
+            raise web.HTTPNotFound()
+        body = photo_image(band_id)
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="image/jpeg", headers={"ETag": etag})
+
+
+def start_in_thread(archive, host="127.0.0.1", port=0):
+    """Run ``archive`` on a background event loop; returns its base URL."""
+    ready = threading.Event()
+    state = {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(archive.app(), access_log=None)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, host, port)
+        loop.run_until_complete(site.start())
+        state["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return f"http://{host}:{state['port']}"
+
+
+def add_fault_args(parser):
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument(
+        "--burst-rate", type=float, default=0.0, help="chance per request of starting a 429 burst"
+    )
+    parser.add_argument("--burst-length", type=int, default=5, help="responses per 429 burst")
+    parser.add_argument(
+        "--drop-rate", type=float, default=0.0, help="chance per request of dropping the connection"
+    )
+    parser.add_argument(
+        "--band-copies", type=int, default=1, help="repeat the sample bands under new IDs"
+    )
+
+
+def archive_from_args(args):
+    return MockArchive(
+        load_bands(BANDS_FILE, args.band_copies),
+        load_labels(LABELS_FILE),
+        latency=args.latency,
+        jitter=args.jitter,
+        burst_rate=args.burst_rate,
+        burst_length=args.burst_length,
+        drop_rate=args.drop_rate,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock Metal Archives locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_fault_args(parser)
+    args = parser.parse_args()
+    archive = archive_from_args(args)
+    print(f"Serving {len(archive.bands)} bands on http://{args.host}:{args.port}")
+    web.run_app(archive.app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
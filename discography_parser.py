@@ -0,0 +1,118 @@
+"""Single-pass extraction of typed records from discography tables.
+
+The discography tab is one ``table.display.discog`` whose body rows hold
+four cells: the album link, the release type, the year and a review summary
+such as ``3 (85%)``. Each row's cells are walked once and turned into
+
+    [album_id, album_name, type, year, review_count, review_average, band_id]
+
+with integer IDs, years and counts, a float average and None for anything
+missing. lxml is used when installed; otherwise the same walk runs on a
+BeautifulSoup html.parser tree.
+"""
+
+import re
+
+try:
+    import lxml.html
+except ImportError:  # the BeautifulSoup walk is slower but equivalent
+    lxml = None
+else:
+    # The tab is a bare fragment with no <meta charset>; without an explicit
+    # encoding libxml2 would read the UTF-8 bytes as latin-1.
+    UTF8_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+DISCOGRAPHY_COLUMNS = [
+    "Album ID",
+    "Album Name",
+    "Type",
+    "Year",
+    "Review Count",
+    "Review Average",
+    "Band ID",
+]
+
+ALBUM_ID_RE = re.compile(r"/(\d+)/?$")
+YEAR_RE = re.compile(r"\d{4}")
+REVIEWS_RE = re.compile(r"(\d+)\s*\((\d+(?:\.\d+)?)%\)")
+TABLE_XPATH = (
+    "//table[contains(concat(' ', normalize-space(@class), ' '), ' discog ')"
+    " and contains(concat(' ', normalize-space(@class), ' '), ' display ')]"
+)
+
+
+def _clean(text):
+    text = text.replace("\xa0", " ").strip()
+    return text or None
+
+
+def _record(band_id, name, href, type_, year, reviews):
+    album_id = ALBUM_ID_RE.search(href) if href else None
+    year = YEAR_RE.search(year or "")
+    reviews = REVIEWS_RE.search(reviews or "")
+    return [
+        int(album_id.group(1)) if album_id else None,
+        _clean(name or ""),
+        _clean(type_ or ""),
+        int(year.group(0)) if year else None,
+        int(reviews.group(1)) if reviews else None,
+        float(reviews.group(2)) if reviews else None,
+        int(band_id),
+    ]
+
+
+def _extract_lxml(body, band_id):
+    if not body.strip():
+        return None
+    tables = lxml.html.fromstring(body, parser=UTF8_PARSER).xpath(TABLE_XPATH)
+    if not tables:
+        return None
+    records = []
+    for row in tables[0].iterfind(".//tbody/tr"):
+        cells = row.findall("td")
+        if len(cells) < 4:
+            continue  # "Nothing entered yet" placeholder row
+        link = cells[0].find(".//a")
+        records.append(
+            _record(
+                band_id,
+                (link if link is not None else cells[0]).text_content(),
+                link.get("href") if link is not None else None,
+                cells[1].text_content(),
+                cells[2].text_content(),
+                cells[3].text_content(),
+            )
+        )
+    return records
+
+
+def _extract_soup(body, band_id):
+    from bs4 import BeautifulSoup
+
+    table = BeautifulSoup(body, "html.parser").select_one("table.display.discog")
+    if table is None:
+        return None
+    records = []
+    for row in table.select("tbody tr"):
+        cells = row.find_all("td", recursive=False)
+        if len(cells) < 4:
+            continue
+        link = cells[0].find("a")
+        records.append(
+            _record(
+                band_id,
+                (link or cells[0]).get_text(),
+                link.get("href") if link else None,
+                cells[1].get_text(),
+                cells[2].get_text(),
+                cells[3].get_text(),
+            )
+        )
+    return records
+
+
+def extract_discography(body, band_id):
+    """Typed discography records of a page, or None when it has no discography table."""
+    if lxml is not None:
+        return _extract_lxml(body, band_id)
+    return _extract_soup(body, band_id)
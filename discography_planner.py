@@ -0,0 +1,78 @@
+"""Which bands still need a discography, in which order, and for which worker.
+
+The pending set is the band IDs of the band list minus the IDs already in the
+discography output, computed with sorted-array membership tests (IdSet)
+instead of a walk to the last band written. Bands skipped or failed before
+that point are picked up again, and results can be written in any order.
+
+Pending bands are stably sorted by the requested priority keys, so ties keep
+the band list's order, and can be split into shards by band ID: every worker
+computes the same split on its own, so no coordination is needed.
+"""
+
+import numpy as np
+import pandas as pd
+
+from id_set import ID_RE, IdSet, to_ids
+
+# Keys sort bands for which they are True first.
+PRIORITIES = {
+    "active": "bands whose status is Active",
+    "new": "bands listed as new or changed by main.py --incremental",
+}
+
+
+def band_frame(bands_df):
+    """Band ID, Name, Status and listing Letter of a band list.
+
+    Rows without a Band ID (older band files only have URLs) take the
+    trailing number of their URL. Letter is only known for band lists read
+    from the store or a Parquet root.
+    """
+    ids = bands_df["Band ID"] if "Band ID" in bands_df else pd.Series(index=bands_df.index, dtype=object)
+    missing = ids.isna()
+    if "URL" in bands_df and missing.any():
+        ids = ids.astype(object)
+        ids[missing] = bands_df["URL"][missing].str.extract(ID_RE, expand=False)
+    return pd.DataFrame(
+        {
+            "Band ID": to_ids(ids),
+            "Name": bands_df["Name"].to_numpy(),
+            "Status": bands_df["Status"].to_numpy() if "Status" in bands_df else None,
+            "Letter": bands_df["Letter"].astype(object).to_numpy() if "Letter" in bands_df else None,
+        }
+    )
+
+
+def parse_priority(value):
+    keys = [key.strip() for key in (value or "").split(",") if key.strip()]
+    unknown = [key for key in keys if key not in PRIORITIES]
+    if unknown:
+        raise ValueError(f"unknown priority {', '.join(unknown)}; choose from {', '.join(PRIORITIES)}")
+    return keys
+
+
+def plan(bands, done, priority=(), new_ids=None, shards=1, shard=0):
+    """``(name, band_id)`` pairs of the bands in ``bands`` not in ``done``.
+
+    ``bands`` is a band_frame and ``done`` an IdSet. With ``shards`` > 1 only
+    the bands with ``band_id % shards == shard`` are returned.
+    """
+    bands = bands[bands["Band ID"].to_numpy() >= 0].drop_duplicates("Band ID")
+    ids = bands["Band ID"].to_numpy()
+    keep = ~done.contains(ids)
+    if shards > 1:
+        keep &= ids % shards == shard
+    pending = bands[keep]
+
+    keys = []
+    for key in priority:
+        if key == "active":
+            keys.append((pending["Status"] != "Active").to_numpy())
+        elif key == "new":
+            new_ids = new_ids if new_ids is not None else IdSet()
+            keys.append(~new_ids.contains(pending["Band ID"].to_numpy()))
+    if keys:
+        # lexsort is stable and takes its primary key last.
+        pending = pending.iloc[np.lexsort(keys[::-1])]
+    return list(zip(pending["Name"].tolist(), pending["Band ID"].astype(str).tolist()))
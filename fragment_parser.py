@@ -0,0 +1,72 @@
+"""Fast extraction of text and links from aaData cell fragments.
+
+The listing endpoints return each cell as a tiny HTML snippet, almost always
+one of a handful of shapes: plain text, ``<a href="...">name</a>`` or
+``<span class="...">text</span>``. Those are matched with a regex; anything
+else falls back to the standard library's html.parser.
+"""
+
+import html
+import re
+from html.parser import HTMLParser
+
+ANCHOR_RE = re.compile(
+    r"""\s*<a\s[^>]*?\bhref\s*=\s*(["'])(.*?)\1[^>]*>([^<]*)</a>\s*""",
+    re.IGNORECASE | re.DOTALL,
+)
+SPAN_RE = re.compile(r"\s*<span(?:\s[^>]*)?>([^<]*)</span>\s*", re.IGNORECASE)
+
+
+class _FragmentParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.href = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a" and self.href is None:
+            self.href = dict(attrs).get("href")
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def _normalize(text):
+    return text.replace("\xa0", " ").strip()
+
+
+def _clean(text):
+    return _normalize(html.unescape(text))
+
+
+def _slow_parse(fragment):
+    # convert_charrefs has already decoded the entities; decoding again
+    # would turn an escaped "&amp;lt;" into "<".
+    parser = _FragmentParser()
+    parser.feed(fragment)
+    parser.close()
+    return _normalize("".join(parser.parts)), parser.href
+
+
+def anchor(fragment):
+    """Return ``(text, href)`` for a cell; ``href`` is None when there is no link."""
+    if not fragment:
+        return "", None
+    match = ANCHOR_RE.fullmatch(fragment)
+    if match:
+        return _clean(match.group(3)), html.unescape(match.group(2))
+    if "<" not in fragment:
+        return _clean(fragment), None
+    return _slow_parse(fragment)
+
+
+def text(fragment):
+    """Return the visible text of a cell with entities decoded and whitespace trimmed."""
+    if not fragment:
+        return ""
+    if "<" not in fragment:
+        return _clean(fragment)
+    match = SPAN_RE.fullmatch(fragment) or ANCHOR_RE.fullmatch(fragment)
+    if match:
+        return _clean(match.group(match.lastindex))
+    return _slow_parse(fragment)[0]
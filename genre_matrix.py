@@ -0,0 +1,211 @@
+"""Sparse band/genre/country/label matrices and the statistics built on them.
+
+Raw genre strings such as "Heavy/Power Metal" or "Black Metal (early);
+Death Metal (later)" are split into genre tokens, and bands, tokens,
+countries and labels are mapped to integer indices. Everything else is a
+sparse matrix product:
+
+    genre co-occurrence  = G.T @ G        (band x genre incidence G)
+    genre x country      = G.T @ C        (band x country incidence C)
+    label x genre        = L @ G          (label x band roster L)
+
+    python genre_matrix.py [--bands metal_bands.csv]
+        [--roster labels_rosters/combined_roster.csv] [--out-dir statistics/genre_matrix]
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from table_loader import load_table, memory_report
+
+QUALIFIER_RE = re.compile(r"\([^)]*\)")
+SEPARATOR_RE = re.compile(r"[,;/]")
+STYLE_SUFFIXES = ("Metal", "Rock", "Punk", "Core", "Grind")
+
+
+def tokenize_genre(genre):
+    """Split a genre string into its genre tokens.
+
+    Period qualifiers like "(early)" are dropped, and a run of bare prefixes
+    shares the style of the token after it, so "Doom/Sludge/Stoner Metal"
+    gives "Doom Metal", "Sludge Metal" and "Stoner Metal".
+    """
+    if not isinstance(genre, str):
+        return []
+    parts = [part.strip() for part in SEPARATOR_RE.split(QUALIFIER_RE.sub("", genre))]
+    parts = [part for part in parts if part]
+    tokens = []
+    suffix = None
+    # Walk backwards so a style carries over every bare prefix before it.
+    for part in reversed(parts):
+        if " " not in part and suffix and part not in STYLE_SUFFIXES:
+            part = f"{part} {suffix}"
+        else:
+            last = part.rsplit(" ", 1)[-1]
+            suffix = last if last in STYLE_SUFFIXES else None
+        tokens.append(part)
+    return list(dict.fromkeys(reversed(tokens)))
+
+
+def _incidence(rows, cols, shape):
+    data = np.ones(len(rows), dtype=np.float32)
+    matrix = sp.csr_matrix((data, (rows, cols)), shape=shape)
+    matrix.data[:] = 1  # duplicate (row, col) pairs count once
+    return matrix
+
+
+class GenreMatrices:
+    """Integer-indexed incidence matrices over the whole archive."""
+
+    def __init__(self, bands_df, roster_df=None):
+        bands_df = bands_df.dropna(subset=["Band ID"]).drop_duplicates("Band ID", keep="last")
+        self.band_ids = bands_df["Band ID"].to_numpy(dtype=np.int64)
+        band_count = len(self.band_ids)
+
+        # Tokenize each distinct genre string once, then map bands through it.
+        genre_codes, genre_strings = pd.factorize(bands_df["Genre"])
+        token_lists = [tokenize_genre(genre) for genre in genre_strings]
+        self.genres = np.array(sorted({token for tokens in token_lists for token in tokens}))
+        token_index = {token: i for i, token in enumerate(self.genres)}
+        string_tokens = [np.array([token_index[t] for t in tokens], dtype=np.int32) for tokens in token_lists]
+        lengths = np.array([len(tokens) for tokens in string_tokens], dtype=np.int64)
+
+        flat_tokens = np.concatenate(string_tokens) if string_tokens else np.array([], dtype=np.int32)
+        offsets = np.cumsum(lengths) - lengths
+
+        # Gather every band's token run out of flat_tokens without a Python loop.
+        has_genre = genre_codes >= 0
+        codes = genre_codes[has_genre]
+        band_lengths = lengths[codes]
+        band_rows = np.repeat(np.flatnonzero(has_genre), band_lengths)
+        within = np.arange(band_lengths.sum()) - np.repeat(np.cumsum(band_lengths) - band_lengths, band_lengths)
+        token_cols = flat_tokens[np.repeat(offsets[codes], band_lengths) + within]
+        self.band_genre = _incidence(band_rows, token_cols, (band_count, len(self.genres)))
+
+        country_codes, countries = pd.factorize(bands_df["Country"])
+        self.countries = np.asarray(countries)
+        has_country = country_codes >= 0
+        self.band_country = _incidence(
+            np.flatnonzero(has_country), country_codes[has_country], (band_count, len(self.countries))
+        )
+
+        self.label_ids = np.array([], dtype=np.int64)
+        self.label_band = sp.csr_matrix((0, band_count), dtype=np.float32)
+        self.unmatched_roster_rows = 0
+        if roster_df is not None:
+            self._build_roster(roster_df)
+
+    def _build_roster(self, roster_df):
+        roster_df = roster_df.dropna(subset=["Label ID", "Band ID"])
+        order = np.argsort(self.band_ids)
+        sorted_ids = self.band_ids[order]
+        roster_band_ids = roster_df["Band ID"].to_numpy(dtype=np.int64)
+        positions = np.searchsorted(sorted_ids, roster_band_ids)
+        positions[positions == len(sorted_ids)] = 0
+        matched = sorted_ids[positions] == roster_band_ids if len(sorted_ids) else np.zeros(len(roster_band_ids), bool)
+        self.unmatched_roster_rows = int((~matched).sum())
+
+        label_codes, label_ids = pd.factorize(roster_df["Label ID"].to_numpy(dtype=np.int64)[matched])
+        self.label_ids = np.asarray(label_ids, dtype=np.int64)
+        self.label_band = _incidence(
+            label_codes, order[positions[matched]], (len(self.label_ids), len(self.band_ids))
+        )
+
+    def genre_degree(self):
+        """Number of bands per genre token."""
+        return np.asarray(self.band_genre.sum(axis=0)).ravel()
+
+    def genre_cooccurrence(self):
+        """Genre x genre count of bands playing both; the diagonal is the degree."""
+        return (self.band_genre.T @ self.band_genre).tocsr()
+
+    def genre_similarity(self):
+        """Cosine similarity between genres over the bands that play them."""
+        cooccurrence = self.genre_cooccurrence().tocoo()
+        norms = np.sqrt(self.genre_degree())
+        values = cooccurrence.data / (norms[cooccurrence.row] * norms[cooccurrence.col])
+        return sp.csr_matrix((values, (cooccurrence.row, cooccurrence.col)), shape=cooccurrence.shape)
+
+    def genre_country(self):
+        """Genre x country band counts."""
+        return (self.band_genre.T @ self.band_country).tocsr()
+
+    def label_genre(self):
+        """Label x genre counts of rostered bands."""
+        return (self.label_band @ self.band_genre).tocsr()
+
+    def top_pairs(self, matrix, row_names, col_names, limit=50, symmetric=False):
+        coo = sp.triu(matrix, k=1).tocoo() if symmetric else matrix.tocoo()
+        top = np.argsort(coo.data)[::-1][:limit]
+        return pd.DataFrame(
+            {
+                "Row": row_names[coo.row[top]],
+                "Column": col_names[coo.col[top]],
+                "Value": coo.data[top],
+            }
+        )
+
+    def memory_bytes(self):
+        total = self.band_ids.nbytes + self.label_ids.nbytes
+        for matrix in (self.band_genre, self.band_country, self.label_band):
+            total += matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+        return total
+
+
+def load_matrices(bands_path, roster_path=None):
+    bands_df = load_table("bands", bands_path, ["Band ID", "Country", "Genre"])
+    roster_df = None
+    if roster_path and os.path.exists(roster_path):
+        roster_df = load_table("roster", roster_path)
+    tables = {"bands": bands_df} if roster_df is None else {"bands": bands_df, "roster": roster_df}
+    print(memory_report(tables))
+    return GenreMatrices(bands_df, roster_df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sparse genre co-occurrence statistics.")
+    parser.add_argument("--bands", default="metal_bands.csv")
+    parser.add_argument("--roster", default=os.path.join("labels_rosters", "combined_roster.csv"))
+    parser.add_argument("--out-dir", default=os.path.join("statistics", "genre_matrix"))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    matrices = load_matrices(args.bands, args.roster)
+    print(
+        f"{len(matrices.band_ids)} bands, {len(matrices.genres)} genre tokens, "
+        f"{len(matrices.countries)} countries, {len(matrices.label_ids)} labels "
+        f"({matrices.memory_bytes() / 1024**2:.1f} MB of matrices) "
+        f"built in {time.perf_counter() - start:.2f} s"
+    )
+    if matrices.unmatched_roster_rows:
+        print(f"{matrices.unmatched_roster_rows} roster rows reference unknown bands")
+
+    start = time.perf_counter()
+    os.makedirs(args.out_dir, exist_ok=True)
+    pd.DataFrame({"Genre": matrices.genres, "Bands": matrices.genre_degree()}).sort_values(
+        "Bands", ascending=False
+    ).to_csv(os.path.join(args.out_dir, "genre_degree.csv"), index=False)
+    matrices.top_pairs(
+        matrices.genre_cooccurrence(), matrices.genres, matrices.genres, limit=500, symmetric=True
+    ).to_csv(os.path.join(args.out_dir, "genre_cooccurrence.csv"), index=False)
+    matrices.top_pairs(
+        matrices.genre_similarity(), matrices.genres, matrices.genres, limit=500, symmetric=True
+    ).to_csv(os.path.join(args.out_dir, "genre_similarity.csv"), index=False)
+    matrices.top_pairs(
+        matrices.genre_country(), matrices.genres, matrices.countries, limit=500
+    ).to_csv(os.path.join(args.out_dir, "genre_country.csv"), index=False)
+    if len(matrices.label_ids):
+        matrices.top_pairs(
+            matrices.label_genre(), matrices.label_ids, matrices.genres, limit=500
+        ).to_csv(os.path.join(args.out_dir, "label_genre.csv"), index=False)
+    print(f"Statistics written to {args.out_dir} in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+from metrics import METRICS, endpoint_of
+
+SITE_URL = "https://www.metal-archives.com"
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Referer": "https://www.metal-archives.com/",
+}
+JSON_HEADERS = {"Accept": "application/json"}
+
+# Statuses worth another attempt; everything else is handed back to the caller.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """Raised when a URL could not be fetched after all retries."""
+
+    def __init__(self, url, cause):
+        super().__init__(f"{url}: {cause!r}")
+        self.url = url
+        self.cause = cause
+
+
+class FetchResult:
+    """Status, headers and raw body of a completed request."""
+
+    def __init__(self, url, status, headers, body, from_cache=None, truncated=False):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        # None for network responses, "fresh" or "revalidated" for cache hits.
+        self.from_cache = from_cache
+        # True when an ``until`` callback stopped the download early.
+        self.truncated = truncated
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+
+class RateLimiter:
+    """Token bucket that spaces requests to at most ``rate`` per second.
+
+    One limiter is shared by every request of an engine, so the budget holds
+    no matter how many workers are pulling from it.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def retry_after_seconds(headers):
+    """Seconds a Retry-After header asks to wait, or None without a usable one."""
+    value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ConcurrencyController:
+    """AIMD limit on the requests an engine has in flight.
+
+    Each healthy response adds ``1 / limit``, so the limit grows by one per
+    window of responses while latency stays within ``latency_tolerance``
+    times the best seen. A 429, a 5xx or a connection error multiplies it by
+    ``decrease``, at most once per smoothed round trip so one burst counts
+    once. A Retry-After holds back every new request until it has passed.
+    Waiters are served first in, first out.
+    """
+
+    def __init__(
+        self, initial, maximum, minimum=1, decrease=0.5, latency_tolerance=2.0
+    ):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.smoothed_latency = None
+        self.best_latency = None
+        self._last_cut = 0.0
+        self._waiters = deque()
+
+    def _available(self):
+        return self.in_flight < int(self.limit) and time.monotonic() >= self.paused_until
+
+    def _wake(self):
+        while self._waiters and self._available():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self):
+        if not self._waiters and self._available():
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1  # the slot was handed over just before the cancel
+                self._wake()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, healthy, latency=None, retry_after=None):
+        """Free a slot; ``healthy`` is None when the request never finished."""
+        self.in_flight -= 1
+        now = time.monotonic()
+        if healthy:
+            if self.smoothed_latency is None:
+                self.smoothed_latency = self.best_latency = latency
+            else:
+                self.smoothed_latency = 0.9 * self.smoothed_latency + 0.1 * latency
+                # Let the best latency drift up so a slower network can recover.
+                self.best_latency = min(latency, self.best_latency * 1.001)
+            if self.smoothed_latency <= self.latency_tolerance * self.best_latency:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        elif healthy is False and now - self._last_cut >= (self.smoothed_latency or 1.0):
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._last_cut = now
+        if retry_after and now + retry_after > self.paused_until:
+            self.paused_until = now + retry_after
+            asyncio.get_running_loop().call_later(retry_after, self._wake)
+        self._wake()
+
+
+class FetchEngine:
+    """Shared asyncio HTTP client used by every scraper.
+
+    One pooled keep-alive session serves all requests. A ConcurrencyController
+    starts at ``concurrency`` requests in flight and adapts between 1 and
+    ``max_concurrency`` (default twice ``concurrency``) from the responses,
+    and ``rate``, if given, caps requests per second across all of them
+    (retries included). Retry-After on a 429 or 503 pauses every request and
+    replaces the exponential backoff for that retry. With a ``cache``
+    (see response_cache), fresh entries skip the network and stale ones are
+    revalidated conditionally. Every request is recorded in ``metrics``
+    (see metrics). ``site_url`` (or the METAL_ARCHIVES_URL environment
+    variable) sends requests for the site to another host, such as the
+    benchmarks' mock server. With an ``archive`` (see page_archive), every
+    complete 200 body from the network is also appended to it, and so is every
+    body served from the cache whose URL is not archived yet. Use as
+    ``async with FetchEngine() as engine``.
+    """
+
+    def __init__(
+        self,
+        concurrency=20,
+        max_concurrency=None,
+        timeout=10,
+        retries=3,
+        backoff=1.0,
+        headers=None,
+        rate=None,
+        cache=None,
+        metrics=METRICS,
+        site_url=None,
+        archive=None,
+    ):
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency or 2 * concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self.limiter = RateLimiter(rate) if rate else None
+        self.cache = cache
+        self.metrics = metrics
+        self.site_url = site_url or os.environ.get("METAL_ARCHIVES_URL")
+        self.archive = archive
+        self.session = None
+        self.controller = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            keepalive_timeout=30,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self.controller = ConcurrencyController(self.concurrency, self.max_concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        self.session = None
+
+    async def _read_until(self, response, until):
+        if hasattr(until, "reset"):
+            until.reset()
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(8192):
+            body += chunk
+            if until(body):
+                # Drop the rest of the page; the connection goes with it.
+                response.close()
+                return bytes(body), True
+        return bytes(body), False
+
+    async def _request(self, url, headers, timeout, until=None):
+        target = url
+        if self.site_url and url.startswith(SITE_URL):
+            target = self.site_url + url[len(SITE_URL):]
+        await self.controller.acquire()
+        healthy, latency, retry_after = None, None, None
+        try:
+            if self.limiter:
+                await self.limiter.acquire()
+            start = time.monotonic()
+            truncated = False
+            async with self.session.get(target, headers=headers, timeout=timeout) as response:
+                if until is None or response.status != 200:
+                    body = await response.read()
+                else:
+                    body, truncated = await self._read_until(response, until)
+            latency = time.monotonic() - start
+            self.metrics.observe_request(url, response.status, latency, len(body))
+            result = FetchResult(
+                url, response.status, dict(response.headers), body, truncated=truncated
+            )
+            healthy = result.status not in RETRY_STATUSES
+            if result.status in (429, 503):
+                retry_after = retry_after_seconds(result.headers)
+            return result
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            healthy = False
+            raise
+        finally:
+            self.controller.release(healthy, latency, retry_after)
+            self.metrics.gauge("concurrency_limit", int(self.controller.limit))
+
+    async def get(self, url, headers=None, timeout=None, until=None):
+        """GET ``url``, going through the response cache when there is one.
+
+        Returns the last response received, even if it is not a 200. Raises
+        ``FetchError`` only when no response could be obtained at all. With
+        ``until``, a 200 body is streamed and the download stops as soon as
+        ``until(body_so_far)`` is true; such truncated bodies are not cached.
+        An ``until`` with a ``reset()`` method has it called before each attempt.
+        """
+        cached = self.cache.lookup(url) if self.cache else None
+        if cached and cached.fresh:
+            self.metrics.cache_hit(url, "fresh")
+            self._archive_cached(url, cached.body)
+            return FetchResult(url, 200, cached.headers, cached.body, from_cache="fresh")
+        if cached:
+            headers = dict(headers or {}, **cached.validators())
+
+        result = await self._get_with_retries(url, headers, timeout, until)
+
+        if cached and result.status == 304:
+            self.cache.revalidated(url)
+            self.metrics.cache_hit(url, "revalidated")
+            self._archive_cached(url, cached.body)
+            return FetchResult(
+                url, 200, cached.headers, cached.body, from_cache="revalidated"
+            )
+        if result.status == 200 and not result.truncated:
+            if self.cache:
+                self.cache.store(url, result.body, result.headers)
+            if self.archive is not None:
+                self.archive.put(endpoint_of(url), url, result.body)
+        return result
+
+    def _archive_cached(self, url, body):
+        # Pages served from the cache still belong in the archive, but a
+        # cached body is only added when the URL has no archived page yet.
+        if self.archive is not None:
+            self.archive.put(endpoint_of(url), url, body, only_missing=True)
+
+    async def _get_with_retries(self, url, headers, timeout, until=None):
+        request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout else None
+        result = None
+        error = None
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2**attempt
+            try:
+                result = await self._request(url, headers, request_timeout, until)
+                if result.status not in RETRY_STATUSES:
+                    return result
+                retry_after = retry_after_seconds(result.headers)
+                if retry_after is not None:
+                    delay = retry_after
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+                self.metrics.error(url)
+            if attempt < self.retries:
+                self.metrics.retry(url)
+                await asyncio.sleep(delay)
+        if result is not None:
+            return result
+        raise FetchError(url, error)
+
+    async def get_json(self, url, timeout=None):
+        return await self.get(url, headers=JSON_HEADERS, timeout=timeout)
@@ -0,0 +1,69 @@
+"""Compact sets of numeric band and label IDs.
+
+IDs are held as one sorted, de-duplicated int64 array: 8 bytes per ID, so a
+few million IDs take a few MB rather than the hundreds a Python set of URL
+strings needs. Membership is tested for a whole listing page at once with a
+binary search. Band IDs run into the billions, which rules out a bitmap.
+"""
+
+import numpy as np
+import pandas as pd
+
+ID_RE = r"/(\d+)$"
+
+
+def to_ids(values):
+    """int64 array of ``values``; missing or non-numeric entries become -1."""
+    if isinstance(values, np.ndarray) and values.dtype == np.int64:
+        return values
+    if not isinstance(values, pd.Series):
+        values = pd.Series(list(values), dtype=object)
+    ids = pd.to_numeric(values, errors="coerce")
+    return ids.fillna(-1).to_numpy(dtype=np.int64)
+
+
+class IdSet:
+    def __init__(self, ids=()):
+        self.ids = np.unique(to_ids(ids))
+        self.ids = self.ids[self.ids >= 0]
+
+    @classmethod
+    def from_csv(cls, path, id_column, url_column=None, chunk_size=500_000):
+        """Load the IDs of a stored CSV output.
+
+        Rows without ``id_column`` (older band files only have URLs) take the
+        trailing number of ``url_column``.
+        """
+        columns = {id_column, url_column} - {None}
+        parts = []
+        for chunk in pd.read_csv(
+            path, usecols=lambda c: c in columns, dtype=str, chunksize=chunk_size
+        ):
+            ids = chunk[id_column] if id_column in chunk else pd.Series(index=chunk.index, dtype=object)
+            if url_column in chunk:
+                ids = ids.fillna(chunk[url_column].str.extract(ID_RE, expand=False))
+            parts.append(to_ids(ids))
+        return cls(np.concatenate(parts) if parts else ())
+
+    def contains(self, ids):
+        """Boolean array telling which of ``ids`` are in the set."""
+        ids = to_ids(ids)
+        if not len(self.ids):
+            return np.zeros(len(ids), dtype=bool)
+        positions = np.searchsorted(self.ids, ids)
+        positions[positions == len(self.ids)] = 0
+        return self.ids[positions] == ids
+
+    def add(self, ids):
+        ids = to_ids(ids)
+        self.ids = np.union1d(self.ids, ids[ids >= 0])
+
+    def __contains__(self, id):
+        return bool(self.contains([id])[0])
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes
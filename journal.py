@@ -0,0 +1,76 @@
+"""Append-only crawl journal for resumable listing crawls.
+
+The journal records, one line each, bands that have been written to the
+output (``B <band_id>``), listing pages whose bands are all written
+(``P <letter> <offset>``) and finished letters (``L <letter>``). Lines are
+flushed to the OS as they are appended and fsynced in batches. Replaying the
+file on start-up tells a resumed crawl exactly which pages and bands are
+still outstanding.
+"""
+
+import os
+
+from id_set import IdSet
+
+
+class CrawlJournal:
+    def __init__(self, path, sync_every=500):
+        self.path = path
+        self.sync_every = sync_every
+        self.done_bands = IdSet()
+        self.done_pages = set()
+        self.done_letters = set()
+        self._unsynced = 0
+        if os.path.exists(path):
+            self._replay()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _replay(self):
+        band_ids = []
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # torn final write from a crash
+                valid_bytes += len(raw)
+                kind, *fields = raw.decode("utf-8").split()
+                if kind == "B":
+                    band_ids.append(fields[0])
+                elif kind == "P":
+                    self.done_pages.add((fields[0], int(fields[1])))
+                elif kind == "L":
+                    self.done_letters.add(fields[0])
+        os.truncate(self.path, valid_bytes)
+        self.done_bands = IdSet(band_ids)
+
+    def _append(self, lines):
+        if not lines:
+            return
+        self._file.write("".join(lines))
+        self._file.flush()
+        self._unsynced += len(lines)
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def bands_written(self, band_ids):
+        band_ids = [str(band_id) for band_id in band_ids]
+        self.done_bands.add(band_ids)
+        self._append([f"B {band_id}\n" for band_id in band_ids])
+
+    def pages_written(self, letter, offsets):
+        self.done_pages.update((letter, offset) for offset in offsets)
+        self._append([f"P {letter} {offset}\n" for offset in offsets])
+
+    def letter_done(self, letter):
+        self.done_letters.add(letter)
+        self._append([f"L {letter}\n"])
+        self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        self.sync()
+        self._file.close()
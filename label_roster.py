@@ -1,55 +1,65 @@
-import requests
 import pandas as pd
+import argparse
 import os
-import concurrent.futures
-import time
-from bs4 import BeautifulSoup
+import asyncio
 
+from fragment_parser import anchor
+from http_engine import FetchEngine, FetchError
+from id_set import IdSet
+from metrics import METRICS, add_metrics_args, report
+from response_cache import ResponseCache
+from storage import DEFAULT_DB, Store
+from work_queue import DEFAULT_QUEUE, WorkQueue
 
-def get_last_processed_label():
-    output_file_path = "combined_roster.csv"
-    if not os.path.exists(output_file_path):
-        return None
+ROSTER_FILE = os.path.join("labels_rosters", "combined_roster.csv")
+ROSTER_DONE_FILE = os.path.join("labels_rosters", "roster_done.csv")
 
-    processed_df = pd.read_csv(output_file_path)
-    if processed_df.empty:
-        return None
 
-    last_label_id = processed_df["Label ID"].iloc[-1]
-    return last_label_id
-
-
-def fetch_band_data(label_id, max_retries=5):
-    url = f"https://www.metal-archives.com/label/ajax-bands/nbrPerPage/100/id/{label_id}?sEcho=1&iColumns=3&sColumns=&iDisplayStart=0&iDisplayLength=100&mDataProp_0=0&mDataProp_1=1&mDataProp_2=2&iSortCol_0=0&sSortDir_0=asc&iSortingCols=1&bSortable_0=true&bSortable_1=true&bSortable_2=true"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept": "application/json",
-        "Referer": "https://www.metal-archives.com/",
-    }
-
-    retries = 0
-    while retries < max_retries:
-        try:
-            response = requests.get(url, headers=headers, timeout=5)
-            if response.status_code == 200:
-                return label_id, response.json()
-            elif response.status_code == 429:
-                print(
-                    f"Rate limit hit for label ID {label_id}. Retrying in {2 ** retries} seconds..."
-                )
-                time.sleep(2**retries)  # Exponential backoff
-                retries += 1
-            else:
-                print(
-                    f"Failed to retrieve data for label ID {label_id}. Status Code: {response.status_code}"
-                )
-                return label_id, None
-        except requests.RequestException as e:
-            print(f"Request failed for label ID {label_id}: {e}")
-            return label_id, None
+def done_label_ids(output_file_path=ROSTER_FILE, done_file_path=ROSTER_DONE_FILE, chunk_size=500_000):
+    """IdSet of the labels whose roster is complete in the CSV output, and
+    a dict of the band IDs written so far for labels that may be cut short.
+
+    Only the done file is trusted as is. Roster files written before it
+    existed come from a scraper that read just a label's first
+    ROSTER_PAGE_SIZE bands: a label with fewer rows there is complete, while
+    one with a full page is fetched again and only its missing bands are added.
+    """
+    done = IdSet.from_csv(done_file_path, "Label ID") if os.path.exists(done_file_path) else IdSet()
+    partial = {}
+    if os.path.exists(output_file_path):
+        for chunk in pd.read_csv(output_file_path, dtype=str, chunksize=chunk_size):
+            chunk = chunk[~done.contains(chunk["Label ID"])]
+            for label_id, band_ids in chunk.groupby("Label ID")["Band ID"]:
+                partial.setdefault(int(label_id), set()).update(band_ids)
+        complete = [label_id for label_id, band_ids in partial.items() if len(band_ids) < ROSTER_PAGE_SIZE]
+        done.add(complete)
+        for label_id in complete:
+            del partial[label_id]
+    return done, partial
+
+
+ROSTER_PAGE_SIZE = 100
+ROSTER_URL = "https://www.metal-archives.com/label/ajax-bands/nbrPerPage/{page_size}/id/{label_id}?sEcho=1&iColumns=3&sColumns=&iDisplayStart={start}&iDisplayLength={page_size}&mDataProp_0=0&mDataProp_1=1&mDataProp_2=2&iSortCol_0=0&sSortDir_0=asc&iSortingCols=1&bSortable_0=true&bSortable_1=true&bSortable_2=true"
 
-    print(f"Exceeded max retries for label ID {label_id}. Skipping.")
+
+async def fetch_band_data(engine, label_id, start=0):
+    url = ROSTER_URL.format(page_size=ROSTER_PAGE_SIZE, label_id=label_id, start=start)
+
+    # 429s and transient errors are retried with exponential backoff by the engine.
+    try:
+        response = await engine.get_json(url)
+    except FetchError as e:
+        print(f"Request failed for label ID {label_id}: {e}")
+        return label_id, None
+
+    if response.status == 200:
+        return label_id, response.json()
+    elif response.status == 429:
+        print(f"Exceeded max retries for label ID {label_id}. Skipping.")
+    else:
+        print(
+            f"Failed to retrieve data for label ID {label_id}. Status Code: {response.status}"
+        )
     return label_id, None
 
 
@@ -58,66 +68,251 @@ def process_band_data(label_id, data):
         bands = data["aaData"]
         band_records = []
         for band in bands:
-            band_link = band[0]
-            soup = BeautifulSoup(band_link, "html.parser")
-            band_a_tag = soup.find("a")
-            if band_a_tag and "href" in band_a_tag.attrs:
-                band_url = band_a_tag["href"]
+            _, band_url = anchor(band[0])
+            if band_url:
                 band_id = band_url.split("/")[-1]
                 band_records.append({"Label ID": label_id, "Band ID": band_id})
         return band_records
     return []
 
 
-def append_to_csv(file_path, records):
+def append_to_csv(file_path, records, columns=("Label ID", "Band ID")):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
     file_exists = os.path.isfile(file_path)
-    df = pd.DataFrame(records, columns=["Label ID", "Band ID"])
+    df = pd.DataFrame(records, columns=list(columns))
     df.to_csv(file_path, mode="a", header=not file_exists, index=False)
 
 
-def main():
-    labels_df = pd.read_csv("labels/labels.csv")
+class RosterSink:
+    """Collects a label's roster pages and writes them once the roster is complete.
 
-    if "Name" not in labels_df.columns or "Label ID" not in labels_df.columns:
-        print("CSV file is missing 'Name' or 'Label ID' columns.")
-        return
+    An incomplete roster is dropped, so neither the store nor the CSV file
+    ever holds part of a label and a retry cannot duplicate rows.
+    """
+
+    def __init__(self, store=None, output_file_path=ROSTER_FILE, done_file_path=ROSTER_DONE_FILE):
+        self.store = store
+        self.output_file_path = output_file_path
+        self.done_file_path = done_file_path
+        self.pending = {}
+
+    def begin(self, label_id):
+        self.pending[label_id] = []
+
+    def add(self, label_id, records):
+        self.pending[label_id].extend(records)
+
+    def finish(self, label_id):
+        records = self.pending.pop(label_id)
+        METRICS.rows_written("roster", len(records))
+        if self.store is not None:
+            self.store.replace_roster(label_id, [record["Band ID"] for record in records])
+        else:
+            if records:
+                append_to_csv(self.output_file_path, records)
+            append_to_csv(self.done_file_path, [{"Label ID": label_id}], columns=["Label ID"])
+
+    def discard(self, label_id):
+        self.pending.pop(label_id, None)
+
+
+async def fetch_label_roster(engine, label_id, sink, known=()):
+    """Fetch every roster page of a label into ``sink``.
+
+    The first page's iTotalRecords gives the page count; the remaining pages
+    are requested concurrently. Returns ``(complete, rows, total)``, or None
+    when even the first page failed. Only complete rosters are written, less
+    the band IDs in ``known`` that are already in the output.
+    """
+    label_id, first = await fetch_band_data(engine, label_id, 0)
+    if first is None:
+        return None
+    total = int(first.get("iTotalRecords") or len(first.get("aaData", [])))
+    sink.begin(label_id)
+    seen = set(known)
+    rows = 0
+
+    def take(data):
+        nonlocal rows
+        rows += len(data.get("aaData", []))
+        with METRICS.timed_parse("ajax-bands"):
+            records = [
+                record
+                for record in process_band_data(label_id, data)
+                if record["Band ID"] not in seen
+            ]
+        seen.update(record["Band ID"] for record in records)
+        if records:
+            sink.add(label_id, records)
 
-    last_processed_label = get_last_processed_label()
-    start_processing = False if last_processed_label else True
+    async def fetch_page(start):
+        _, data = await fetch_band_data(engine, label_id, start)
+        if data is None:
+            return False
+        take(data)
+        return True
 
-    output_file_path = "labels_rosters/combined_roster.csv"
+    take(first)
+    fetched = await asyncio.gather(
+        *(fetch_page(start) for start in range(ROSTER_PAGE_SIZE, total, ROSTER_PAGE_SIZE))
+    )
+    complete = all(fetched) and rows >= total
+    if complete:
+        sink.finish(label_id)
+    else:
+        sink.discard(label_id)
+        print(f"Incomplete roster for label ID {label_id}: {rows} of {total} rows")
+    return complete, rows, total
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-        future_to_label = {}
+
+async def fetch_label(engine, row, sink, known=()):
+    return row, await fetch_label_roster(engine, row["Label ID"], sink, known)
+
+
+async def fetch_rosters(labels_df, output_file_path, store=None, rate=None, cache=None):
+    partial = {}
+    if store is not None:
+        done = IdSet(list(store.scraped_label_ids(labels_df["Label ID"])))
+    else:
+        done, partial = done_label_ids(output_file_path)
+    labels_df = labels_df[~done.contains(labels_df["Label ID"])]
+    sink = RosterSink(store, output_file_path)
+
+    async with FetchEngine(
+        concurrency=3, timeout=5, retries=5, rate=rate, cache=cache
+    ) as engine:
+        tasks = []
         for _, row in labels_df.iterrows():
-            label_id = row["Label ID"]
-            label_name = row["Name"]
+            tasks.append(fetch_label(engine, row, sink, partial.get(row["Label ID"], ())))
 
-            if not start_processing:
-                if label_id == last_processed_label:
-                    start_processing = True
+        incomplete = 0
+        METRICS.expect(len(tasks))
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                _, result = await next_done
+            except Exception as e:
+                print(f"Error processing label: {e}")
                 continue
+            METRICS.advance()
+            if result is None or not result[0]:
+                incomplete += 1
 
-            if start_processing:
-                future = executor.submit(fetch_band_data, label_id)
-                future_to_label[future] = row
+    if incomplete:
+        print(
+            f"{incomplete} labels have incomplete rosters; none of their rows were "
+            "written and they will be retried next run."
+        )
 
-        for future in concurrent.futures.as_completed(future_to_label):
-            row = future_to_label[future]
-            label_id = row["Label ID"]
-            label_name = row["Name"]
 
-            try:
-                label_id, data = future.result()
-                band_records = process_band_data(label_id, data)
+async def fetch_queued_rosters(queue, store, rate=None, claim_size=20, cache=None):
+    """Fetch rosters for label IDs claimed from a work queue shared with other workers."""
+    sink = RosterSink(store)
+    async with FetchEngine(
+        concurrency=3, timeout=5, retries=5, rate=queue.rate_share(rate), cache=cache
+    ) as engine:
+        while True:
+            units = queue.claim("label", claim_size)
+            if not units:
+                if queue.outstanding("label"):
+                    await asyncio.sleep(5)
+                    continue
+                break
+            if engine.limiter:
+                engine.limiter.rate = queue.rate_share(rate)
 
-                if band_records:
-                    append_to_csv(output_file_path, band_records)
+            async with queue.renewing("label", [label_id for label_id, _ in units]):
+                results = await asyncio.gather(
+                    *(fetch_label_roster(engine, int(label_id), sink) for label_id, _ in units)
+                )
+            finished = []
+            for (key, _), result in zip(units, results):
+                if result is None or not result[0]:
+                    continue  # left leased; it is retried once the lease expires
+                finished.append(key)
+            store.flush()
+            queue.complete("label", finished)
+            METRICS.advance(len(finished))
 
-                # os.system("cls" if os.name == "nt" else "clear")
-                print(f"Processed {label_name}, ID: {label_id}")
-            except Exception as e:
-                print(f"Error processing label {label_name} (ID: {label_id}): {e}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape label rosters.")
+    parser.add_argument(
+        "--store",
+        nargs="?",
+        const=DEFAULT_DB,
+        help=f"write rosters to the SQLite store (default {DEFAULT_DB}); "
+        "labels already scraped there are skipped",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="request budget in requests per second; in queue mode it is "
+        "shared evenly by all active workers",
+    )
+    parser.add_argument(
+        "--queue",
+        nargs="?",
+        const=DEFAULT_QUEUE,
+        help=f"claim label IDs from a shared work queue (default {DEFAULT_QUEUE}) "
+        "so several processes or hosts can split the crawl; requires --store",
+    )
+    parser.add_argument(
+        "--seed",
+        action="store_true",
+        help="with --queue, enqueue every label still missing a roster first",
+    )
+    add_metrics_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    labels_df = pd.read_csv("labels/labels.csv")
+
+    if "Name" not in labels_df.columns or "Label ID" not in labels_df.columns:
+        print("CSV file is missing 'Name' or 'Label ID' columns.")
+        return
+
+    if args.queue and not args.store:
+        print("--queue needs --store so all workers write to one place.")
+        return
+    store = Store(args.store) if args.store else None
+    cache = ResponseCache()
+
+    try:
+        if args.queue:
+            queue = WorkQueue(args.queue)
+            try:
+                if args.seed:
+                    done = store.scraped_label_ids(labels_df["Label ID"])
+                    pending = [
+                        (label_id, name)
+                        for label_id, name in zip(labels_df["Label ID"], labels_df["Name"])
+                        if label_id not in done
+                    ]
+                    queue.enqueue("label", pending)
+                    print(f"Queued {len(pending)} labels")
+                asyncio.run(
+                    report(
+                        fetch_queued_rosters(queue, store, args.rate, cache=cache),
+                        args.metrics,
+                        args.metrics_interval,
+                    )
+                )
+            finally:
+                queue.close()
+        else:
+            asyncio.run(
+                report(
+                    fetch_rosters(labels_df, ROSTER_FILE, store, args.rate, cache),
+                    args.metrics,
+                    args.metrics_interval,
+                )
+            )
+    finally:
+        cache.close()
+        if store is not None:
+            store.close()
 
     print("All band records have been processed and saved successfully.")
 
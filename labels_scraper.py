@@ -1,46 +1,31 @@
 import os
 import re
 import time
-import json
-import requests
+import argparse
+import asyncio
 import pandas as pd
-import concurrent.futures
-from bs4 import BeautifulSoup
-from bs4 import BeautifulSoup
-import re
-
-
-def fetch_label_data(label):
-
-    def clean_text(text):
-        return (
-            BeautifulSoup(text, "html.parser").get_text().replace("\xa0", " ").strip()
-            if text
-            else ""
-        )
 
-    label_name = clean_text(label[1])
-    specialization = clean_text(label[2])
-    status = clean_text(label[3])
-    country = clean_text(label[4])
+from fragment_parser import anchor, text
+from http_engine import FetchEngine, FetchError
+from id_set import IdSet
+from listing_planner import crawl_listing
+from metrics import METRICS, add_metrics_args, report
+from response_cache import ResponseCache
+from storage import DEFAULT_DB, Store
 
-    label_url_soup = BeautifulSoup(label[1], "html.parser").a
-    label_url = (
-        label_url_soup["href"]
-        if label_url_soup and label_url_soup.has_attr("href")
-        else None
-    )
+try:
+    from parquet_output import DatasetWriter
+except ImportError:  # pyarrow is only needed for --parquet
+    DatasetWriter = None
 
-    website = None
-    if label[5]:
-        website_soup = BeautifulSoup(label[5], "html.parser").find("a")
-        website = (
-            website_soup["href"]
-            if website_soup and website_soup.has_attr("href")
-            else None
-        )
 
-    online_shopping = clean_text(label[6])
+def fetch_label_data(label):
+    label_name, label_url = anchor(label[1])
+    specialization = text(label[2])
+    status = text(label[3])
+    country = text(label[4])
+    website = anchor(label[5])[1] if label[5] else None
+    online_shopping = text(label[6])
 
     label_id = re.search(r"/(\d+)", label_url).group(1) if label_url else None
 
@@ -78,78 +63,135 @@ def save_labels_to_csv(labels):
         df.to_csv(csv_path, mode="w", header=True, index=False)
 
 
-def scrape_labels(letter, existing_labels):
-    start_time = time.time()
-    labels = []
-    url_template = "https://www.metal-archives.com/label/ajax-list/json/1/l/{}?sEcho=1&iColumns=7&sColumns=&iDisplayStart={}&iDisplayLength=200&mDataProp_0=0&mDataProp_1=1&mDataProp_2=2&mDataProp_3=3&mDataProp_4=4&mDataProp_5=5&mDataProp_6=6&iSortCol_0=1&sSortDir_0=asc&iSortingCols=1&bSortable_0=false&bSortable_1=true&bSortable_2=true&bSortable_3=true&bSortable_4=true&bSortable_5=false&bSortable_6=true"
-
-    start = 0
-    chunk_size = 200
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        while True:
-            url = url_template.format(letter, start)
-            response = requests.get(url, headers=headers)
-            if response.status_code != 200:
-                print(
-                    f"Failed to retrieve data for {letter} at offset {start} - Status Code: {response.status_code}"
-                )
-                if response.status_code == 429:
-                    print("Rate limited. Waiting 2 seconds before retrying...")
-                    time.sleep(2)
-                    continue
-                break
-
-            data = json.loads(response.content.decode("utf-8"))
-            if not data["aaData"]:
-                break
-
-            label_data_futures = [
-                executor.submit(fetch_label_data, label) for label in data["aaData"]
-            ]
-            for future in concurrent.futures.as_completed(label_data_futures):
-                label_data = future.result()
-                if (
-                    label_data and label_data[1] not in existing_labels
-                ):  # Avoid duplicates
-                    labels.append(label_data)
-
-            start += chunk_size
-            time.sleep(1)
-
-        # os.system('cls' if os.name == 'nt' else 'clear')
-        elapsed_time = time.time() - start_time
-        hours, rem = divmod(elapsed_time, 3600)
-        minutes, seconds = divmod(rem, 60)
-        print(f"Time elapsed: {int(hours):02}:{int(minutes):02}:{int(seconds):02}")
-        print(f"Scraped {len(labels)} labels for letter {letter}")
+LABELS_PAGE_SIZE = 200
+LABELS_URL = "https://www.metal-archives.com/label/ajax-list/json/1/l/{}?sEcho=1&iColumns=7&sColumns=&iDisplayStart={}&iDisplayLength=200&mDataProp_0=0&mDataProp_1=1&mDataProp_2=2&mDataProp_3=3&mDataProp_4=4&mDataProp_5=5&mDataProp_6=6&iSortCol_0=1&sSortDir_0=asc&iSortingCols=1&bSortable_0=false&bSortable_1=true&bSortable_2=true&bSortable_3=true&bSortable_4=true&bSortable_5=false&bSortable_6=true"
+
+
+async def fetch_labels_page(engine, letter, start):
+    """Return the label listing JSON at ``start``, or None on failure."""
+    url = LABELS_URL.format(letter, start)
+    # 429s are retried with backoff inside the engine.
+    try:
+        response = await engine.get_json(url)
+    except FetchError as e:
+        print(f"Failed to retrieve data for {letter} at offset {start} - {e}")
+        return None
+    if response.status != 200:
+        print(
+            f"Failed to retrieve data for {letter} at offset {start} - Status Code: {response.status}"
+        )
+        return None
+    return response.json()
+
 
+def save_labels(letter, labels, store=None, parquet=None):
+    print(f"Scraped {len(labels)} labels for letter {letter}")
+    METRICS.rows_written("labels", len(labels))
     if labels:
-        save_labels_to_csv(labels)
+        if store is not None:
+            store.upsert_labels(labels)
+        else:
+            save_labels_to_csv(labels)
+        if parquet is not None:
+            parquet.add(letter, labels)
 
 
 def load_existing_labels():
     csv_path = os.path.join("labels", "labels.csv")
     if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path)
-        return set(df["ID"])
-    return set()
+        return IdSet.from_csv(csv_path, "Label ID")
+    return IdSet()
 
 
-def main():
-    existing_labels = load_existing_labels()
+async def scrape_all(existing_labels, store=None, parquet=None, rate=None, cache=None):
     categories = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ") + ["NBR"]
+    start_time = time.time()
+    labels = {letter: [] for letter in categories}
+
+    async def on_page(letter, start, rows):
+        with METRICS.timed_parse("label-list"):
+            page = [fetch_label_data(label) for label in rows]
+        known = existing_labels.contains([label_data[0] for label_data in page])
+        labels[letter].extend(
+            label_data for label_data, is_known in zip(page, known) if not is_known
+        )
+
+    finished = set()
+    pending = list(categories)
+
+    def on_done(letter, complete):
+        if not complete:
+            print(f"Labels for letter {letter} are incomplete")
+        finished.add(letter)
+        # Letters finish in any order; write them out in alphabetical order.
+        while pending and pending[0] in finished:
+            letter = pending.pop(0)
+            save_labels(letter, labels.pop(letter), store, parquet)
+
+    # All letters are paged concurrently; the engine's limits set the pace.
+    async with FetchEngine(concurrency=5, rate=rate, cache=cache) as engine:
+
+        async def fetch(letter, start):
+            return await fetch_labels_page(engine, letter, start)
+
+        print(f"Scraping labels for {len(categories)} letters")
+        await crawl_listing(categories, fetch, LABELS_PAGE_SIZE, on_page, on_done)
+
+    # os.system('cls' if os.name == 'nt' else 'clear')
+    elapsed_time = time.time() - start_time
+    hours, rem = divmod(elapsed_time, 3600)
+    minutes, seconds = divmod(rem, 60)
+    print(f"Time elapsed: {int(hours):02}:{int(minutes):02}:{int(seconds):02}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape the label listings.")
+    parser.add_argument(
+        "--store",
+        nargs="?",
+        const=DEFAULT_DB,
+        help=f"upsert labels into the SQLite store (default {DEFAULT_DB}) "
+        "instead of appending to labels/labels.csv",
+    )
+    parser.add_argument(
+        "--parquet",
+        metavar="DIR",
+        help="also write labels to a Parquet dataset under DIR, partitioned by letter",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="request budget in requests per second across all letters",
+    )
+    add_metrics_args(parser)
+    return parser.parse_args()
 
-    for letter in categories:
-        print(f"Scraping labels for letter {letter}")
-        scrape_labels(letter, existing_labels)
+
+def main():
+    args = parse_args()
+    if args.parquet and DatasetWriter is None:
+        print("--parquet needs pyarrow (pip install pyarrow).")
+        return
+    store = Store(args.store) if args.store else None
+    parquet = DatasetWriter(args.parquet, "labels") if args.parquet else None
+    # Upserts make the store idempotent, so only the CSV path needs dedup.
+    existing_labels = load_existing_labels() if store is None else IdSet()
+    cache = ResponseCache()
+    try:
+        asyncio.run(
+            report(
+                scrape_all(existing_labels, store, parquet, args.rate, cache),
+                args.metrics,
+                args.metrics_interval,
+            )
+        )
+    finally:
+        cache.close()
+        if store is not None:
+            store.close()
+        if parquet is not None:
+            parquet.flush()
 
 
 if __name__ == "__main__":
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept": "application/json",
-        "Referer": "https://www.metal-archives.com/",
-    }
     main()
@@ -0,0 +1,75 @@
+"""Concurrent pagination of the site's listing endpoints.
+
+The browse endpoints (``browse/ajax-letter`` for bands, ``label/ajax-list``
+for labels) report ``iTotalRecords`` on every page. The planner reads it from
+the first page of each category, puts every remaining ``(category, offset)``
+page in flight at once on the shared engine, and hands each category's pages
+back in offset order. Output keeps the order of a sequential walk within a
+category, while enumeration time is set by the engine's rate budget rather
+than by latency times page count.
+"""
+
+import asyncio
+
+from metrics import METRICS
+
+
+def plan_offsets(total, page_size):
+    """Offsets of every page of a listing with ``total`` records."""
+    return list(range(0, max(total, 1), page_size))
+
+
+async def _crawl_category(category, fetch, page_size, on_page, done_pages):
+    first = await fetch(category, 0)
+    if first is None:
+        return False
+    total = int(first.get("iTotalRecords") or 0)
+    offsets = [
+        offset
+        for offset in plan_offsets(total, page_size)
+        if (category, offset) not in done_pages
+    ]
+    METRICS.expect(len(offsets))
+    pages = {
+        offset: asyncio.ensure_future(fetch(category, offset))
+        for offset in offsets
+        if offset
+    }
+
+    # Pages are awaited in offset order while all of them download concurrently.
+    try:
+        for offset in offsets:
+            data = first if offset == 0 else await pages[offset]
+            if data is None:
+                return False  # later pages are retried on the next run
+            if data["aaData"]:
+                await on_page(category, offset, data["aaData"])
+            METRICS.advance()
+    finally:
+        for page in pages.values():
+            page.cancel()
+    return True
+
+
+async def crawl_listing(
+    categories, fetch, page_size, on_page, on_done=None, done_pages=()
+):
+    """Fetch every page of every category concurrently.
+
+    ``fetch(category, offset)`` returns the page JSON or None on failure.
+    ``on_page(category, offset, rows)`` is awaited for each non-empty page in
+    offset order per category, and ``on_done(category, complete)`` once a
+    category ends; ``complete`` is False when a page could not be fetched, in
+    which case the pages after it are not handed out. Pages listed in
+    ``done_pages`` as ``(category, offset)`` are not fetched again.
+    Returns ``{category: complete}``.
+    """
+
+    async def crawl(category):
+        complete = await _crawl_category(category, fetch, page_size, on_page, done_pages)
+        if on_done is not None:
+            on_done(category, complete)
+        return complete
+
+    results = await asyncio.gather(*(crawl(category) for category in categories))
+    return dict(zip(categories, results))
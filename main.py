@@ -1,44 +1,72 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-import json
+import argparse
+import asyncio
+import hashlib
 import os
 import re
-import concurrent.futures
-import time
 
-# Set up a requests session with retry logic
-session = requests.Session()
-adapter = requests.adapters.HTTPAdapter(max_retries=3)
-session.mount("https://", adapter)
+from band_header import FIELD_COLUMNS, HeaderScan, header_fields, photo_url
+from fragment_parser import anchor, text
+from http_engine import FetchEngine, FetchError
+from id_set import IdSet
+from journal import CrawlJournal
+from listing_planner import crawl_listing, plan_offsets
+from metrics import METRICS, add_metrics_args, report
+from response_cache import ResponseCache
+from storage import DEFAULT_DB, Store
+from work_queue import DEFAULT_QUEUE, WorkQueue
 
-CHECKPOINT_FILE = "checkpoint.json"
+try:
+    from parquet_output import DatasetWriter
+except ImportError:  # pyarrow is only needed for --parquet
+    DatasetWriter = None
 
+JOURNAL_FILE = "crawl_journal.log"
+CATEGORIES = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ") + ["NBR", "~"]
+PAGE_SIZE = 500
+FINGERPRINT_FILE = "band_fingerprints.csv"
+CHANGED_BANDS_FILE = "changed_bands.csv"
+PREVIOUS_CHANGED_BANDS_FILE = "changed_bands.previous.csv"
+BAND_DETAILS_FILE = "band_details.csv"
 
-def fetch_band_page(band):
-    band_html = BeautifulSoup(band[0], "html.parser")
-    band_name = band_html.text
-    band_url = band_html.a["href"]
+
+def parse_listing_row(band):
+    band_name, band_url = anchor(band[0])
     country = band[1]
     genre = band[2]
-    status = BeautifulSoup(band[3], "html.parser").text
+    status = text(band[3])
 
     band_id = re.search(r"/(\d+)", band_url).group(1)
+    return [band_id, band_name, band_url, country, genre, status]
+
+
+def row_fingerprint(name, country, genre, status):
+    key = "\x1f".join([name, country or "", genre or "", status or ""])
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+async def fetch_band_page(engine, listing, details=False):
+    """Band row with its photo URL, plus the header fields when ``details``.
+
+    Only the head of the band page is downloaded: the stream stops once the
+    photo anchor (or, with ``details``, the whole header) has arrived.
+    """
+    band_id, band_name, band_url, country, genre, status = listing
+    row = [band_id, band_name, band_url, country, genre, status, None]
+    extra = [None] * len(FIELD_COLUMNS) if details else []
 
     try:
-        band_page_response = session.get(band_url, headers=headers, timeout=5)
-        if band_page_response.status_code == 200:
-            band_page_soup = BeautifulSoup(band_page_response.content, "html.parser")
-            photo_img_tag = band_page_soup.find("a", {"id": "photo"})
-            photo_url = photo_img_tag["href"] if photo_img_tag else None
-            # os.system("cls" if os.name == "nt" else "clear")
-            print(
-                f"Band: {band_name}, Country: {country}, Genre: {genre}, Status: {status}, Photo URL: {photo_url}"
-            )
-            return [band_id, band_name, band_url, country, genre, status, photo_url]
-    except requests.RequestException as e:
+        band_page_response = await engine.get(
+            band_url, timeout=5, until=HeaderScan(fields=details)
+        )
+        if band_page_response.status == 200:
+            with METRICS.timed_parse("band-page"):
+                row[6] = photo_url(band_page_response.body)
+                if details:
+                    extra = header_fields(band_page_response.body)
+    except FetchError as e:
         print(f"Error fetching band page for {band_name}: {e}")
-    return [band_id, band_name, band_url, country, genre, status, None]
+    return row + extra
 
 
 def save_to_csv(bands):
@@ -54,92 +82,437 @@ def save_to_csv(bands):
     )
 
 
-def load_checkpoint():
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "r") as f:
-            return json.load(f)
-    return {"letter": None, "start": 0}
+def save_band_details(details):
+    df = pd.DataFrame(details, columns=["Band ID"] + FIELD_COLUMNS)
+    df.to_csv(
+        BAND_DETAILS_FILE,
+        mode="a",
+        header=not os.path.exists(BAND_DETAILS_FILE),
+        index=False,
+    )
 
 
-def save_checkpoint(letter, start):
-    with open(CHECKPOINT_FILE, "w") as f:
-        json.dump({"letter": letter, "start": start}, f)
+def save_bands(bands, store=None, parquet=None, letter=None):
+    """Write band rows; header fields past the seventh column go to the band details."""
+    METRICS.rows_written("bands", len(bands))
+    if bands and len(bands[0]) > 7:
+        details = [[band[0]] + band[7:] for band in bands]
+        if store is not None:
+            store.upsert_band_details(details)
+        else:
+            save_band_details(details)
+        bands = [band[:7] for band in bands]
+    if store is not None:
+        store.upsert_bands(bands, letter)
+    else:
+        save_to_csv(bands)
+    if parquet is not None:
+        parquet.add(letter, bands)
 
 
-def scrape_letter_bands(letter, existing_bands):
-    bands = []
-    url_template = "https://www.metal-archives.com/browse/ajax-letter/l/{}/json/1?sEcho=1&iColumns=4&sColumns=&iDisplayStart={}&iDisplayLength=500&mDataProp_0=0&mDataProp_1=1&mDataProp_2=2&mDataProp_3=3&iSortCol_0=0&sSortDir_0=asc&iSortingCols=1&bSortable_0=true&bSortable_1=true&bSortable_2=true&bSortable_3=false"
+def save_changed_bands(bands):
+    df = pd.DataFrame([band[:3] for band in bands], columns=["Band ID", "Name", "URL"])
+    df.to_csv(
+        CHANGED_BANDS_FILE,
+        mode="a",
+        header=not os.path.exists(CHANGED_BANDS_FILE),
+        index=False,
+    )
 
-    checkpoint = load_checkpoint()
-    start = checkpoint["start"] if checkpoint["letter"] == letter else 0
-    chunk_size = 1000  # Increased chunk size for fewer I/O operations
-    chunk_bands = []
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        while True:
-            url = url_template.format(letter, start)
-            response = session.get(url, headers=headers)
-            if response.status_code != 200:
-                print(
-                    f"Failed to retrieve data for {letter} at offset {start} - Status Code: {response.status_code}"
-                )
-                break
+def rotate_changed_bands():
+    """Start a fresh changed-bands list, keeping the last run's one aside."""
+    if os.path.exists(CHANGED_BANDS_FILE):
+        os.replace(CHANGED_BANDS_FILE, PREVIOUS_CHANGED_BANDS_FILE)
+
+
+def load_fingerprints():
+    if os.path.exists(FINGERPRINT_FILE):
+        df = pd.read_csv(FINGERPRINT_FILE, dtype=str)
+        return dict(zip(df["Band ID"], df["Fingerprint"]))
+    if os.path.exists("metal_bands.csv"):
+        # First incremental run: derive fingerprints from what is already stored.
+        df = pd.read_csv(
+            "metal_bands.csv",
+            dtype=str,
+            usecols=["Band ID", "Name", "Country", "Genre", "Status"],
+        ).fillna("")
+        return {
+            band_id: row_fingerprint(name, country, genre, status)
+            for band_id, name, country, genre, status in zip(
+                df["Band ID"], df["Name"], df["Country"], df["Genre"], df["Status"]
+            )
+        }
+    return {}
+
+
+def save_fingerprints(fingerprints):
+    df = pd.DataFrame(list(fingerprints.items()), columns=["Band ID", "Fingerprint"])
+    df.to_csv(FINGERPRINT_FILE + ".tmp", index=False)
+    os.replace(FINGERPRINT_FILE + ".tmp", FINGERPRINT_FILE)
+
+
+def compact_bands_file(path="metal_bands.csv"):
+    # Changed bands are appended again; keep only their newest row.
+    df = pd.read_csv(path, dtype=str)
+    df.drop_duplicates(subset="Band ID", keep="last").to_csv(path, index=False)
+
+
+def select_bands(listings, existing_bands, fingerprints):
+    """Pick the listing rows that need a band page fetch.
+
+    Without fingerprints every band whose ID is not in the ``existing_bands``
+    IdSet is selected. With them (incremental mode) a band is selected when it
+    is new or its name, country, genre or status changed. ``fingerprints`` is
+    left alone: a band's new fingerprint is only recorded once the band is
+    written, by ``LetterWriter``.
+    """
+    if fingerprints is None:
+        known = existing_bands.contains([listing[0] for listing in listings])
+        return [listing for listing, is_known in zip(listings, known) if not is_known]
+    selected = []
+    for listing in listings:
+        band_id, band_name, band_url, country, genre, status = listing
+        if fingerprints.get(band_id) != row_fingerprint(band_name, country, genre, status):
+            selected.append(listing)
+    return selected
+
+
+LISTING_URL = "https://www.metal-archives.com/browse/ajax-letter/l/{}/json/1?sEcho=1&iColumns=4&sColumns=&iDisplayStart={}&iDisplayLength=500&mDataProp_0=0&mDataProp_1=1&mDataProp_2=2&mDataProp_3=3&iSortCol_0=0&sSortDir_0=asc&iSortingCols=1&bSortable_0=true&bSortable_1=true&bSortable_2=true&bSortable_3=false"
+
+
+async def fetch_listing_page(engine, letter, start):
+    """Return the listing JSON at ``start`` (empty aaData past the end), or None on failure."""
+    url = LISTING_URL.format(letter, start)
+    try:
+        response = await engine.get_json(url)
+    except FetchError as e:
+        print(f"Failed to retrieve data for {letter} at offset {start} - {e}")
+        return None
+    if response.status != 200:
+        print(
+            f"Failed to retrieve data for {letter} at offset {start} - Status Code: {response.status}"
+        )
+        return None
+    return response.json()
+
+
+async def enrich_listing_page(
+    engine, rows, existing_bands, fingerprints=None, store=None, skip_ids=None, details=False
+):
+    """Fetch band pages for the rows of one listing page that need it."""
+    # Decide from the listing alone which bands are worth a page fetch.
+    with METRICS.timed_parse("ajax-letter"):
+        listings = list(map(parse_listing_row, rows))
+    if skip_ids is not None:
+        skipped = skip_ids.contains([listing[0] for listing in listings])
+        listings = [listing for listing, skip in zip(listings, skipped) if not skip]
+    if store is not None:
+        existing_bands = IdSet(store.existing_band_ids(listing[0] for listing in listings))
+    selected = select_bands(listings, existing_bands, fingerprints)
+
+    # All selected band pages are in flight at once on the shared session;
+    # the engine caps how many hit the network together.
+    return await asyncio.gather(
+        *(fetch_band_page(engine, listing, details) for listing in selected)
+    )
 
-            data = json.loads(response.content.decode("utf-8"))
-            if not data["aaData"]:
-                break
 
-            band_data_futures = [
-                executor.submit(fetch_band_page, band) for band in data["aaData"]
-            ]
-            for future in concurrent.futures.as_completed(band_data_futures):
-                band_data = future.result()
-                if band_data and band_data[2] not in existing_bands:
-                    chunk_bands.append(band_data)
+class LetterWriter:
+    """Writes one letter's enriched listing pages in chunks, in page order.
 
-                    if len(chunk_bands) >= chunk_size:
-                        save_to_csv(chunk_bands)
-                        chunk_bands.clear()
+    Bands and pages are journaled only once they are safely in the output, so
+    a resumed crawl skips exactly what was written. In incremental mode the
+    written bands' fingerprints are recorded at the same point, so a crash
+    never marks a band unchanged before it is in the output.
+    """
 
-            save_checkpoint(letter, start)  # Save progress at each offset
-            start += 500
-            time.sleep(1)  # Reduced sleep time for faster processing
+    def __init__(
+        self, letter, journal, fingerprints=None, store=None, parquet=None, chunk_size=1000
+    ):
+        self.letter = letter
+        self.journal = journal
+        self.fingerprints = fingerprints
+        self.store = store
+        self.parquet = parquet
+        self.chunk_size = chunk_size
+        self.bands = []
+        self.pages = []
+        self.changed = 0
 
-    if chunk_bands:
-        save_to_csv(chunk_bands)
+    def add(self, start, page_bands):
+        self.changed += len(page_bands)
+        self.bands.extend(page_bands)
+        self.pages.append(start)
+        if len(self.bands) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.bands:
+            save_bands(self.bands, self.store, self.parquet, self.letter)
+            if self.fingerprints is not None:
+                save_changed_bands(self.bands)
+                for band in self.bands:
+                    self.fingerprints[band[0]] = row_fingerprint(band[1], band[3], band[4], band[5])
+                save_fingerprints(self.fingerprints)
+            if self.parquet is not None:
+                self.parquet.flush()
+            if self.store is not None:
+                self.store.flush()
+        self.journal.bands_written(band[0] for band in self.bands)
+        self.journal.pages_written(self.letter, self.pages)
+        self.bands.clear()
+        self.pages.clear()
 
 
 def load_existing_bands():
     if os.path.exists("metal_bands.csv"):
-        df = pd.read_csv("metal_bands.csv")
-        return set(df["URL"])
-    return set()
+        return IdSet.from_csv("metal_bands.csv", "Band ID", url_column="URL")
+    return IdSet()
+
+
+async def scrape_all(
+    existing_bands,
+    journal,
+    fingerprints=None,
+    store=None,
+    parquet=None,
+    rate=None,
+    details=False,
+    cache=None,
+):
+    """Crawl every unfinished letter at once under the engine's rate limit.
+
+    Pages already in the journal are skipped; bands of a half-written page
+    that made it to the output are skipped via the journal's band IDs.
+    """
+    letters = [letter for letter in CATEGORIES if letter not in journal.done_letters]
+    writers = {
+        letter: LetterWriter(letter, journal, fingerprints, store, parquet)
+        for letter in letters
+    }
+
+    async with FetchEngine(concurrency=10, rate=rate, cache=cache) as engine:
+
+        async def fetch(letter, start):
+            return await fetch_listing_page(engine, letter, start)
+
+        async def on_page(letter, start, rows):
+            page_bands = await enrich_listing_page(
+                engine,
+                rows,
+                existing_bands,
+                fingerprints,
+                store,
+                journal.done_bands,
+                details,
+            )
+            writers[letter].add(start, page_bands)
+
+        def on_done(letter, complete):
+            writers[letter].flush()
+            # Only a letter read to its end is final; failures are retried on resume.
+            if complete:
+                journal.letter_done(letter)
+            print(f"Finished bands in {letter}" + ("" if complete else " (incomplete)"))
+
+        print(f"Scraping bands in {len(letters)} letters")
+        await crawl_listing(
+            letters, fetch, PAGE_SIZE, on_page, on_done, journal.done_pages
+        )
+
+    if fingerprints is not None:
+        save_fingerprints(fingerprints)
+    return sum(writer.changed for writer in writers.values())
+
+
+def seed_listing_queue(queue):
+    return queue.enqueue("listing", [(f"{letter}:0", None) for letter in CATEGORIES])
+
+
+async def run_listing_worker(queue, store, parquet=None, rate=None, details=False, cache=None):
+    """Work through listing pages claimed from a queue shared with other workers.
+
+    Each unit is one ``letter:offset`` page. The first page of a letter queues
+    all of the letter's other pages from its iTotalRecords, so the workers
+    split a letter between them as soon as its size is known.
+    """
+    async with FetchEngine(
+        concurrency=10, rate=queue.rate_share(rate), cache=cache
+    ) as engine:
+        while True:
+            units = queue.claim("listing")
+            if not units:
+                if queue.outstanding("listing"):
+                    await asyncio.sleep(5)
+                    continue
+                break
+            if engine.limiter:
+                engine.limiter.rate = queue.rate_share(rate)
+            key, _ = units[0]
+            letter, start = key.rsplit(":", 1)
+            start = int(start)
+
+            async with queue.renewing("listing", [key]):
+                data = await fetch_listing_page(engine, letter, start)
+                if data is None:
+                    queue.release("listing", [key])
+                    continue
+                if start == 0:
+                    total = int(data.get("iTotalRecords") or 0)
+                    queue.enqueue(
+                        "listing",
+                        [(f"{letter}:{offset}", None) for offset in plan_offsets(total, PAGE_SIZE)[1:]],
+                    )
+                rows = data["aaData"]
+                if rows:
+                    page_bands = await enrich_listing_page(
+                        engine, rows, IdSet(), store=store, details=details
+                    )
+                    if page_bands:
+                        save_bands(page_bands, store, parquet, letter)
+                        if parquet is not None:
+                            parquet.flush()
+                    store.flush()
+            queue.complete("listing", [key])
+            print(f"Finished {letter} at offset {start} ({len(rows)} bands listed)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape the band listings.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"only fetch bands that are new or whose listing row changed, "
+        f"and list them in {CHANGED_BANDS_FILE} for the discography stage "
+        f"(band_scraper.py --bands-file {CHANGED_BANDS_FILE} --rescrape); "
+        f"the previous run's list is moved to {PREVIOUS_CHANGED_BANDS_FILE}",
+    )
+    parser.add_argument(
+        "--store",
+        nargs="?",
+        const=DEFAULT_DB,
+        help=f"write bands to the SQLite store (default {DEFAULT_DB}) "
+        "instead of metal_bands.csv",
+    )
+    parser.add_argument(
+        "--parquet",
+        metavar="DIR",
+        help="also write bands to a Parquet dataset under DIR, partitioned by letter",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="request budget in requests per second; in queue mode it is "
+        "shared evenly by all active workers",
+    )
+    parser.add_argument(
+        "--queue",
+        nargs="?",
+        const=DEFAULT_QUEUE,
+        help=f"claim listing pages from a shared work queue (default {DEFAULT_QUEUE}) "
+        "so several processes or hosts can split the crawl; requires --store",
+    )
+    parser.add_argument(
+        "--seed",
+        action="store_true",
+        help="with --queue, enqueue the first page of every letter before working",
+    )
+    parser.add_argument(
+        "--details",
+        action="store_true",
+        help=f"also read formed-in, location, themes and label from each band "
+        f"page's header into {BAND_DETAILS_FILE}, or the store's band_details table",
+    )
+    add_metrics_args(parser)
+    return parser.parse_args()
+
+
+def run_queue_mode(args):
+    if not args.store:
+        print("--queue needs --store so all workers write to one place.")
+        return
+    store = Store(args.store)
+    parquet = DatasetWriter(args.parquet, "bands") if args.parquet else None
+    queue = WorkQueue(args.queue)
+    cache = ResponseCache()
+    try:
+        if args.seed:
+            print(f"Queued {seed_listing_queue(queue)} letters")
+        asyncio.run(
+            report(
+                run_listing_worker(queue, store, parquet, args.rate, args.details, cache),
+                args.metrics,
+                args.metrics_interval,
+            )
+        )
+        print(f"Listing queue: {queue.counts('listing')}")
+    finally:
+        cache.close()
+        queue.close()
+        store.close()
+        if parquet is not None:
+            parquet.flush()
 
 
 def main():
-    existing_bands = load_existing_bands()
-    categories = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ") + ["NBR", "~"]
+    args = parse_args()
+    if args.parquet and DatasetWriter is None:
+        print("--parquet needs pyarrow (pip install pyarrow).")
+        return
+    if args.queue:
+        run_queue_mode(args)
+        return
 
-    checkpoint = load_checkpoint()
-    start_letter = checkpoint["letter"] if checkpoint["letter"] else categories[0]
+    store = Store(args.store) if args.store else None
+    parquet = DatasetWriter(args.parquet, "bands") if args.parquet else None
+    # With a store, known bands are looked up per listing page instead.
+    existing_bands = load_existing_bands() if store is None else IdSet()
+    fingerprints = load_fingerprints() if args.incremental else None
+    had_bands = bool(existing_bands)
+    # A run resuming from the journal keeps adding to its own list.
+    if args.incremental and not os.path.exists(JOURNAL_FILE):
+        rotate_changed_bands()
 
-    for letter in categories:
-        if letter < start_letter:
-            continue  # Skip letters that have already been processed
-        print(f"Scraping bands in {letter}")
-        scrape_letter_bands(letter, existing_bands)
-        save_checkpoint(letter, 0)  # Reset start for the next letter
+    journal = CrawlJournal(JOURNAL_FILE)
+    cache = ResponseCache()
+    try:
+        changed = asyncio.run(
+            report(
+                scrape_all(
+                    existing_bands,
+                    journal,
+                    fingerprints,
+                    store,
+                    parquet,
+                    args.rate,
+                    args.details,
+                    cache,
+                ),
+                args.metrics,
+                args.metrics_interval,
+            )
+        )
+    finally:
+        cache.close()
+        journal.close()
+        if store is not None:
+            store.close()
+        if parquet is not None:
+            parquet.flush()
 
-    # Remove checkpoint file after completion
-    if os.path.exists(CHECKPOINT_FILE):
-        os.remove(CHECKPOINT_FILE)
+    if args.incremental:
+        print(f"{changed} new or changed bands written to {CHANGED_BANDS_FILE}")
+        if changed and had_bands:
+            compact_bands_file()
+    # Re-fetched and resumed pages append details again, as they do bands.
+    if args.details and store is None and os.path.exists(BAND_DETAILS_FILE):
+        compact_bands_file(BAND_DETAILS_FILE)
+
+    # Remove the journal once every letter has been read to its end
+    if all(letter in journal.done_letters for letter in CATEGORIES):
+        os.remove(JOURNAL_FILE)
 
 
 if __name__ == "__main__":
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Accept-Language": "en-US,en;q=0.9",
-        "Accept": "application/json",
-        "Referer": "https://www.metal-archives.com/",
-    }
     main()
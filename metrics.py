@@ -0,0 +1,261 @@
+"""Crawl metrics shared by all scrapers.
+
+One process-wide ``METRICS`` collector records, per endpoint type, request
+latency histograms, bytes transferred, status codes, retries and cache hits,
+plus parse time and rows written per output. The FetchEngine feeds the
+request side; scrapers record parse time, rows and progress. ``report``
+runs a scrape while printing a one-line summary every ``interval`` seconds
+and writing a snapshot (Prometheus textfile if the path ends in ``.prom``,
+JSON otherwise) that includes an ETA from the progress counters.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Checked in order; the first match names the endpoint.
+ENDPOINTS = [
+    ("ajax-letter", re.compile(r"/browse/ajax-letter/")),
+    ("label-list", re.compile(r"/label/ajax-list/")),
+    ("ajax-bands", re.compile(r"/label/ajax-bands/")),
+    ("discography", re.compile(r"/band/discography/")),
+    ("band-page", re.compile(r"/bands/")),
+    ("photo", re.compile(r"/images/")),
+]
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+
+def endpoint_of(url):
+    for name, pattern in ENDPOINTS:
+        if pattern.search(url):
+            return name
+    return "other"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": dict(zip(list(map(str, self.buckets)) + ["+Inf"], self.counts)),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.parse = defaultdict(lambda: Histogram(PARSE_BUCKETS))
+        self.bytes = Counter()
+        self.statuses = Counter()  # (endpoint, status)
+        self.retries = Counter()
+        self.errors = Counter()
+        self.cache_hits = Counter()  # (endpoint, "fresh" | "revalidated")
+        self.rows = Counter()
+        self.gauges = {}
+        self.units_total = 0
+        self.units_done = 0
+
+    def observe_request(self, url, status, seconds, size):
+        endpoint = endpoint_of(url)
+        self.latency[endpoint].observe(seconds)
+        self.bytes[endpoint] += size
+        self.statuses[endpoint, status] += 1
+
+    def retry(self, url):
+        self.retries[endpoint_of(url)] += 1
+
+    def error(self, url):
+        self.errors[endpoint_of(url)] += 1
+
+    def cache_hit(self, url, kind):
+        self.cache_hits[endpoint_of(url), kind] += 1
+
+    @contextmanager
+    def timed_parse(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.parse[name].observe(time.perf_counter() - start)
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def rows_written(self, output, count):
+        self.rows[output] += count
+
+    def expect(self, units):
+        """Add ``units`` to the work this run has to do, for the ETA."""
+        self.units_total += units
+
+    def advance(self, units=1):
+        self.units_done += units
+
+    def eta(self):
+        """Seconds left at the average pace so far, or None before any progress."""
+        elapsed = time.monotonic() - self.started
+        if not self.units_done or not elapsed:
+            return None
+        remaining = max(self.units_total - self.units_done, 0)
+        return remaining / (self.units_done / elapsed)
+
+    def summary_line(self):
+        elapsed = time.monotonic() - self.started
+        requests = sum(histogram.count for histogram in self.latency.values())
+        throttled = sum(n for (_, status), n in self.statuses.items() if status == 429)
+        eta = self.eta()
+        parts = [
+            f"[{elapsed:7.0f}s] {requests} requests ({requests / max(elapsed, 1e-9):.1f}/s)",
+            f"{sum(self.bytes.values()) / 1024**2:.1f} MB",
+            f"{throttled} x 429",
+            f"{sum(self.retries.values())} retries",
+            f"{sum(self.cache_hits.values())} cache hits",
+            f"rows {dict(self.rows)}",
+        ]
+        if "concurrency_limit" in self.gauges:
+            parts.append(f"concurrency {self.gauges['concurrency_limit']}")
+        for endpoint, histogram in sorted(self.latency.items()):
+            parts.append(
+                f"{endpoint} p50<={histogram.quantile(0.5)}s p95<={histogram.quantile(0.95)}s"
+            )
+        if self.units_total:
+            parts.append(f"{self.units_done}/{self.units_total} done")
+        if eta is not None:
+            parts.append(f"ETA {eta / 60:.1f} min")
+        return " | ".join(parts)
+
+    def snapshot(self):
+        return {
+            "elapsed_seconds": round(time.monotonic() - self.started, 3),
+            "latency_seconds": {k: h.snapshot() for k, h in self.latency.items()},
+            "parse_seconds": {k: h.snapshot() for k, h in self.parse.items()},
+            "bytes": dict(self.bytes),
+            "statuses": {f"{e} {s}": n for (e, s), n in self.statuses.items()},
+            "retries": dict(self.retries),
+            "errors": dict(self.errors),
+            "cache_hits": {f"{e} {k}": n for (e, k), n in self.cache_hits.items()},
+            "rows_written": dict(self.rows),
+            "gauges": dict(self.gauges),
+            "units_total": self.units_total,
+            "units_done": self.units_done,
+            "eta_seconds": self.eta(),
+        }
+
+    def prometheus(self):
+        lines = []
+
+        def histogram_lines(name, label, histograms):
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in sorted(histograms.items()):
+                cumulative = 0
+                bounds = list(map(str, histogram.buckets)) + ["+Inf"]
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.sum}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+
+        def counter_lines(name, labels, counter):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(counter.items(), key=str):
+                key = key if isinstance(key, tuple) else (key,)
+                pairs = ",".join(f'{label}="{v}"' for label, v in zip(labels, key))
+                lines.append(f"{name}{{{pairs}}} {value}")
+
+        histogram_lines("scraper_request_seconds", "endpoint", self.latency)
+        histogram_lines("scraper_parse_seconds", "parser", self.parse)
+        counter_lines("scraper_response_bytes_total", ("endpoint",), self.bytes)
+        counter_lines("scraper_responses_total", ("endpoint", "status"), self.statuses)
+        counter_lines("scraper_retries_total", ("endpoint",), self.retries)
+        counter_lines("scraper_errors_total", ("endpoint",), self.errors)
+        counter_lines("scraper_cache_hits_total", ("endpoint", "kind"), self.cache_hits)
+        counter_lines("scraper_rows_written_total", ("output",), self.rows)
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f"# TYPE scraper_{name} gauge")
+            lines.append(f"scraper_{name} {value}")
+        lines.append(f"scraper_units_total {self.units_total}")
+        lines.append(f"scraper_units_done {self.units_done}")
+        eta = self.eta()
+        if eta is not None:
+            lines.append(f"scraper_eta_seconds {eta:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path):
+        content = self.prometheus() if path.endswith(".prom") else json.dumps(self.snapshot(), indent=2)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+
+METRICS = Metrics()
+
+
+def add_metrics_args(parser):
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="write a metrics snapshot to PATH every interval "
+        "(Prometheus textfile if it ends in .prom, JSON otherwise)",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=30,
+        help="seconds between metrics summary lines and snapshots",
+    )
+
+
+async def report(coro, path=None, interval=30, metrics=METRICS):
+    """Await ``coro`` while printing summaries and writing snapshots."""
+
+    async def loop():
+        while True:
+            await asyncio.sleep(interval)
+            print(metrics.summary_line())
+            if path:
+                metrics.write_snapshot(path)
+
+    reporter = asyncio.create_task(loop())
+    try:
+        return await coro
+    finally:
+        reporter.cancel()
+        print(metrics.summary_line())
+        if path:
+            metrics.write_snapshot(path)
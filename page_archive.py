@@ -0,0 +1,204 @@
+"""Append-only archive of raw responses in zstd-compressed segments.
+
+Every archived body is one independent zstd frame appended to the writer's
+current segment file (``<dir>/segment-<time>-<id>.zst``, rolled over at
+``segment_bytes``). An SQLite index maps each URL to its segment, offset and
+length, so any page can be read back on its own and a segment can be
+re-processed without touching the network. Re-archiving a URL appends a new
+frame and repoints the index; the old frame stays in its segment.
+
+Several processes may write to one archive: each appends to its own
+segments and the index is shared. Compression and writes run on a
+background thread, so ``put`` never blocks an event loop on zstd or fsync.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+import zstandard
+
+INDEX_FILE = "index.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_segment ON pages (segment, offset);
+CREATE INDEX IF NOT EXISTS pages_kind ON pages (kind);
+"""
+
+
+def _connect(directory):
+    db = sqlite3.connect(os.path.join(directory, INDEX_FILE), timeout=60)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+class PageArchive:
+    """Handle on an archive directory with a background writer thread.
+
+    ``put`` only queues the page; call ``flush()`` to have everything queued
+    so far on disk and indexed, and ``close()`` when done.
+    """
+
+    def __init__(self, directory, segment_bytes=256 * 1024**2, level=10, commit_every=500):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.level = level
+        self.commit_every = commit_every
+        self.db = _connect(directory)
+        self._queue = queue.Queue()
+        self._error = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        db = _connect(self.directory)
+        compressor = zstandard.ZstdCompressor(level=self.level)
+        segment = None
+        file = None
+        pending = 0
+
+        def commit():
+            # Frames reach the disk before the index rows that point at them.
+            if file is not None:
+                file.flush()
+                os.fsync(file.fileno())
+            db.commit()
+
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None or item == "flush":
+                    commit()
+                    pending = 0
+                else:
+                    kind, url, body, only_missing = item
+                    if only_missing and db.execute(
+                        "SELECT 1 FROM pages WHERE url = ?", (url,)
+                    ).fetchone():
+                        continue
+                    if file is None or file.tell() >= self.segment_bytes:
+                        if file is not None:
+                            file.close()
+                        segment = f"segment-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.zst"
+                        file = open(os.path.join(self.directory, segment), "ab")
+                    frame = compressor.compress(body)
+                    offset = file.tell()
+                    file.write(frame)
+                    db.execute(
+                        "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (url, kind, segment, offset, len(frame), len(body), time.time()),
+                    )
+                    pending += 1
+                    if pending >= self.commit_every:
+                        commit()
+                        pending = 0
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+            if item is None:
+                if file is not None:
+                    file.close()
+                db.close()
+                return
+
+    def put(self, kind, url, body, only_missing=False):
+        """Queue ``body`` to be appended and the index for ``url`` pointed at it.
+
+        With ``only_missing`` the page is skipped if ``url`` is already archived.
+        """
+        if self._error:
+            raise self._error
+        self._queue.put((kind, url, body, only_missing))
+
+    def flush(self):
+        """Block until every queued page is on disk and indexed."""
+        self._queue.put("flush")
+        self._queue.join()
+        if self._error:
+            raise self._error
+
+    def get(self, url):
+        self.flush()
+        row = self.db.execute(
+            "SELECT segment, offset, length FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return read_frame(self.directory, *row)
+
+    def chunks(self, kind=None, pages_per_chunk=2000):
+        """Split the live pages into ``(segment, first_offset, last_offset)`` work units."""
+        query = "SELECT segment, offset FROM pages"
+        params = []
+        if kind is not None:
+            query += " WHERE kind = ?"
+            params.append(kind)
+        chunks = []
+        current = None
+        count = 0
+        for segment, offset in self.db.execute(query + " ORDER BY segment, offset", params):
+            if current is None or current[0] != segment or count >= pages_per_chunk:
+                current = [segment, offset, offset]
+                chunks.append(current)
+                count = 0
+            current[2] = offset
+            count += 1
+        return [tuple(chunk) for chunk in chunks]
+
+    def count(self, kind=None):
+        if kind is None:
+            return self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        return self.db.execute("SELECT COUNT(*) FROM pages WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self.db.close()
+        if self._error:
+            raise self._error
+
+
+def read_frame(directory, segment, offset, length):
+    with open(os.path.join(directory, segment), "rb") as f:
+        f.seek(offset)
+        return zstandard.ZstdDecompressor().decompress(f.read(length))
+
+
+def iter_segment(directory, segment, kind=None, first_offset=0, last_offset=None):
+    """Yield ``(url, body)`` for the live pages of one segment, in file order.
+
+    Opens its own index connection, so it can run in a worker process.
+    """
+    db = sqlite3.connect(os.path.join(directory, INDEX_FILE), timeout=60)
+    query = "SELECT url, offset, length FROM pages WHERE segment = ? AND offset >= ?"
+    params = [segment, first_offset]
+    if last_offset is not None:
+        query += " AND offset <= ?"
+        params.append(last_offset)
+    if kind is not None:
+        query += " AND kind = ?"
+        params.append(kind)
+    rows = db.execute(query + " ORDER BY offset", params).fetchall()
+    db.close()
+
+    decompressor = zstandard.ZstdDecompressor()
+    with open(os.path.join(directory, segment), "rb") as f:
+        for url, offset, length in rows:
+            f.seek(offset)
+            yield url, decompressor.decompress(f.read(length))
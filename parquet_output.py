@@ -0,0 +1,173 @@
+"""Typed Parquet datasets partitioned by listing letter.
+
+Each dataset lives under ``<root>/<name>/Letter=<category>/part-*.parquet``
+(hive partitioning), with the category being one of ``A``..``Z``, ``NBR`` or
+``~`` as on the site's browse pages. IDs are stored as int64 and repetitive
+text columns (country, genre, status, ...) dictionary-encoded, so readers get
+compact categoricals and can prune both columns and partitions.
+
+Re-runs only ever add part files, whose names carry their write time in
+ms. ``read_dataset`` keeps the newest rows of each key in DEDUPE_KEYS, so a
+band scraped again replaces its older row or discography.
+"""
+
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+LETTER_CATEGORIES = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ") + ["NBR", "~"]
+
+INT = "int"
+FLOAT = "float"
+TEXT = "text"
+CATEGORY = "category"
+
+# Column layouts match the CSV headers the scrapers write.
+DATASETS = {
+    "bands": [
+        ("Band ID", INT),
+        ("Name", TEXT),
+        ("URL", TEXT),
+        ("Country", CATEGORY),
+        ("Genre", CATEGORY),
+        ("Status", CATEGORY),
+        ("Photo_URL", TEXT),
+    ],
+    "labels": [
+        ("Label ID", INT),
+        ("Name", TEXT),
+        ("Specialization", CATEGORY),
+        ("Status", CATEGORY),
+        ("Country", CATEGORY),
+        ("Website", TEXT),
+        ("Online Shopping", CATEGORY),
+    ],
+    "discography": [
+        ("Album ID", INT),
+        ("Album Name", TEXT),
+        ("Type", CATEGORY),
+        ("Year", INT),
+        ("Review Count", INT),
+        ("Review Average", FLOAT),
+        ("Band ID", INT),
+    ],
+}
+
+# A key's rows come from the newest part file holding it: one row per band or
+# label, and a band's whole discography.
+DEDUPE_KEYS = {"bands": "Band ID", "labels": "Label ID", "discography": "Band ID"}
+
+
+def letter_category(name):
+    """Browse-page category a band or label name is listed under."""
+    first = (name or "")[:1].upper()
+    if "A" <= first <= "Z":
+        return first
+    if first.isdigit():
+        return "NBR"
+    return "~"
+
+
+def _column(values, kind):
+    if kind == INT:
+        return pa.array(
+            [None if value in (None, "") else int(value) for value in values], pa.int64()
+        )
+    if kind == FLOAT:
+        return pa.array(
+            [None if value in (None, "") else float(value) for value in values], pa.float64()
+        )
+    values = pa.array([None if value is None else str(value) for value in values], pa.string())
+    if kind == CATEGORY:
+        return values.dictionary_encode()
+    return values
+
+
+def rows_to_table(name, rows):
+    columns = DATASETS[name]
+    return pa.table(
+        {
+            column: _column([row[i] for row in rows], kind)
+            for i, (column, kind) in enumerate(columns)
+        }
+    )
+
+
+class DatasetWriter:
+    """Buffers rows per letter and writes them as Parquet part files.
+
+    ``rows`` use the same column order as the matching CSV output.
+    """
+
+    def __init__(self, root, name, batch_size=5000):
+        self.root = root
+        self.name = name
+        self.batch_size = batch_size
+        self.buffers = {}
+
+    def add(self, letter, rows):
+        buffer = self.buffers.setdefault(letter, [])
+        buffer.extend(rows)
+        if len(buffer) >= self.batch_size:
+            self._write(letter)
+
+    def _write(self, letter):
+        rows = self.buffers.pop(letter, None)
+        if not rows:
+            return
+        directory = os.path.join(self.root, self.name, f"Letter={letter}")
+        os.makedirs(directory, exist_ok=True)
+        file_name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+        pq.write_table(rows_to_table(self.name, rows), os.path.join(directory, file_name))
+
+    def flush(self):
+        for letter in list(self.buffers):
+            self._write(letter)
+
+
+def part_order(path):
+    """Sort key of a part file: its write time, then its name."""
+    name = os.path.basename(path)
+    return int(name.split("-")[1]), name
+
+
+def read_dataset(root, name, columns=None, letters=None):
+    """Load a dataset as a DataFrame, reading only ``columns`` and ``letters``.
+
+    Rows of a key that a newer part file holds again are left out.
+    """
+    dataset = ds.dataset(
+        os.path.join(root, name), format="parquet", partitioning="hive"
+    )
+    row_filter = ds.field("Letter").isin(list(letters)) if letters else None
+    key = DEDUPE_KEYS[name]
+    read = dataset.schema.names if columns is None else list(dict.fromkeys([*columns, key]))
+    fragments = sorted(dataset.get_fragments(), key=lambda fragment: part_order(fragment.path))
+    wanted = {fragment.path for fragment in dataset.get_fragments(filter=row_filter)}
+    tables = [
+        (rank, fragment.to_table(schema=dataset.schema, columns=read))
+        for rank, fragment in enumerate(fragments)
+        if fragment.path in wanted
+    ]
+    if not tables:
+        return dataset.schema.empty_table().select(read).to_pandas()
+    df = pa.concat_tables([table for _, table in tables]).to_pandas()
+    if len(fragments) > 1:
+        # The newest part file of a key may be under another letter: renamed bands move.
+        newest = (
+            pd.concat(
+                pd.DataFrame({"key": fragment.to_table(columns=[key])[key].to_pandas(), "rank": rank})
+                for rank, fragment in enumerate(fragments)
+            )
+            .groupby("key")["rank"]
+            .max()
+        )
+        part = np.repeat([rank for rank, _ in tables], [table.num_rows for _, table in tables])
+        df = df[part == newest.reindex(df[key]).to_numpy()].reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
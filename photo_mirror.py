@@ -0,0 +1,403 @@
+"""Mirror band photos into a content-addressed store.
+
+Reads Photo_URL from the band output (metal_bands.csv, a Parquet root or the
+SQLite store) and downloads the images through the shared FetchEngine, with
+the same rate limiting, adaptive concurrency and metrics as the scrapers.
+``--rate`` is this process's own budget. When it runs alongside scrapers
+working from a queue, pass the same ``--queue`` and ``--rate`` so it joins
+them as one more worker and takes an even share of their common budget.
+Images are stored as ``<dir>/objects/<ab>/<sha256><ext>``, so bands sharing
+an image share one file. Thumbnails of new images are made in a process pool
+(Pillow) under ``<dir>/thumbs``.
+
+``<dir>/photos.sqlite`` is the completion index: per band, the photo URL,
+its ``?NNNN`` cache-buster, the content hash and the HTTP validators. Bands
+whose URL and cache-buster are unchanged are skipped without a request, so
+restarts resume and re-runs only touch new or changed photos. A changed
+cache-buster is fetched conditionally; a 304 or an identical hash only
+updates the index.
+
+    python photo_mirror.py [--bands-file metal_bands.csv | --store] [--dir photos]
+        [--workers 16] [--rate 2] [--queue [work_queue.db]]
+        [--thumbnail-size 200] [--no-thumbnails]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from http_engine import FetchEngine, FetchError
+from metrics import METRICS, add_metrics_args, report
+from storage import DEFAULT_DB, Store
+from table_loader import load_table
+from work_queue import DEFAULT_QUEUE, WorkQueue
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed for thumbnails
+    Image = None
+
+PHOTO_DIR = "photos"
+INDEX_FILE = "photos.sqlite"
+DEFAULT_WORKERS = 16
+DEFAULT_RATE = 2.0  # requests per second across all workers
+THUMBNAIL_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    band_id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    version TEXT,
+    sha256 TEXT,
+    ext TEXT,
+    size INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    thumbnail INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS photos_sha256 ON photos (sha256);
+"""
+
+
+def split_photo_url(url):
+    """``(url without query, cache-buster)``; the cache-buster may be None."""
+    base, _, version = url.partition("?")
+    return base, version or None
+
+
+def object_path(directory, sha256, ext):
+    return os.path.join(directory, "objects", sha256[:2], sha256 + ext)
+
+
+def thumbnail_path(directory, sha256):
+    return os.path.join(directory, "thumbs", sha256[:2], sha256 + ".jpg")
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def make_thumbnail(source, target, size):
+    """Runs in a worker process."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with Image.open(source) as image:
+        image.thumbnail((size, size))
+        image.convert("RGB").save(target + ".tmp", "JPEG", quality=85)
+    os.replace(target + ".tmp", target)
+
+
+class PhotoIndex:
+    def __init__(self, directory, commit_every=500):
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, INDEX_FILE), timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.commit_every = commit_every
+        self._pending = 0
+
+    def load(self):
+        """``{band_id: (url, version, sha256, ext, etag, last_modified, thumbnail)}``."""
+        return {
+            row[0]: row[1:]
+            for row in self.db.execute(
+                "SELECT band_id, url, version, sha256, ext, etag, last_modified, thumbnail FROM photos"
+            )
+        }
+
+    def record(self, band_id, url, version, sha256=None, ext=None, size=None, headers=None, thumbnail=False):
+        headers = headers or {}
+        self.db.execute(
+            "INSERT OR REPLACE INTO photos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                band_id,
+                url,
+                version,
+                sha256,
+                ext,
+                size,
+                headers.get("ETag"),
+                headers.get("Last-Modified"),
+                int(thumbnail),
+                time.time(),
+            ),
+        )
+        self._written()
+
+    def thumbnail_done(self, sha256):
+        self.db.execute("UPDATE photos SET thumbnail = 1 WHERE sha256 = ?", (sha256,))
+        self._written()
+
+    def _written(self):
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.flush()
+
+    def flush(self):
+        self.db.commit()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+def plan_photos(bands, known, thumbnails=True):
+    """Split ``(band_id, photo_url)`` pairs into downloads and missing thumbnails.
+
+    Returns ``(downloads, thumbnails)``: ``(band_id, photo_url)`` pairs to
+    fetch and ``(sha256, ext)`` pairs of stored images without a thumbnail.
+    Photos without a cache-buster are always revalidated.
+    """
+    downloads = []
+    missing_thumbnails = set()
+    for band_id, photo_url in bands:
+        url, version = split_photo_url(photo_url)
+        row = known.get(band_id)
+        if row is None or row[0] != url or row[1] != version or version is None:
+            downloads.append((band_id, photo_url))
+        elif thumbnails and row[2] is not None and not row[6]:
+            missing_thumbnails.add((row[2], row[3]))
+    return downloads, sorted(missing_thumbnails)
+
+
+class PhotoMirror:
+    """Downloads planned photos and keeps the index and thumbnails in step.
+
+    Index writes happen on the event loop only, including the ones made when
+    a thumbnail finishes in the process pool.
+    """
+
+    def __init__(self, directory, index, known, pool=None, thumbnail_size=THUMBNAIL_SIZE):
+        self.directory = directory
+        self.index = index
+        self.known = known
+        self.pool = pool
+        self.thumbnail_size = thumbnail_size
+        self.thumbnails = {}
+        self.counts = dict.fromkeys(("stored", "deduplicated", "unchanged", "missing", "failed"), 0)
+
+    def thumbnail(self, sha256, ext):
+        if self.pool is None or sha256 in self.thumbnails:
+            return
+        target = thumbnail_path(self.directory, sha256)
+        if os.path.exists(target):
+            self.index.thumbnail_done(sha256)
+            return
+        future = asyncio.get_running_loop().run_in_executor(
+            self.pool,
+            make_thumbnail,
+            object_path(self.directory, sha256, ext),
+            target,
+            self.thumbnail_size,
+        )
+        future.add_done_callback(lambda f: self._thumbnail_finished(sha256, f))
+        self.thumbnails[sha256] = future
+
+    def _thumbnail_finished(self, sha256, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Thumbnail of {sha256} failed: {future.exception()}")
+            return
+        self.index.thumbnail_done(sha256)
+        METRICS.rows_written("thumbnails", 1)
+
+    async def fetch(self, engine, band_id, photo_url):
+        url, version = split_photo_url(photo_url)
+        row = self.known.get(band_id)
+        headers = {}
+        if row is not None and row[0] == url and row[2] is not None:
+            if row[4]:
+                headers["If-None-Match"] = row[4]
+            if row[5]:
+                headers["If-Modified-Since"] = row[5]
+        try:
+            result = await engine.get(photo_url, headers=headers, timeout=30)
+        except FetchError as e:
+            print(f"Failed to download photo of band {band_id}: {e}")
+            self.counts["failed"] += 1
+            return
+
+        if result.status == 304:
+            self.index.record(band_id, url, version, row[2], row[3], None, result.headers, row[6])
+            self.counts["unchanged"] += 1
+        elif result.status == 200:
+            sha256 = hashlib.sha256(result.body).hexdigest()
+            ext = os.path.splitext(urlsplit(url).path)[1] or ".jpg"
+            path = object_path(self.directory, sha256, ext)
+            if row is not None and row[2] == sha256:
+                self.counts["unchanged"] += 1
+            elif os.path.exists(path):
+                self.counts["deduplicated"] += 1
+            else:
+                write_atomic(path, result.body)
+                self.counts["stored"] += 1
+                METRICS.rows_written("photos", 1)
+            has_thumbnail = os.path.exists(thumbnail_path(self.directory, sha256))
+            self.index.record(
+                band_id, url, version, sha256, ext, len(result.body), result.headers, has_thumbnail
+            )
+            if not has_thumbnail:
+                self.thumbnail(sha256, ext)
+        elif result.status in (404, 410):
+            # Recorded so the same URL and cache-buster are not asked for again.
+            self.index.record(band_id, url, version)
+            self.counts["missing"] += 1
+        else:
+            print(f"Failed to download photo of band {band_id} - Status Code: {result.status}")
+            self.counts["failed"] += 1
+
+    async def worker(self, engine, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            await self.fetch(engine, *item)
+            METRICS.advance()
+            queue.task_done()
+
+    async def share_rate(self, engine, work_queue, rate):
+        """Keep this mirror counted on ``work_queue`` and its rate at an even share."""
+        while True:
+            await asyncio.sleep(work_queue.lease_seconds / 3)
+            work_queue.heartbeat()
+            if engine.limiter:
+                engine.limiter.rate = work_queue.rate_share(rate)
+
+    async def run(self, downloads, missing_thumbnails, workers, rate, work_queue=None):
+        for sha256, ext in missing_thumbnails:
+            self.thumbnail(sha256, ext)
+        METRICS.expect(len(downloads))
+        queue = asyncio.Queue(maxsize=workers * 2)
+        share = rate
+        if work_queue is not None:
+            work_queue.heartbeat()
+            share = work_queue.rate_share(rate)
+        async with FetchEngine(concurrency=workers, rate=share, timeout=30) as engine:
+            sharing = None
+            if work_queue is not None:
+                sharing = asyncio.create_task(self.share_rate(engine, work_queue, rate))
+            tasks = [asyncio.create_task(self.worker(engine, queue)) for _ in range(workers)]
+            for item in downloads:
+                await queue.put(item)
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+            if sharing is not None:
+                sharing.cancel()
+        await asyncio.gather(*self.thumbnails.values(), return_exceptions=True)
+        self.index.flush()
+
+
+def load_photo_urls(bands_file, store=None):
+    """``(band_id, photo_url)`` for every band with a photo."""
+    if store is not None and store.count("bands"):
+        return [(band_id, url) for band_id, url in store.iter_bands(("band_id", "photo_url")) if url]
+    bands = load_table("bands", bands_file, ["Band ID", "Photo_URL"])
+    bands = bands[bands["Photo_URL"].notna() & (bands["Photo_URL"] != "")]
+    return list(zip(bands["Band ID"].tolist(), bands["Photo_URL"].tolist()))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mirror band photos.")
+    parser.add_argument(
+        "--bands-file",
+        default="metal_bands.csv",
+        help="band list with Photo_URL: a CSV or a Parquet root from main.py --parquet",
+    )
+    parser.add_argument(
+        "--store",
+        nargs="?",
+        const=DEFAULT_DB,
+        help=f"read photo URLs from the SQLite store (default {DEFAULT_DB}) instead",
+    )
+    parser.add_argument("--dir", default=PHOTO_DIR, help="mirror directory")
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="number of concurrent downloads"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="request budget in requests per second (0 for none); with --queue "
+        "it is shared evenly with the scrapers working from that queue",
+    )
+    parser.add_argument(
+        "--queue",
+        nargs="?",
+        const=DEFAULT_QUEUE,
+        help=f"join the work queue of running scrapers (default {DEFAULT_QUEUE}) "
+        "to share their --rate budget instead of adding to it",
+    )
+    parser.add_argument(
+        "--thumbnail-size", type=int, default=THUMBNAIL_SIZE, help="thumbnail bounding box in pixels"
+    )
+    parser.add_argument(
+        "--thumbnail-workers", type=int, default=None, help="thumbnail processes (default: all cores)"
+    )
+    parser.add_argument("--no-thumbnails", action="store_true", help="only mirror the images")
+    add_metrics_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    start_time = time.time()
+    thumbnails = not args.no_thumbnails
+    if thumbnails and Image is None:
+        print("Pillow is not installed; mirroring without thumbnails.")
+        thumbnails = False
+
+    store = Store(args.store) if args.store else None
+    try:
+        bands = load_photo_urls(args.bands_file, store)
+    finally:
+        if store is not None:
+            store.close()
+
+    index = PhotoIndex(args.dir)
+    known = index.load()
+    downloads, missing_thumbnails = plan_photos(bands, known, thumbnails)
+    print(
+        f"{len(bands)} bands with photos: {len(downloads)} to download, "
+        f"{len(missing_thumbnails)} thumbnails missing"
+    )
+
+    pool = ProcessPoolExecutor(max_workers=args.thumbnail_workers) if thumbnails else None
+    mirror = PhotoMirror(args.dir, index, known, pool, args.thumbnail_size)
+    work_queue = WorkQueue(args.queue) if args.queue else None
+    try:
+        asyncio.run(
+            report(
+                mirror.run(downloads, missing_thumbnails, args.workers, args.rate, work_queue),
+                args.metrics,
+                args.metrics_interval,
+            )
+        )
+    finally:
+        if work_queue is not None:
+            work_queue.close()
+        if pool is not None:
+            pool.shutdown()
+        index.close()
+
+    print(", ".join(f"{count} {name}" for name, count in mirror.counts.items()))
+    elapsed_time = time.time() - start_time
+    hours, rem = divmod(elapsed_time, 3600)
+    minutes, seconds = divmod(rem, 60)
+    print(f"Time elapsed: {int(hours):02}:{int(minutes):02}:{int(seconds):02}")
+
+
+if __name__ == "__main__":
+    main()
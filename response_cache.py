@@ -0,0 +1,191 @@
+"""Persistent HTTP response cache shared by all scrapers.
+
+Bodies are stored as files under the cache directory and indexed in a small
+SQLite database together with their ETag/Last-Modified validators. Entries
+younger than their endpoint's TTL are served without touching the network;
+older ones are revalidated with a conditional request, so an unchanged page
+costs a 304 instead of a full download. Least recently used entries are
+evicted once the bodies exceed ``max_bytes``; access times are kept in
+memory and written with the next store, revalidation or close rather than
+committed on every hit.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# First matching pattern wins; URLs matching none use DEFAULT_TTL.
+DEFAULT_TTLS = [
+    (r"/browse/ajax-letter/", 6 * HOUR),
+    (r"/label/ajax-list/", 6 * HOUR),
+    (r"/label/ajax-bands/", DAY),
+    (r"/band/discography/", 7 * DAY),
+    (r"/bands/", 7 * DAY),
+]
+DEFAULT_TTL = DAY
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+class CachedResponse:
+    def __init__(self, url, body, headers, etag, last_modified, fresh):
+        self.url = url
+        self.body = body
+        self.headers = headers
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    def __init__(self, directory="http_cache", max_bytes=DEFAULT_MAX_BYTES, ttls=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls or DEFAULT_TTLS)]
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.sqlite"))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                headers TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)"
+        )
+        self.db.commit()
+        self.total_bytes = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+        self._accessed = {}
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return DEFAULT_TTL
+
+    def _body_path(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(digest[:2], digest + ".body")
+
+    def lookup(self, url):
+        """Return the cached entry for ``url`` (fresh or stale), or None."""
+        row = self.db.execute(
+            "SELECT path, headers, etag, last_modified, stored_at FROM entries WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        path, headers, etag, last_modified, stored_at = row
+        try:
+            with open(os.path.join(self.directory, path), "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            self._delete(url)
+            return None
+        now = time.time()
+        self._accessed[url] = now
+        fresh = now - stored_at < self.ttl_for(url)
+        return CachedResponse(url, body, json.loads(headers), etag, last_modified, fresh)
+
+    def _write_accessed(self):
+        """Queue the access times of the entries looked up since the last commit."""
+        if self._accessed:
+            self.db.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE url = ?",
+                [(accessed_at, url) for url, accessed_at in self._accessed.items()],
+            )
+            self._accessed = {}
+
+    def store(self, url, body, headers):
+        headers = dict(headers)
+        validators = {key.lower(): value for key, value in headers.items()}
+        path = self._body_path(url)
+        full_path = os.path.join(self.directory, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(body)
+
+        old = self.db.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+        if old:
+            self.total_bytes -= old[0]
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                url,
+                path,
+                json.dumps(headers),
+                validators.get("etag"),
+                validators.get("last-modified"),
+                now,
+                now,
+                len(body),
+            ),
+        )
+        self._accessed.pop(url, None)
+        self._write_accessed()
+        self.db.commit()
+        self.total_bytes += len(body)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def revalidated(self, url):
+        """Mark an entry fresh again after the server answered 304."""
+        self.db.execute("UPDATE entries SET stored_at = ? WHERE url = ?", (time.time(), url))
+        self._write_accessed()
+        self.db.commit()
+
+    def _delete(self, url):
+        row = self.db.execute("SELECT path, size FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return
+        path, size = row
+        try:
+            os.remove(os.path.join(self.directory, path))
+        except FileNotFoundError:
+            pass
+        self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+        self._accessed.pop(url, None)
+        self.total_bytes -= size
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in ``max_bytes``."""
+        target = self.max_bytes * 0.9
+        self._write_accessed()
+        rows = self.db.execute(
+            "SELECT url FROM entries ORDER BY accessed_at"
+        ).fetchall()
+        for (url,) in rows:
+            if self.total_bytes <= target:
+                break
+            self._delete(url)
+        self.db.commit()
+
+    def close(self):
+        self._write_accessed()
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,143 @@
+"""Streaming replacement for the joins in tables_combine.ipynb.
+
+The roster is read in chunks and joined against in-memory ID indexes of the
+bands and labels tables, writing all three outputs in one pass:
+
+    metal_bands_roster.csv  bands LEFT JOIN roster ON Band ID
+    labels_roster.csv       roster LEFT JOIN labels ON Label ID
+    complete_roster.csv     metal_bands_roster LEFT JOIN labels ON Label ID
+
+Columns match the notebook's pandas merges (including the _x/_y suffixes in
+complete_roster). Bands with no roster entry are written after the streamed
+rows, so row order differs from the notebook; the rows themselves do not.
+Peak memory is the two indexes plus one chunk.
+
+    python roster_join.py [--bands metal_bands.csv] [--labels labels/labels.csv]
+        [--roster labels_rosters/combined_roster.csv] [--out-dir .] [--chunk-size 200000]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from table_loader import iter_table, load_table, memory_report
+
+OUTPUTS = ("metal_bands_roster.csv", "labels_roster.csv", "complete_roster.csv")
+
+
+def read_id_index(name, path, id_column):
+    """Load a table indexed by its integer ID column, one row per ID."""
+    df = load_table(name, path)
+    return df.drop_duplicates(id_column, keep="last").set_index(id_column)
+
+
+class CsvAppender:
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        # Tracked apart from the row count: empty chunks must not repeat it.
+        self.header_written = False
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, df):
+        df.to_csv(self.path, mode="a", header=not self.header_written, index=False)
+        self.header_written = True
+        self.rows += len(df)
+
+
+def join_rosters(bands_path, labels_path, roster_path, out_dir=".", chunk_size=200_000):
+    """Stream the roster against the band and label indexes; returns the counts."""
+    bands = read_id_index("bands", bands_path, "Band ID")
+    labels = read_id_index("labels", labels_path, "Label ID")
+    print(memory_report({"bands": bands, "labels": labels}))
+    band_seen = np.zeros(len(bands), dtype=bool)
+
+    os.makedirs(out_dir, exist_ok=True)
+    band_roster_out, label_roster_out, complete_out = (
+        CsvAppender(os.path.join(out_dir, name)) for name in OUTPUTS
+    )
+    # Label columns as they appear after the merges, with the notebook's suffixes.
+    complete_label_columns = {
+        column: f"{column}_y" if column in bands.columns else column for column in labels.columns
+    }
+    complete_band_columns = {
+        column: f"{column}_x" if column in labels.columns else column for column in bands.columns
+    }
+
+    counts = {"roster_rows": 0, "missing_band": 0, "missing_label": 0}
+    for chunk in iter_table("roster", roster_path, chunk_size=chunk_size):
+        counts["roster_rows"] += len(chunk)
+
+        band_positions = bands.index.get_indexer(chunk["Band ID"])
+        label_positions = labels.index.get_indexer(chunk["Label ID"])
+        has_band = band_positions >= 0
+        has_label = label_positions >= 0
+        counts["missing_band"] += int((~has_band).sum())
+        counts["missing_label"] += int((~has_label).sum())
+        band_seen[band_positions[has_band]] = True
+
+        label_rows = labels.reindex(chunk["Label ID"]).reset_index(drop=True)
+        label_roster_out.write(pd.concat([chunk.reset_index(drop=True), label_rows], axis=1))
+
+        matched = chunk[has_band].reset_index(drop=True)
+        band_rows = bands.reindex(matched["Band ID"]).reset_index()
+        band_roster = pd.concat([band_rows, matched[["Label ID"]]], axis=1)
+        band_roster_out.write(band_roster)
+
+        matched_labels = labels.reindex(matched["Label ID"]).reset_index(drop=True)
+        complete_out.write(
+            pd.concat(
+                [
+                    band_roster.rename(columns=complete_band_columns),
+                    matched_labels.rename(columns=complete_label_columns),
+                ],
+                axis=1,
+            )
+        )
+
+    # LEFT JOIN tail: bands that never appeared in the roster.
+    unrostered = bands[~band_seen].reset_index()
+    unrostered["Label ID"] = pd.array([pd.NA] * len(unrostered), dtype="Int64")
+    band_roster_out.write(unrostered)
+    empty_labels = pd.DataFrame(index=unrostered.index, columns=labels.columns)
+    complete_out.write(
+        pd.concat(
+            [
+                unrostered.rename(columns=complete_band_columns),
+                empty_labels.rename(columns=complete_label_columns),
+            ],
+            axis=1,
+        )
+    )
+    counts["bands_without_roster"] = len(unrostered)
+
+    for appender in (band_roster_out, label_roster_out, complete_out):
+        counts[os.path.basename(appender.path)] = appender.rows
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Join bands, labels and rosters.")
+    parser.add_argument("--bands", default="metal_bands.csv")
+    parser.add_argument("--labels", default=os.path.join("labels", "labels.csv"))
+    parser.add_argument("--roster", default=os.path.join("labels_rosters", "combined_roster.csv"))
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = join_rosters(args.bands, args.labels, args.roster, args.out_dir, args.chunk_size)
+    print(f"Read {counts['roster_rows']} roster rows in {time.perf_counter() - start:.2f} s")
+    for name in OUTPUTS:
+        print(f"  {name}: {counts[name]} rows")
+    print(f"  roster rows with unknown Band ID: {counts['missing_band']}")
+    print(f"  roster rows with unknown Label ID: {counts['missing_label']}")
+    print(f"  bands without roster entries: {counts['bands_without_roster']}")
+
+
+if __name__ == "__main__":
+    main()
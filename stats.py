@@ -1,9 +1,16 @@
-import pandas as pd
 import networkx as nx
-import matplotlib.pyplot as plt
 import matplotlib
+matplotlib.use('Agg')  # render straight to files; no display needed in workers
+import matplotlib.pyplot as plt
+import argparse
+import concurrent.futures
+import hashlib
+import json
 import os
 import re
+import time
+
+from table_loader import load_table, memory_report
 
 matplotlib.rcParams['font.family'] = 'DejaVu Sans'
 
@@ -31,7 +38,8 @@ def save_improved_graph(G, output_path):
     
     nx.draw_networkx_nodes(G, pos, node_size=node_sizes, node_color=node_colors, edgecolors='black', linewidths=1.5)
     nx.draw_networkx_edges(G, pos, alpha=0.3, edge_color='gray')    
-    nx.draw_networkx_labels(G, pos_labels, font_size=12, font_color='black')
+    labels = {node: G.nodes[node].get('name', node) for node in G.nodes}
+    nx.draw_networkx_labels(G, pos_labels, labels=labels, font_size=12, font_color='black')
     
     plt.title("Improved Network Visualization", fontsize=14)
     plt.axis('off')
@@ -39,63 +47,79 @@ def save_improved_graph(G, output_path):
     plt.close()
 
 def load_data(band_file_path, album_file_path):
-    """Load the metal_bands.csv and all_bands_discography.csv files."""
+    """Load the metal_bands.csv and all_bands_discography.csv files (or their Parquet datasets)."""
     print(f"Loading data from {band_file_path} and {album_file_path}...")
-    bands_df = pd.read_csv(band_file_path, low_memory=False)
-    albums_df = pd.read_csv(album_file_path, low_memory=False)
-    
-    bands_df['Band ID'] = bands_df['Band ID'].astype(str).str.strip()
-    albums_df['Band ID'] = albums_df['Band ID'].astype(str).str.strip()
+    bands_df = load_table('bands', band_file_path, ['Band ID', 'Name', 'Genre'])
+    albums_df = load_table('discography', album_file_path, ['Band ID', 'Album ID', 'Album Name', 'Type', 'Year'])
 
     print("Data loaded successfully.")
+    print(memory_report({'bands': bands_df, 'albums': albums_df}))
     return bands_df, albums_df
 
+def band_node(band_id):
+    return ('band', band_id)
+
+def genre_node(genre):
+    return ('genre', genre)
+
+def album_node(album_id):
+    return ('album', album_id)
+
 def create_genre_graph(bands_df):
     """Create a NetworkX graph with genres connected to bands."""
     print("Creating genre graph...")
     genre_graph = nx.Graph()
     
-    for _, row in bands_df.iterrows():
-        band_name = row['Name']
-        genre = row['Genre']
-        
-        if genre not in genre_graph:
-            genre_graph.add_node(genre, type='genre')
-        
-        genre_graph.add_node(band_name, type='band')
-        genre_graph.add_edge(band_name, genre)
+    bands = bands_df.dropna(subset=['Band ID', 'Genre'])
+    band_nodes = [band_node(band_id) for band_id in bands['Band ID']]
+    genre_nodes = [genre_node(genre) for genre in bands['Genre']]
+
+    genre_graph.add_nodes_from(
+        (genre_node(genre), {'type': 'genre', 'name': genre}) for genre in bands['Genre'].unique()
+    )
+    genre_graph.add_nodes_from(
+        (node, {'type': 'band', 'name': name}) for node, name in zip(band_nodes, bands['Name'])
+    )
+    genre_graph.add_edges_from(zip(band_nodes, genre_nodes))
     
     print(f"Genre graph created with {len(genre_graph.nodes)} nodes and {len(genre_graph.edges)} edges.")
     return genre_graph
 
 def create_album_graph(bands_df, albums_df):
-    """Create a NetworkX graph with bands connected to their albums."""
+    """Create a NetworkX graph with bands connected to their albums.
+
+    Bands and albums are keyed by ID, so same-named bands or albums stay
+    separate nodes; the display name is kept in the ``name`` attribute.
+    """
     print("Creating album graph...")
     album_graph = nx.Graph()
     
-    album_count = 0
-    for _, row in bands_df.iterrows():
-        band_name = row['Name']
-        band_id = row['Band ID']
-        
-        album_graph.add_node(band_name, type='band', band_id=band_id)
-    
-    for _, row in albums_df.iterrows():
-        band_id = row['Band ID']
-        album_name = row['Album Name']
-        album_type = row['Type']
-        album_year = row['Year']
-        
-        band_row = bands_df[bands_df['Band ID'] == band_id]
-        if not band_row.empty:
-            band_name = band_row.iloc[0]['Name']
-            album_graph.add_node(album_name, type='album', album_type=album_type, year=album_year)
-            album_graph.add_edge(band_name, album_name)
-            album_count += 1
-        else:
-            print(f"Warning: Band ID {band_id} in album {album_name} not found in the bands data.")
+    bands = bands_df.dropna(subset=['Band ID']).drop_duplicates('Band ID', keep='last')
+    album_graph.add_nodes_from(
+        (band_node(band_id), {'type': 'band', 'name': name})
+        for band_id, name in zip(bands['Band ID'], bands['Name'])
+    )
+
+    # One vectorized membership test against the band ID index instead of a
+    # scan of bands_df per album.
+    known = albums_df['Band ID'].isin(bands['Band ID'])
+    missing = int((~known).sum())
+    if missing:
+        print(f"Warning: {missing} albums reference Band IDs not found in the bands data.")
+    albums = albums_df[known]
+
+    # Discography files written before album IDs were parsed fall back to the row index.
+    album_ids = albums['Album ID'] if 'Album ID' in albums.columns else albums.index
+    album_nodes = [album_node(album_id) for album_id in album_ids]
+    album_graph.add_nodes_from(
+        (node, {'type': 'album', 'name': name, 'album_type': album_type, 'year': year})
+        for node, name, album_type, year in zip(
+            album_nodes, albums['Album Name'], albums['Type'], albums['Year']
+        )
+    )
+    album_graph.add_edges_from(zip(map(band_node, albums['Band ID']), album_nodes))
     
-    print(f"Album graph created with {len(album_graph.nodes)} nodes and {album_count} edges.")
+    print(f"Album graph created with {len(album_graph.nodes)} nodes and {len(albums)} edges.")
     return album_graph
 
 def sanitize_filename(name):
@@ -119,7 +143,8 @@ def save_graph(G, title, output_path, color_map):
     nx.draw_networkx_nodes(G, pos, node_size=node_sizes, edgecolors='black', linewidths=1.5, node_color='none')
     
     nx.draw_networkx_edges(G, pos, alpha=0.3, edge_color='gray')
-    nx.draw_networkx_labels(G, pos, font_size=21, font_color='darkblue', verticalalignment='bottom')
+    labels = {node: G.nodes[node].get('name', node) for node in G.nodes}
+    nx.draw_networkx_labels(G, pos, labels=labels, font_size=21, font_color='darkblue', verticalalignment='bottom')
     
     plt.title(title, fontsize=14)
     plt.axis('off')
@@ -127,53 +152,135 @@ def save_graph(G, title, output_path, color_map):
     plt.close()
     print(f"Graph saved to {output_path}")
 
+def genre_subgraph_job(genre, genre_graph, output_dir):
+    """Return the (graph, title, output path, color map) needed to draw one genre."""
+    node = genre_node(genre)
+    genre_subgraph = genre_graph.subgraph([node] + list(genre_graph.neighbors(node))).copy()
+    sanitized_genre = sanitize_filename(genre)
+    output_path = os.path.join(output_dir, f"{sanitized_genre}_genre_network.png")
+    return genre_subgraph, f"Genre: {genre} - Bands Connection", output_path, {'genre': 'red', 'band': 'blue'}
+
+def album_subgraph_job(band_id, album_graph, output_dir):
+    """Return the (graph, title, output path, color map) needed to draw one band's albums."""
+    node = band_node(band_id)
+    band = album_graph.nodes[node]['name']
+    band_subgraph = album_graph.subgraph([node] + list(album_graph.neighbors(node))).copy()
+    # The ID keeps same-named bands from overwriting each other's image.
+    sanitized_band = sanitize_filename(band)
+    output_path = os.path.join(output_dir, f"{sanitized_band}_{band_id}_albums_network.png")
+    return band_subgraph, f"Band: {band} - Albums Connection", output_path, {'album': 'green', 'band': 'blue'}
+
 def save_genre_subgraph(genre, genre_graph, output_dir):
     """Save a single genre subgraph with its connected bands."""
     print(f"Saving genre subgraph for genre: {genre}...")
-    if genre_graph.nodes[genre].get('type') == 'genre':
-        genre_subgraph = genre_graph.subgraph([genre] + list(genre_graph.neighbors(genre)))
-        sanitized_genre = sanitize_filename(genre)
-        output_path = os.path.join(output_dir, f"{sanitized_genre}_genre_network.png")
-        save_graph(genre_subgraph, f"Genre: {genre} - Bands Connection", output_path, color_map={'genre': 'red', 'band': 'blue'})
+    if genre_graph.nodes[genre_node(genre)].get('type') == 'genre':
+        save_graph(*genre_subgraph_job(genre, genre_graph, output_dir))
 
-def save_album_subgraph(band, album_graph, output_dir):
+def save_album_subgraph(band_id, album_graph, output_dir):
     """Save a single band's album subgraph with its connected albums."""
-    print(f"Saving album subgraph for band: {band}...")
-    band_subgraph = album_graph.subgraph([band] + list(album_graph.neighbors(band)))
-    sanitized_band = sanitize_filename(band)
-    output_path = os.path.join(output_dir, f"{sanitized_band}_albums_network.png")
-    save_graph(band_subgraph, f"Band: {band} - Albums Connection", output_path, color_map={'album': 'green', 'band': 'blue'})
+    print(f"Saving album subgraph for band: {album_graph.nodes[band_node(band_id)]['name']}...")
+    save_graph(*album_subgraph_job(band_id, album_graph, output_dir))
+
+def subgraph_hash(G, title):
+    """Content hash of everything that ends up in a subgraph's image."""
+    nodes = sorted(repr((node, sorted(data.items()))) for node, data in G.nodes(data=True))
+    edges = sorted(repr(sorted(map(repr, edge))) for edge in G.edges)
+    return hashlib.sha1(json.dumps([title, nodes, edges]).encode('utf-8')).hexdigest()
+
+def render_job(G, title, output_path, color_map, digest):
+    """Process pool entry point: draw one subgraph and report its hash back."""
+    save_graph(G, title, output_path, color_map)
+    return output_path, digest
+
+def load_manifest(manifest_path):
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest, manifest_path):
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def render_subgraphs(jobs, manifest_path, workers=None, force=False):
+    """Draw subgraph jobs across a process pool, skipping unchanged images.
+
+    The manifest maps each image path to the hash of the subgraph it was drawn
+    from; an image whose subgraph hash still matches is left as it is.
+    """
+    manifest = load_manifest(manifest_path)
+    rendered = skipped = 0
+    max_in_flight = 4 * (workers or os.cpu_count() or 1)
+
+    def collect(futures):
+        nonlocal rendered
+        for future in futures:
+            output_path, digest = future.result()
+            manifest[output_path] = digest
+            rendered += 1
+            if rendered % 100 == 0:
+                save_manifest(manifest, manifest_path)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for G, title, output_path, color_map in jobs:
+            digest = subgraph_hash(G, title)
+            if not force and manifest.get(output_path) == digest and os.path.exists(output_path):
+                skipped += 1
+                continue
+            pending.add(executor.submit(render_job, G, title, output_path, color_map, digest))
+            if len(pending) >= max_in_flight:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+        collect(concurrent.futures.as_completed(pending))
+
+    save_manifest(manifest, manifest_path)
+    print(f"Rendered {rendered} subgraphs, skipped {skipped} unchanged.")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build and render the genre and album graphs.")
+    parser.add_argument('--workers', type=int, default=None, help="render processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="redraw every image, even unchanged ones")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
     bands_file_path = 'metal_bands.csv'
     albums_file_path = 'bands_discos/all_bands_discography.csv'
     
+    start = time.perf_counter()
     bands_df, albums_df = load_data(bands_file_path, albums_file_path)
+    print(f"Loaded {len(bands_df)} bands and {len(albums_df)} albums in {time.perf_counter() - start:.2f} s")
 
-    color_map = {
-        'genre': 'red',
-        'band': 'blue',
-        'album': 'green'
-    }
-
+    start = time.perf_counter()
     genre_graph = create_genre_graph(bands_df)
+    print(f"Genre graph built in {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
     album_graph = create_album_graph(bands_df, albums_df)
+    print(f"Album graph built in {time.perf_counter() - start:.2f} s")
 
     output_dir_genre = 'statistics/genres'
     output_dir_album = 'statistics/albums'
     os.makedirs(output_dir_genre, exist_ok=True)
     os.makedirs(output_dir_album, exist_ok=True)
 
-    print("Available genres to save:")
-    for genre in genre_graph.nodes:
-        if genre_graph.nodes[genre].get('type') == 'genre':
-            save_genre_subgraph(genre, genre_graph, output_dir_genre)
-            print("Subgraph saved.")
+    genre_jobs = (
+        genre_subgraph_job(data['name'], genre_graph, output_dir_genre)
+        for _, data in genre_graph.nodes(data=True)
+        if data.get('type') == 'genre'
+    )
+    album_jobs = (
+        album_subgraph_job(band_id, album_graph, output_dir_album)
+        for band_id in bands_df['Band ID'].dropna().unique()
+    )
 
-    print("\nAvailable bands to save albums for:")
-    for band in bands_df['Name'].unique():
-        save_album_subgraph(band, album_graph, output_dir_album)
-        print("Subgraph saved.")
+    start = time.perf_counter()
+    print("Rendering genre subgraphs...")
+    render_subgraphs(genre_jobs, os.path.join(output_dir_genre, 'manifest.json'), args.workers, args.force)
+    print("Rendering album subgraphs...")
+    render_subgraphs(album_jobs, os.path.join(output_dir_album, 'manifest.json'), args.workers, args.force)
+    print(f"Rendering finished in {time.perf_counter() - start:.2f} s")
         
 if __name__ == "__main__":
     main()
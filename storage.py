@@ -0,0 +1,361 @@
+"""Indexed SQLite store for bands, labels, discographies, rosters and band details.
+
+All writes go through a background thread that groups queued operations into
+one transaction, so scrapers never wait on disk. Rows are upserted by primary
+key, and resume questions ("which bands still need a discography?") are
+answered by indexed queries instead of re-reading whole CSV files.
+
+The CSV files the scrapers used to write can be regenerated with:
+
+    python storage.py export [--db metal_archives.db] [--out-dir .]
+"""
+
+import argparse
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from discography_parser import DISCOGRAPHY_COLUMNS
+
+DEFAULT_DB = "metal_archives.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bands (
+    band_id INTEGER PRIMARY KEY,
+    name TEXT,
+    url TEXT,
+    country TEXT,
+    genre TEXT,
+    status TEXT,
+    photo_url TEXT,
+    letter TEXT
+);
+CREATE TABLE IF NOT EXISTS band_details (
+    band_id INTEGER PRIMARY KEY,
+    formed_in TEXT,
+    location TEXT,
+    themes TEXT,
+    label TEXT
+);
+CREATE TABLE IF NOT EXISTS labels (
+    label_id INTEGER PRIMARY KEY,
+    name TEXT,
+    specialization TEXT,
+    status TEXT,
+    country TEXT,
+    website TEXT,
+    online_shopping TEXT
+);
+CREATE TABLE IF NOT EXISTS discography (
+    band_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    album_name TEXT,
+    type TEXT,
+    year INTEGER,
+    reviews TEXT,
+    album_id INTEGER,
+    review_count INTEGER,
+    review_average REAL,
+    PRIMARY KEY (band_id, position)
+);
+CREATE TABLE IF NOT EXISTS discography_done (
+    band_id INTEGER PRIMARY KEY,
+    scraped_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS roster (
+    label_id INTEGER NOT NULL,
+    band_id INTEGER NOT NULL,
+    PRIMARY KEY (label_id, band_id)
+);
+CREATE TABLE IF NOT EXISTS roster_done (
+    label_id INTEGER PRIMARY KEY,
+    scraped_at REAL NOT NULL
+);
+"""
+
+# CSV layouts the scrapers have always produced, keyed by table.
+EXPORTS = {
+    "bands": (
+        "metal_bands.csv",
+        ["Band ID", "Name", "URL", "Country", "Genre", "Status", "Photo_URL"],
+        "SELECT band_id, name, url, country, genre, status, photo_url FROM bands ORDER BY band_id",
+    ),
+    "band_details": (
+        "band_details.csv",
+        ["Band ID", "Formed In", "Location", "Themes", "Label"],
+        "SELECT band_id, formed_in, location, themes, label FROM band_details ORDER BY band_id",
+    ),
+    "labels": (
+        os.path.join("labels", "labels.csv"),
+        [
+            "Label ID",
+            "Name",
+            "Specialization",
+            "Status",
+            "Country",
+            "Website",
+            "Online Shopping",
+        ],
+        "SELECT label_id, name, specialization, status, country, website, online_shopping "
+        "FROM labels ORDER BY label_id",
+    ),
+    "discography": (
+        "all_bands_discography.csv",
+        DISCOGRAPHY_COLUMNS,
+        "SELECT album_id, album_name, type, year, review_count, review_average, band_id "
+        "FROM discography "
+        "ORDER BY band_id, position",
+    ),
+    "roster": (
+        os.path.join("labels_rosters", "combined_roster.csv"),
+        ["Label ID", "Band ID"],
+        "SELECT label_id, band_id FROM roster ORDER BY label_id, band_id",
+    ),
+}
+
+
+def _connect(path):
+    # The long timeout lets several queue workers share one store file.
+    connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def _chunks(items, size=500):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class Store:
+    """Handle on the SQLite store with a group-committing background writer.
+
+    Write methods only queue work; call ``flush()`` before reading back rows
+    written in the same run, and ``close()`` when done.
+    """
+
+    def __init__(self, path=DEFAULT_DB, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.db = _connect(path)
+        self.db.executescript(SCHEMA)
+        self._migrate()
+        self.db.commit()
+        self._queue = queue.Queue()
+        self._error = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _migrate(self):
+        # Bands stored before the listing letter was kept get it on their next upsert.
+        if "letter" not in {row[1] for row in self.db.execute("PRAGMA table_info(bands)")}:
+            self.db.execute("ALTER TABLE bands ADD COLUMN letter TEXT")
+        # Stores created before typed discography records lack these columns;
+        # their old rows keep the raw "reviews" text until re-scraped.
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(discography)")}
+        for column, kind in (
+            ("album_id", "INTEGER"),
+            ("review_count", "INTEGER"),
+            ("review_average", "REAL"),
+        ):
+            if column not in columns:
+                self.db.execute(f"ALTER TABLE discography ADD COLUMN {column} {kind}")
+
+    def _write_loop(self):
+        connection = _connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                with connection:
+                    for operation in batch:
+                        if operation is not None:
+                            operation(connection)
+            except Exception as e:
+                self._error = e
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                connection.close()
+                return
+
+    def _submit(self, operation):
+        if self._error:
+            raise self._error
+        self._queue.put(operation)
+
+    def flush(self):
+        """Block until every queued write is committed."""
+        self._queue.join()
+        if self._error:
+            raise self._error
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self.db.close()
+        if self._error:
+            raise self._error
+
+    def upsert_bands(self, bands, letter=None):
+        """Insert or update ``[band_id, name, url, country, genre, status, photo_url]`` rows.
+
+        ``letter`` is the listing letter the bands were found under.
+        """
+        rows = [tuple(band) + (letter,) for band in bands]
+        self._submit(
+            lambda db: db.executemany(
+                "INSERT OR REPLACE INTO bands (band_id, name, url, country, genre, status, "
+                "photo_url, letter) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        )
+
+    def upsert_band_details(self, details):
+        """Insert or update ``[band_id, formed_in, location, themes, label]`` rows."""
+        rows = [tuple(row) for row in details]
+        self._submit(
+            lambda db: db.executemany(
+                "INSERT OR REPLACE INTO band_details VALUES (?, ?, ?, ?, ?)", rows
+            )
+        )
+
+    def upsert_labels(self, labels):
+        """Insert or update rows in the labels.csv column order."""
+        rows = [tuple(label) for label in labels if label[0] is not None]
+        self._submit(
+            lambda db: db.executemany(
+                "INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+            )
+        )
+
+    def replace_discography(self, band_id, albums):
+        """Store a band's full discography, replacing any earlier scrape.
+
+        ``albums`` are the typed records produced by
+        discography_parser.extract_discography. The band is marked done even
+        when it has no albums, so only call this for pages that were fetched.
+        """
+        rows = [
+            (band_id, position, album_id, name, type_, year, count, average)
+            for position, (album_id, name, type_, year, count, average, _) in enumerate(albums)
+        ]
+        scraped_at = time.time()
+
+        def write(db):
+            db.execute("DELETE FROM discography WHERE band_id = ?", (band_id,))
+            db.executemany(
+                "INSERT INTO discography (band_id, position, album_id, album_name, type, "
+                "year, review_count, review_average) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO discography_done VALUES (?, ?)",
+                (band_id, scraped_at),
+            )
+
+        self._submit(write)
+
+    def replace_roster(self, label_id, band_ids):
+        """Store a label's complete roster, replacing any earlier scrape.
+
+        The label is marked done in the same transaction, so resumes skip it.
+        """
+        rows = [(label_id, band_id) for band_id in band_ids]
+        scraped_at = time.time()
+
+        def write(db):
+            db.execute("DELETE FROM roster WHERE label_id = ?", (label_id,))
+            db.executemany("INSERT OR IGNORE INTO roster VALUES (?, ?)", rows)
+            db.execute(
+                "INSERT OR REPLACE INTO roster_done VALUES (?, ?)", (label_id, scraped_at)
+            )
+
+        self._submit(write)
+
+    def _existing(self, table, column, ids):
+        found = set()
+        for chunk in _chunks(int(i) for i in ids):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                row[0]
+                for row in self.db.execute(
+                    f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})",
+                    chunk,
+                )
+            )
+        return found
+
+    def existing_band_ids(self, band_ids):
+        """Return the subset of ``band_ids`` (as ints) already in the bands table."""
+        return self._existing("bands", "band_id", band_ids)
+
+    def existing_label_ids(self, label_ids):
+        return self._existing("labels", "label_id", label_ids)
+
+    def scraped_band_ids(self, band_ids=None):
+        """Return the subset of ``band_ids`` whose discography is already stored.
+
+        Without ``band_ids``, every band with a stored discography.
+        """
+        if band_ids is None:
+            return {row[0] for row in self.db.execute("SELECT band_id FROM discography_done")}
+        return self._existing("discography_done", "band_id", band_ids)
+
+    def scraped_label_ids(self, label_ids):
+        """Return the subset of ``label_ids`` whose roster is already stored."""
+        return self._existing("roster_done", "label_id", label_ids)
+
+    def iter_bands(self, columns=("band_id", "name", "url")):
+        """Yield ``columns`` (by default ``(band_id, name, url)``) for every stored band."""
+        yield from self.db.execute(f"SELECT {', '.join(columns)} FROM bands ORDER BY band_id")
+
+    def count(self, table):
+        return self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def export_csv(self, table, path):
+        """Write ``table`` to ``path`` in the scrapers' original CSV layout."""
+        _, columns, query = EXPORTS[table]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(self.db.execute(query))
+
+
+def export_all(db_path, out_dir):
+    store = Store(db_path)
+    try:
+        for table, (file_name, _, _) in EXPORTS.items():
+            path = os.path.join(out_dir, file_name)
+            store.export_csv(table, path)
+            print(f"Exported {store.count(table)} rows from {table} to {path}")
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the scraper SQLite store.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    export = subcommands.add_parser("export", help="write the tables out as CSV")
+    export.add_argument("--db", default=DEFAULT_DB)
+    export.add_argument("--out-dir", default=".")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_all(args.db, args.out_dir)
+
+
+if __name__ == "__main__":
+    main()
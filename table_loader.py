@@ -0,0 +1,166 @@
+"""Typed, column-pruned loading of the scrapers' output tables.
+
+Analytics jobs read the band, label, discography and roster outputs with
+only the columns they use, integer IDs, categorical dtypes for the heavily
+repeated fields (country, genre, status, type, ...) and small nullable
+integers for years and counts, instead of object columns for everything.
+Page URLs are not worth loading: they are rebuilt from the ID and name by
+``with_urls`` when a job needs them. ``memory_report`` shows what each
+loaded table costs.
+
+Paths may be a CSV output or a Parquet root written with --parquet.
+"""
+
+import os
+from urllib.parse import quote
+
+import pandas as pd
+
+from id_set import ID_RE
+
+SITE_URL = "https://www.metal-archives.com"
+
+# name: (default path, Parquet dataset, {column: dtype}, URL path prefix).
+# "int64" columns are required IDs: rows without one are dropped.
+TABLES = {
+    "bands": (
+        "metal_bands.csv",
+        "bands",
+        {
+            "Band ID": "int64",
+            "Name": "object",
+            "URL": "object",
+            "Country": "category",
+            "Genre": "category",
+            "Status": "category",
+            "Photo_URL": "object",
+        },
+        "bands",
+    ),
+    "labels": (
+        os.path.join("labels", "labels.csv"),
+        "labels",
+        {
+            "Label ID": "int64",
+            "Name": "object",
+            "Specialization": "category",
+            "Status": "category",
+            "Country": "category",
+            "Website": "object",
+            "Online Shopping": "category",
+        },
+        "labels",
+    ),
+    "discography": (
+        "all_bands_discography.csv",
+        "discography",
+        {
+            "Album ID": "Int64",
+            "Album Name": "object",
+            "Type": "category",
+            "Year": "Int16",
+            "Review Count": "Int32",
+            "Review Average": "float32",
+            "Band ID": "int64",
+        },
+        None,
+    ),
+    "roster": (
+        os.path.join("labels_rosters", "combined_roster.csv"),
+        None,
+        {"Label ID": "int64", "Band ID": "int64"},
+        None,
+    ),
+}
+NUMERIC = {"int64", "Int64", "Int32", "Int16", "float32"}
+
+
+def _wanted(name, columns):
+    dtypes = TABLES[name][2]
+    return list(dtypes) if columns is None else [column for column in columns if column in dtypes]
+
+
+def _typed(name, df):
+    dtypes = TABLES[name][2]
+    required = [column for column in df.columns if dtypes.get(column) == "int64"]
+    for column in df.columns:
+        if dtypes[column] in NUMERIC and not pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    if required:
+        df = df.dropna(subset=required)
+    return df.astype({column: dtypes[column] for column in df.columns}).reset_index(drop=True)
+
+
+def _csv_options(name, path, wanted):
+    """read_csv arguments for ``wanted``, and whether IDs must come from URLs."""
+    header = pd.read_csv(path, nrows=0).columns
+    id_column = next(iter(TABLES[name][2]))
+    from_url = id_column in wanted and id_column not in header and "URL" in header
+    usecols = set(wanted) | ({"URL"} if from_url else set())
+    dtypes = TABLES[name][2]
+    # Numbers are parsed by pandas and coerced after; text is read as category directly.
+    dtype = {c: dtypes[c] for c in usecols if c in dtypes and dtypes[c] not in NUMERIC}
+    return {"usecols": lambda c: c in usecols, "dtype": dtype}, from_url
+
+
+def _finish_csv(name, df, wanted, from_url):
+    if from_url:
+        id_column = next(iter(TABLES[name][2]))
+        df[id_column] = df["URL"].str.extract(ID_RE, expand=False)
+    return _typed(name, df[[column for column in wanted if column in df.columns]])
+
+
+def load_table(name, path=None, columns=None):
+    """Load table ``name`` (see TABLES) with ``columns``, or all of its columns.
+
+    Requested columns missing from the file are left out. Band files written
+    before the Band ID column existed get their IDs from the URLs.
+    """
+    default_path, dataset, _, _ = TABLES[name]
+    path = path or default_path
+    wanted = _wanted(name, columns)
+    if os.path.isdir(path):
+        from parquet_output import read_dataset
+
+        return _typed(name, read_dataset(path, dataset, columns=wanted))
+    options, from_url = _csv_options(name, path, wanted)
+    return _finish_csv(name, pd.read_csv(path, **options), wanted, from_url)
+
+
+def iter_table(name, path=None, columns=None, chunk_size=200_000):
+    """Like load_table for a CSV, in typed chunks of ``chunk_size`` rows.
+
+    Categoricals are not shared between chunks; use it for ID-only streams.
+    """
+    path = path or TABLES[name][0]
+    wanted = _wanted(name, columns)
+    options, from_url = _csv_options(name, path, wanted)
+    for chunk in pd.read_csv(path, chunksize=chunk_size, **options):
+        yield _finish_csv(name, chunk, wanted, from_url)
+
+
+def page_urls(name, ids, names):
+    """Page URLs of bands or labels rebuilt from their IDs and names."""
+    prefix = TABLES[name][3]
+    return [
+        f"{SITE_URL}/{prefix}/{quote(str(n).replace(' ', '_').replace('/', '-'), safe='!$&()*+,-.:;=@_')}/{i}"
+        for i, n in zip(ids, names)
+    ]
+
+
+def with_urls(name, df):
+    """``df`` with a URL column rebuilt from its ID and Name columns."""
+    id_column = next(iter(TABLES[name][2]))
+    return df.assign(URL=page_urls(name, df[id_column], df["Name"]))
+
+
+def memory_report(tables):
+    """One line per ``{name: DataFrame}`` with rows, total MB and the largest columns."""
+    lines = []
+    for name, df in tables.items():
+        usage = df.memory_usage(deep=True, index=False).sort_values(ascending=False)
+        largest = ", ".join(f"{column} {size / 1024**2:.1f}" for column, size in usage.head(3).items())
+        lines.append(
+            f"{name}: {len(df)} rows, {usage.sum() / 1024**2:.1f} MB ({largest})"
+        )
+    return "\n".join(lines)
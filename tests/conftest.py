@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+
+def mock_band(band_id, name=None, status="Active"):
+    name = name or f"Band {band_id}"
+    return {
+        "id": band_id,
+        "name": name,
+        "url": f"https://www.metal-archives.com/bands/{name.replace(' ', '_')}/{band_id}",
+        "country": "Norway",
+        "genre": "Black Metal",
+        "status": status,
+    }
+
+
+@pytest.fixture
+def mock_site(monkeypatch):
+    """Start a mock Metal Archives for ``bands`` (mock_band dicts) and point the engine at it."""
+    from mock_server import MockArchive, start_in_thread
+
+    def start(bands, labels=(), **faults):
+        archive = MockArchive(bands, list(labels), **faults)
+        monkeypatch.setenv("METAL_ARCHIVES_URL", start_in_thread(archive))
+        return archive
+
+    return start
@@ -0,0 +1,102 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+import band_scraper
+from conftest import mock_band
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def scrape(bands, **kwargs):
+    asyncio.run(band_scraper.scrape_discographies(bands, workers=2, rate=None, **kwargs))
+
+
+def test_failed_bands_stay_pending(workdir, mock_site):
+    mock_site([mock_band(20), mock_band(21)])
+    # 404 is not retried; band 999 is unknown to the mock site.
+    scrape([("Band 20", "20"), ("Ghost", "999"), ("Band 21", "21")])
+
+    done = band_scraper.done_band_ids()
+    assert 20 in done and 21 in done
+    assert 999 not in done
+    master = pd.read_csv(band_scraper.MASTER_DISCO_FILE)
+    assert set(master["Band ID"]) == {20, 21}
+    assert len(master) == 20 % 13 + 21 % 13
+
+
+def test_bands_without_albums_are_done(workdir, mock_site):
+    mock_site([mock_band(26)])
+    scrape([("Band 26", "26")])
+    assert 26 in band_scraper.done_band_ids()
+    assert not (workdir / band_scraper.MASTER_DISCO_FILE).exists()
+
+
+def test_rescrape_replaces_rows_of_written_bands_only(workdir, mock_site):
+    mock_site([mock_band(20), mock_band(21)])
+    scrape([("Band 20", "20"), ("Band 21", "21")])
+    master = pd.read_csv(band_scraper.MASTER_DISCO_FILE)
+    stale = master[master["Band ID"] == 20].head(1).assign(**{"Band ID": 999})
+    stale.to_csv(band_scraper.MASTER_DISCO_FILE, mode="a", header=False, index=False)
+
+    scrape([("Band 20", "20"), ("Ghost", "999")], replace=True)
+
+    master = pd.read_csv(band_scraper.MASTER_DISCO_FILE)
+    counts = master["Band ID"].value_counts()
+    assert counts[20] == 20 % 13
+    assert counts[21] == 21 % 13
+    # Band 999 failed, so its old row is kept.
+    assert counts[999] == 1
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr("sys.argv", ["band_scraper.py", "--no-cache", "--workers", "2", *args])
+    band_scraper.main()
+
+
+def test_band_list_path_does_not_trigger_rescrape(workdir, mock_site, monkeypatch):
+    listed = [mock_band(20), mock_band(21)]
+    site = mock_site(listed)
+    bands = pd.DataFrame({"Name": [b["name"] for b in listed], "URL": [b["url"] for b in listed]})
+    bands.to_csv("metal_bands.csv", index=False)
+    run_main(monkeypatch, "--bands-file", "./metal_bands.csv")
+    before = (workdir / band_scraper.MASTER_DISCO_FILE).read_text()
+    fetched = sum(site.requests.values())
+
+    run_main(monkeypatch, "--bands-file", str(workdir / "metal_bands.csv"))
+    assert (workdir / band_scraper.MASTER_DISCO_FILE).read_text() == before
+    assert sum(site.requests.values()) == fetched
+
+    run_main(monkeypatch, "--bands-file", "metal_bands.csv", "--rescrape")
+    assert pd.read_csv(band_scraper.MASTER_DISCO_FILE)["Band ID"].value_counts().to_dict() == {
+        20: 20 % 13,
+        21: 21 % 13,
+    }
+    assert sum(site.requests.values()) > fetched
+
+
+def test_done_bands_come_from_the_master_and_done_files(workdir):
+    assert len(band_scraper.done_band_ids()) == 0
+    band_scraper.save_to_master_file([[7, "Demo", "Demo", 1990, None, None, 5]])
+    # Bands without albums are only in the done file.
+    band_scraper.save_done_bands([5, 6])
+    band_scraper.save_done_bands([8])
+    assert list(band_scraper.done_band_ids().ids) == [5, 6, 8]
+
+
+def test_csv_writer_marks_bands_done_only_with_their_rows(workdir):
+    writer = band_scraper.CsvDiscographyWriter(batch_size=3)
+    writer.add(5, [[7, "Demo", "Demo", 1990, None, None, 5]])
+    writer.add(6, None)
+    assert len(band_scraper.done_band_ids()) == 0
+    writer.add(8, [[9, "A", "EP", 1991, None, None, 8], [10, "B", "EP", 1992, None, None, 8]])
+    # The batch is full: rows and done marks are written together.
+    assert list(band_scraper.done_band_ids().ids) == [5, 8]
+    writer.add(9, [])
+    writer.flush()
+    assert list(band_scraper.done_band_ids().ids) == [5, 8, 9]
@@ -0,0 +1,58 @@
+import pytest
+
+import discography_parser
+from mock_server import ALBUM_TITLES, discography_page
+
+PAGE = """
+<table class="display discog"><thead><tr><th>Name</th><th>Type</th><th>Year</th><th>Reviews</th></tr></thead>
+<tbody>
+<tr><td><a href="https://www.metal-archives.com/albums/X/Ænima/123">Ænima</a></td>
+    <td>Full-length</td><td>1996</td>
+    <td><a href="https://www.metal-archives.com/reviews/X/123/">7 (88.5%)</a></td></tr>
+<tr><td><a href="https://www.metal-archives.com/albums/X/Demo/124">Über Tod &amp; Teufel</a></td>
+    <td>Demo</td><td>&nbsp;</td><td>&nbsp;</td></tr>
+<tr><td colspan="4">Nothing entered yet.</td></tr>
+</tbody></table>
+"""
+
+EXPECTED = [
+    [123, "Ænima", "Full-length", 1996, 7, 88.5, 42],
+    [124, "Über Tod & Teufel", "Demo", None, None, None, 42],
+]
+
+
+def extractors():
+    found = []
+    if discography_parser.lxml is not None:
+        found.append(discography_parser._extract_lxml)
+    try:
+        import bs4  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        found.append(discography_parser._extract_soup)
+    return found
+
+
+@pytest.mark.parametrize("extract", extractors(), ids=lambda extract: extract.__name__)
+def test_typed_records_from_utf8_bytes(extract):
+    records = extract(PAGE.encode("utf-8"), "42")
+    assert records == EXPECTED
+    assert [type(value) for value in records[0]] == [int, str, str, int, int, float, int]
+
+
+def test_extractors_agree_on_mock_pages():
+    found = extractors()
+    if not found:
+        pytest.skip("neither lxml nor beautifulsoup4 is installed")
+    for band_id in range(20, 40):
+        body = discography_page(band_id).encode("utf-8")
+        results = [extract(body, band_id) for extract in found]
+        assert all(result == results[0] for result in results)
+        names = [record[1] for record in results[0]]
+        assert names == [f"{ALBUM_TITLES[k % len(ALBUM_TITLES)]} {k}" for k in range(band_id % 13)]
+
+
+def test_page_without_table():
+    assert discography_parser.extract_discography(b"<p>No discography</p>", 1) is None
+    assert discography_parser.extract_discography(b"", 1) in (None, [])
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from discography_planner import band_frame, parse_priority, plan
+from id_set import IdSet
+
+
+def bands():
+    return band_frame(
+        pd.DataFrame(
+            {
+                "Band ID": [4, None, 2, 4, 3, None],
+                "Name": ["Four", "One", "Two", "Four again", "Three", "Nameless"],
+                "URL": ["u/4", "https://x/bands/One/1", "u/2", "u/4", "u/3", "no id"],
+                "Status": ["Active", "Split-up", "Active", "Active", "On hold", "Active"],
+            }
+        )
+    )
+
+
+def test_band_frame_takes_missing_ids_from_the_url():
+    frame = bands()
+    assert list(frame["Band ID"]) == [4, 1, 2, 4, 3, -1]
+    assert frame["Letter"].isna().all()
+
+
+def test_plan_skips_done_bands_in_list_order():
+    # Bands without an ID and repeated rows are dropped.
+    assert plan(bands(), IdSet([2])) == [("Four", "4"), ("One", "1"), ("Three", "3")]
+    assert plan(bands(), IdSet([1, 2, 3, 4])) == []
+
+
+def test_priority_is_a_stable_sort():
+    assert plan(bands(), IdSet(), ["active"]) == [("Four", "4"), ("Two", "2"), ("One", "1"), ("Three", "3")]
+    new_ids = IdSet([3, 2])
+    assert plan(bands(), IdSet(), ["new", "active"], new_ids) == [
+        ("Two", "2"),
+        ("Three", "3"),
+        ("Four", "4"),
+        ("One", "1"),
+    ]
+
+
+def test_shards_split_the_pending_bands():
+    shards = [plan(bands(), IdSet([4]), shards=2, shard=shard) for shard in (0, 1)]
+    assert shards == [[("Two", "2")], [("One", "1"), ("Three", "3")]]
+
+
+def test_unknown_priority_is_rejected():
+    assert parse_priority(" active , new") == ["active", "new"]
+    assert parse_priority(None) == []
+    with pytest.raises(ValueError, match="unknown priority oldest"):
+        parse_priority("active,oldest")
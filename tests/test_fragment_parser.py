@@ -0,0 +1,22 @@
+from fragment_parser import anchor, text
+
+
+def test_anchor_fast_path():
+    assert anchor('<a href="https://x/bands/A%26B/1?a=1&amp;b=2">A &amp; B</a>') == (
+        "A & B",
+        "https://x/bands/A%26B/1?a=1&b=2",
+    )
+    assert anchor("plain&nbsp;text ") == ("plain text", None)
+    assert anchor("") == ("", None)
+
+
+def test_text_shapes():
+    assert text('<span class="active">Active</span>') == "Active"
+    assert text("Black&#39;n&#39;Roll") == "Black'n'Roll"
+    assert text(None) == ""
+
+
+def test_fallback_unescapes_once():
+    fragment = '<em><a href="/x?a=1&amp;b=2">Tom &amp;amp; Jerry</a></em> &lt;demo&gt;'
+    assert anchor(fragment) == ("Tom &amp; Jerry <demo>", "/x?a=1&b=2")
+    assert text("<b>&amp;lt;</b>") == "&lt;"
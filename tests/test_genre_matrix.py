@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip("scipy")
+
+from genre_matrix import tokenize_genre  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "genre, tokens",
+    [
+        ("Heavy/Power Metal", ["Heavy Metal", "Power Metal"]),
+        ("Doom/Sludge/Stoner Metal", ["Doom Metal", "Sludge Metal", "Stoner Metal"]),
+        ("Black Metal (early); Death Metal (later)", ["Black Metal", "Death Metal"]),
+        ("Heavy/Hard Rock/Glam", ["Heavy Rock", "Hard Rock", "Glam"]),
+        ("Death/Black Metal, Ambient", ["Death Metal", "Black Metal", "Ambient"]),
+        ("Thrash Metal/Rock", ["Thrash Metal", "Rock"]),
+        ("Black/Black Metal", ["Black Metal"]),
+        (None, []),
+    ],
+)
+def test_tokenize_genre(genre, tokens):
+    assert tokenize_genre(genre) == tokens
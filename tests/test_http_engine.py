@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+from http_engine import ConcurrencyController
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_limit_grows_by_one_per_window_up_to_the_maximum():
+    async def main():
+        controller = ConcurrencyController(initial=2, maximum=4)
+        # Each response adds 1 / limit: 2 -> 2.5 -> 2.9 -> 3.24.
+        for _ in range(3):
+            await controller.acquire()
+            controller.release(True, latency=0.1)
+        assert int(controller.limit) == 3
+        for _ in range(100):
+            await controller.acquire()
+            controller.release(True, latency=0.1)
+        assert controller.limit == 4
+
+    run(main())
+
+
+def test_rising_latency_stops_the_increase():
+    async def main():
+        controller = ConcurrencyController(initial=2, maximum=10, latency_tolerance=2.0)
+        await controller.acquire()
+        controller.release(True, latency=0.1)
+        limit = controller.limit
+        for _ in range(50):
+            await controller.acquire()
+            controller.release(True, latency=1.0)
+        # The smoothed latency passes twice the best one within a few responses.
+        assert controller.limit < limit + 1
+
+    run(main())
+
+
+def test_errors_cut_the_limit_once_per_round_trip():
+    async def main():
+        controller = ConcurrencyController(initial=8, maximum=8, minimum=2)
+        await controller.acquire()
+        controller.release(True, latency=0.05)
+        for _ in range(3):
+            await controller.acquire()
+            controller.release(False)
+        # One burst of failures counts once.
+        assert controller.limit == 8 * 0.5
+        await asyncio.sleep(0.06)
+        await controller.acquire()
+        controller.release(False)
+        assert controller.limit == 2
+        await asyncio.sleep(0.06)
+        await controller.acquire()
+        controller.release(False)
+        assert controller.limit == 2
+        # A request that never finished says nothing about the server.
+        await asyncio.sleep(0.06)
+        await controller.acquire()
+        controller.release(None)
+        assert controller.limit == 2
+
+    run(main())
+
+
+def test_waiters_are_served_in_order_within_the_limit():
+    async def main():
+        controller = ConcurrencyController(initial=1, maximum=1)
+        served = []
+
+        async def request(name):
+            await controller.acquire()
+            served.append(name)
+
+        await controller.acquire()
+        tasks = [asyncio.create_task(request(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert served == [] and controller.in_flight == 1
+        cancelled = tasks.pop(1)
+        cancelled.cancel()
+        controller.release(True, latency=0.01)
+        await asyncio.sleep(0)
+        assert served == ["a"]
+        controller.release(True, latency=0.01)
+        await asyncio.gather(*tasks)
+        assert served == ["a", "c"] and controller.in_flight == 1
+
+    run(main())
+
+
+def test_retry_after_holds_back_new_requests():
+    async def main():
+        controller = ConcurrencyController(initial=4, maximum=4)
+        await controller.acquire()
+        controller.release(False, retry_after=0.1)
+        start = time.monotonic()
+        await controller.acquire()
+        assert time.monotonic() - start >= 0.09
+
+    run(main())
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from id_set import IdSet, to_ids
+
+
+def test_ids_are_parsed_sorted_and_deduplicated():
+    ids = IdSet(["30", 10, "10", None, "x", 3_000_000_000])
+    assert list(ids.ids) == [10, 30, 3_000_000_000]
+    assert len(ids) == 3
+    assert list(to_ids(["7", None, "n/a"])) == [7, -1, -1]
+
+
+def test_contains_checks_a_whole_page_at_once():
+    ids = IdSet([5, 10, 20])
+    assert list(ids.contains(["1", 5, "20", 25, None])) == [False, True, True, False, False]
+    assert list(IdSet().contains([1, 2])) == [False, False]
+    assert 10 in ids and "10" in ids and 11 not in ids
+
+
+def test_add_merges_new_ids():
+    ids = IdSet([5])
+    ids.add(np.array([7, 5, -1], dtype=np.int64))
+    ids.add(["1"])
+    assert list(ids.ids) == [1, 5, 7]
+
+
+def test_from_csv_falls_back_to_the_url(tmp_path):
+    path = tmp_path / "bands.csv"
+    pd.DataFrame(
+        {
+            "Band ID": ["1", None, "3"],
+            "URL": ["https://x/bands/A/1", "https://x/bands/B/2", "https://x/bands/C/99"],
+        }
+    ).to_csv(path, index=False)
+    assert list(IdSet.from_csv(path, "Band ID", url_column="URL", chunk_size=2).ids) == [1, 2, 3]
+    # Older files have only URLs.
+    pd.DataFrame({"URL": ["https://x/bands/A/4"]}).to_csv(path, index=False)
+    assert list(IdSet.from_csv(path, "Band ID", url_column="URL").ids) == [4]
@@ -0,0 +1,29 @@
+from journal import CrawlJournal
+
+
+def test_replay_restores_bands_pages_and_letters(tmp_path):
+    path = str(tmp_path / "journal.log")
+    journal = CrawlJournal(path)
+    journal.bands_written([11, 12])
+    journal.pages_written("A", [0, 500])
+    journal.letter_done("B")
+    journal.close()
+
+    journal = CrawlJournal(path)
+    assert 11 in journal.done_bands and 12 in journal.done_bands
+    assert 13 not in journal.done_bands
+    assert journal.done_pages == {("A", 0), ("A", 500)}
+    assert journal.done_letters == {"B"}
+    journal.close()
+
+
+def test_torn_final_line_is_dropped(tmp_path):
+    path = tmp_path / "journal.log"
+    path.write_bytes(b"B 1\nP A 0\nB 2")
+    journal = CrawlJournal(str(path))
+    assert 1 in journal.done_bands
+    assert 2 not in journal.done_bands
+    assert journal.done_pages == {("A", 0)}
+    journal.bands_written([3])
+    journal.close()
+    assert path.read_bytes() == b"B 1\nP A 0\nB 3\n"
@@ -0,0 +1,37 @@
+import asyncio
+
+import pandas as pd
+
+import label_roster
+from conftest import mock_band
+
+
+def test_legacy_rosters_with_a_full_page_are_completed(tmp_path, mock_site, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bands = [mock_band(band_id) for band_id in range(1, 151)]
+    labels = [{"Label ID": str(label_id), "Name": f"Label {label_id}"} for label_id in (1, 2, 3)]
+    site = mock_site(bands, labels)
+    label_one = [band["id"] for band in site.rosters["1"]]
+    label_two = [band["id"] for band in site.rosters["2"]]
+    # The old scraper stopped after the first 100 bands of a label.
+    path = tmp_path / label_roster.ROSTER_FILE
+    path.parent.mkdir()
+    legacy = [(1, band_id) for band_id in label_one[:100]] + [(2, band_id) for band_id in label_two]
+    pd.DataFrame(legacy, columns=["Label ID", "Band ID"]).to_csv(path, index=False)
+
+    done, partial = label_roster.done_label_ids()
+    assert list(done.ids) == [2]
+    assert set(partial) == {1} and len(partial[1]) == 100
+
+    labels_df = pd.DataFrame({"Label ID": [1, 2, 3], "Name": ["Label 1", "Label 2", "Label 3"]})
+    asyncio.run(label_roster.fetch_rosters(labels_df, str(path)))
+
+    roster = pd.read_csv(path)
+    assert not roster.duplicated().any()
+    assert roster.groupby("Label ID")["Band ID"].apply(set).to_dict() == {
+        1: set(label_one),
+        2: set(label_two),
+        3: {band["id"] for band in site.rosters["3"]},
+    }
+    # Two pages of label 1 and one of label 3; label 2 is not fetched again.
+    assert site.requests["ajax-bands"] == 3
@@ -0,0 +1,56 @@
+import asyncio
+
+from listing_planner import crawl_listing, plan_offsets
+
+
+def test_plan_offsets_covers_every_record():
+    assert plan_offsets(250, 100) == [0, 100, 200]
+    assert plan_offsets(200, 100) == [0, 100]
+    # An empty listing still has its first page.
+    assert plan_offsets(0, 100) == [0]
+
+
+def crawl(totals, fail=(), done_pages=()):
+    fetched, pages, finished = [], [], {}
+
+    async def fetch(category, offset):
+        fetched.append((category, offset))
+        # Later pages answer first, so in-order delivery is not a given.
+        await asyncio.sleep(0.01 / (1 + offset // 100))
+        if (category, offset) in fail:
+            return None
+        total = totals[category]
+        rows = [[f"{category}{i}"] for i in range(offset, min(offset + 100, total))]
+        return {"iTotalRecords": total, "aaData": rows}
+
+    async def on_page(category, offset, rows):
+        pages.append((category, offset, len(rows)))
+
+    def on_done(category, complete):
+        finished[category] = complete
+
+    result = asyncio.run(crawl_listing(list(totals), fetch, 100, on_page, on_done, done_pages))
+    return result, fetched, pages, finished
+
+
+def test_pages_are_handed_out_in_offset_order():
+    result, fetched, pages, finished = crawl({"A": 250, "B": 0})
+    assert result == finished == {"A": True, "B": True}
+    assert [page for page in pages if page[0] == "A"] == [("A", 0, 100), ("A", 100, 100), ("A", 200, 50)]
+    # Empty pages are not handed out.
+    assert not [page for page in pages if page[0] == "B"]
+    assert sorted(fetched) == [("A", 0), ("A", 100), ("A", 200), ("B", 0)]
+
+
+def test_a_failed_page_stops_its_category_only():
+    result, _, pages, _ = crawl({"A": 350, "B": 150}, fail={("A", 100)})
+    assert result == {"A": False, "B": True}
+    assert [offset for category, offset, _ in pages if category == "A"] == [0]
+    assert [offset for category, offset, _ in pages if category == "B"] == [0, 100]
+
+
+def test_done_pages_are_not_fetched_again():
+    _, fetched, pages, _ = crawl({"A": 250}, done_pages={("A", 100)})
+    # The first page is always read for iTotalRecords.
+    assert sorted(fetched) == [("A", 0), ("A", 200)]
+    assert [offset for _, offset, _ in pages] == [0, 200]
@@ -0,0 +1,69 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import main
+from conftest import mock_band
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def run_main(monkeypatch, *args):
+    # Listing pages are cached for hours; each run here must see the site as it is now.
+    shutil.rmtree("http_cache", ignore_errors=True)
+    monkeypatch.setattr("sys.argv", ["main.py", *args])
+    main.main()
+
+
+def changed_ids():
+    return set(pd.read_csv(main.CHANGED_BANDS_FILE)["Band ID"])
+
+
+def test_select_bands_leaves_fingerprints_alone():
+    listing = ["5", "Abc", "u", "Norway", "Black Metal", "Active"]
+    fingerprints = {"5": main.row_fingerprint("Abc", "Norway", "Black Metal", "Split-up")}
+    before = dict(fingerprints)
+    assert main.select_bands([listing], None, fingerprints) == [listing]
+    assert fingerprints == before
+
+
+def test_incremental_run_lists_changed_bands(workdir, mock_site, monkeypatch):
+    site = mock_site([mock_band(20, "Alpha"), mock_band(21, "Beta")])
+    run_main(monkeypatch, "--incremental")
+    assert changed_ids() == {20, 21}
+    assert not os.path.exists(main.JOURNAL_FILE)
+
+    site.bands[21]["status"] = "Split-up"
+    run_main(monkeypatch, "--incremental")
+    assert changed_ids() == {21}
+    bands = pd.read_csv("metal_bands.csv")
+    assert bands.set_index("Band ID")["Status"].to_dict() == {20: "Active", 21: "Split-up"}
+
+
+def test_crash_keeps_unwritten_bands_changed(workdir, mock_site, monkeypatch):
+    mock_site([mock_band(20, "Alpha"), mock_band(21, "Beta")])
+    save_to_csv = main.save_to_csv
+
+    def failing_save(bands):
+        if any(band[1] == "Beta" for band in bands):
+            raise OSError("disk full")
+        save_to_csv(bands)
+
+    monkeypatch.setattr(main, "save_to_csv", failing_save)
+    with pytest.raises(OSError):
+        run_main(monkeypatch, "--incremental")
+    # Letter A may or may not have been written, but Beta never was.
+    assert "21" not in main.load_fingerprints()
+    assert os.path.exists(main.JOURNAL_FILE)
+
+    monkeypatch.setattr(main, "save_to_csv", save_to_csv)
+    run_main(monkeypatch, "--incremental")
+    assert set(pd.read_csv("metal_bands.csv")["Band ID"]) == {20, 21}
+    assert set(main.load_fingerprints()) == {"20", "21"}
+    assert not os.path.exists(main.JOURNAL_FILE)
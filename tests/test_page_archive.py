@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("zstandard")
+
+from page_archive import PageArchive, iter_segment  # noqa: E402
+
+
+def test_round_trip_and_reopen(tmp_path):
+    archive = PageArchive(str(tmp_path), commit_every=2)
+    pages = {f"https://x/band/discography/id/{i}/tab/all": f"page {i} ü".encode() for i in range(5)}
+    for url, body in pages.items():
+        archive.put("discography", url, body)
+    archive.put("band", "https://x/bands/a/1", b"band page")
+    for url, body in pages.items():
+        assert archive.get(url) == body
+    assert archive.get("https://x/missing") is None
+    archive.close()
+
+    archive = PageArchive(str(tmp_path))
+    assert archive.count() == 6
+    assert archive.count("discography") == 5
+    read = {}
+    for segment, first, last in archive.chunks("discography", pages_per_chunk=2):
+        read.update(iter_segment(str(tmp_path), segment, "discography", first, last))
+    assert read == pages
+    archive.close()
+
+
+def test_rearchive_repoints_and_only_missing_skips(tmp_path):
+    archive = PageArchive(str(tmp_path))
+    archive.put("band", "u", b"old")
+    archive.put("band", "u", b"new")
+    archive.put("band", "u", b"cached", only_missing=True)
+    archive.put("band", "v", b"cached", only_missing=True)
+    assert archive.get("u") == b"new"
+    assert archive.get("v") == b"cached"
+    assert archive.count() == 2
+    archive.close()
+
+
+def test_segments_roll_over(tmp_path):
+    archive = PageArchive(str(tmp_path), segment_bytes=1)
+    for i in range(3):
+        archive.put("band", f"u{i}", b"body %d" % i)
+    archive.flush()
+    assert len(archive.chunks()) == 3
+    assert [archive.get(f"u{i}") for i in range(3)] == [b"body 0", b"body 1", b"body 2"]
+    archive.close()
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from parquet_output import DatasetWriter, read_dataset  # noqa: E402
+
+
+def write(root, name, letter, rows):
+    writer = DatasetWriter(str(root), name)
+    writer.add(letter, rows)
+    writer.flush()
+    # Part files are ordered by their write time in ms.
+    time.sleep(0.002)
+
+
+def test_newer_band_rows_replace_older_ones(tmp_path):
+    write(tmp_path, "bands", "A", [[1, "Abc", "u", "Norway", "Black Metal", "Active", None]])
+    write(tmp_path, "bands", "A", [[2, "Axe", "u", "Sweden", "Doom Metal", "Active", None]])
+    # A renamed band moves to another letter; only its newest row counts.
+    write(tmp_path, "bands", "Z", [[1, "Zbc", "u", "Norway", "Black Metal", "Split-up", None]])
+
+    bands = read_dataset(str(tmp_path), "bands", columns=["Name", "Status"])
+    assert list(bands.columns) == ["Name", "Status"]
+    assert sorted(bands.itertuples(index=False)) == [("Axe", "Active"), ("Zbc", "Split-up")]
+    assert list(read_dataset(str(tmp_path), "bands", letters=["A"])["Band ID"]) == [2]
+
+
+def test_rescraped_discography_replaces_the_whole_band(tmp_path):
+    write(
+        tmp_path,
+        "discography",
+        "A",
+        [[7, "Demo", "Demo", 1990, None, None, 1], [8, "LP", "Full-length", 1992, 3, 80.0, 1]],
+    )
+    write(tmp_path, "discography", "A", [[9, "Other", "EP", 1995, None, None, 2]])
+    write(tmp_path, "discography", "A", [[8, "LP", "Full-length", 1992, 4, 82.5, 1]])
+
+    albums = read_dataset(str(tmp_path), "discography").sort_values("Album ID")
+    assert list(albums["Album ID"]) == [8, 9]
+    assert albums["Review Count"].iloc[0] == 4
@@ -0,0 +1,49 @@
+import asyncio
+
+from mock_server import MockArchive, photo_url, start_in_thread
+from photo_mirror import PhotoIndex, PhotoMirror, object_path, plan_photos
+
+BANDS = [
+    {"id": band_id, "name": f"Band {band_id}", "url": "", "country": "", "genre": "", "status": ""}
+    for band_id in (101, 151, 202)
+]
+
+
+def mirror_once(directory, bands):
+    index = PhotoIndex(directory)
+    known = index.load()
+    downloads, _ = plan_photos(bands, known, thumbnails=False)
+    mirror = PhotoMirror(directory, index, known)
+    asyncio.run(mirror.run(downloads, [], workers=2, rate=None))
+    index.close()
+    return downloads, mirror.counts
+
+
+def test_resume_skips_mirrored_photos(tmp_path, monkeypatch):
+    archive = MockArchive(BANDS, [])
+    monkeypatch.setenv("METAL_ARCHIVES_URL", start_in_thread(archive))
+    directory = str(tmp_path / "photos")
+    bands = [(band["id"], photo_url(band["id"])) for band in BANDS]
+
+    downloads, counts = mirror_once(directory, bands)
+    assert len(downloads) == 3
+    # 101 and 151 share an image (band_id % 50), so it is stored once.
+    assert counts["stored"] == 2 and counts["deduplicated"] == 1
+
+    requests = sum(archive.requests.values())
+    downloads, _ = mirror_once(directory, bands)
+    assert downloads == []
+    assert sum(archive.requests.values()) == requests
+
+    # A new cache-buster is fetched conditionally and the image kept.
+    bands[0] = (101, photo_url(101).split("?")[0] + "?changed")
+    downloads, counts = mirror_once(directory, bands)
+    assert downloads == [bands[0]]
+    assert counts["unchanged"] == 1 and counts["stored"] == 0
+
+    index = PhotoIndex(directory)
+    row = index.load()[101]
+    index.close()
+    assert row[1] == "changed"
+    with open(object_path(directory, row[2], row[3]), "rb") as f:
+        assert f.read(8) == b"\x89PNG\r\n\x1a\n"
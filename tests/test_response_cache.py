@@ -0,0 +1,69 @@
+import time
+
+from response_cache import ResponseCache
+
+URL = "https://www.metal-archives.com/bands/X/1"
+
+
+def test_fresh_entry_round_trip(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttls=[(r".", 60)])
+    cache.store(URL, b"page", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    entry = cache.lookup(URL)
+    assert entry.fresh
+    assert entry.body == b"page"
+    assert entry.headers["ETag"] == '"v1"'
+    assert cache.lookup(URL + "/other") is None
+    cache.close()
+
+
+def test_stale_entry_is_revalidated(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttls=[(r".", 0.05)])
+    cache.store(URL, b"page", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+    time.sleep(0.1)
+    entry = cache.lookup(URL)
+    assert not entry.fresh
+    assert entry.validators() == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    cache.revalidated(URL)
+    assert cache.lookup(URL).fresh
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=25)
+    cache.store("a", b"x" * 10, {})
+    time.sleep(0.01)
+    cache.store("b", b"y" * 10, {})
+    time.sleep(0.01)
+    # The hit on "a" is only held in memory until the next write.
+    cache.lookup("a")
+    cache.store("c", b"z" * 10, {})
+    assert cache.lookup("a") is not None
+    assert cache.lookup("b") is None
+    assert cache.lookup("c") is not None
+    assert cache.total_bytes == 20
+    cache.close()
+
+
+def test_access_times_survive_close(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store("a", b"x", {})
+    stored_at = cache.db.execute("SELECT accessed_at FROM entries").fetchone()[0]
+    time.sleep(0.01)
+    cache.lookup("a")
+    cache.close()
+
+    cache = ResponseCache(str(tmp_path))
+    assert cache.db.execute("SELECT accessed_at FROM entries").fetchone()[0] > stored_at
+    cache.close()
+
+
+def test_missing_body_file_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.store(URL, b"page", {})
+    (tmp_path / cache._body_path(URL)).unlink()
+    assert cache.lookup(URL) is None
+    assert cache.total_bytes == 0
+    cache.close()
@@ -0,0 +1,29 @@
+import pandas as pd
+
+import roster_join
+
+
+def test_outputs_have_one_header_when_chunks_match_nothing(tmp_path):
+    pd.DataFrame({"Band ID": [1, 2, 3], "Name": ["A", "B", "C"], "Status": "Active"}).to_csv(
+        tmp_path / "bands.csv", index=False
+    )
+    pd.DataFrame({"Label ID": [10], "Name": ["L"], "Status": "Active"}).to_csv(
+        tmp_path / "labels.csv", index=False
+    )
+    # With two rows per chunk the first chunk holds only unknown bands.
+    pd.DataFrame({"Label ID": [10, 10, 10, 10], "Band ID": [98, 99, 1, 2]}).to_csv(
+        tmp_path / "roster.csv", index=False
+    )
+
+    counts = roster_join.join_rosters(
+        tmp_path / "bands.csv", tmp_path / "labels.csv", tmp_path / "roster.csv", tmp_path, chunk_size=2
+    )
+
+    assert counts["missing_band"] == 2
+    band_roster = pd.read_csv(tmp_path / "metal_bands_roster.csv")
+    assert list(band_roster["Band ID"]) == [1, 2, 3]
+    assert list(band_roster["Label ID"].fillna(0)) == [10, 10, 0]
+    complete = pd.read_csv(tmp_path / "complete_roster.csv")
+    assert list(complete.columns) == ["Band ID", "Name_x", "Status_x", "Label ID", "Name_y", "Status_y"]
+    assert len(complete) == 3
+    assert len(pd.read_csv(tmp_path / "labels_roster.csv")) == 4
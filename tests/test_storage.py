@@ -0,0 +1,174 @@
+import asyncio
+import csv
+import os
+import sqlite3
+
+import pytest
+
+import band_scraper
+from conftest import mock_band
+from storage import Store, export_all
+
+ALBUM = [7, "Demo", "Demo", 1990, None, None, 1]
+
+
+def test_discography_is_replaced_and_marked_done(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    store.replace_discography(1, [ALBUM, [8, "Second", "Full-length", 1992, 3, 85.0, 1]])
+    store.replace_discography(1, [ALBUM])
+    store.replace_discography(2, [])
+    store.flush()
+    assert store.count("discography") == 1
+    assert store.scraped_band_ids() == {1, 2}
+    assert store.scraped_band_ids([2, 3]) == {2}
+    store.close()
+
+
+def test_bands_keep_their_listing_letter(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    store.upsert_bands([[5, "Abc", "u", "Norway", "Black Metal", "Active", None]], "A")
+    store.upsert_bands([[5, "Abc", "u2", "Norway", "Black Metal", "Split-up", None]], "A")
+    store.flush()
+    assert list(store.iter_bands(("band_id", "url", "status", "letter"))) == [(5, "u2", "Split-up", "A")]
+    assert store.existing_band_ids([5, 6]) == {5}
+    store.close()
+
+
+def test_roster_is_replaced_in_one_go(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    store.replace_roster(9, [1, 2, 3])
+    store.replace_roster(9, [2, 4])
+    store.flush()
+    assert sorted(store.db.execute("SELECT band_id FROM roster WHERE label_id = 9")) == [(2,), (4,)]
+    assert store.scraped_label_ids([9, 10]) == {9}
+    store.close()
+
+
+def test_export_uses_the_csv_layout(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    store.replace_discography(1, [ALBUM])
+    store.flush()
+    path = tmp_path / "out.csv"
+    store.export_csv("discography", str(path))
+    store.close()
+    with open(path, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [
+            ["Album ID", "Album Name", "Type", "Year", "Review Count", "Review Average", "Band ID"],
+            ["7", "Demo", "Demo", "1990", "", "", "1"],
+        ]
+
+
+def test_writes_survive_close_and_reopen(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = Store(path)
+    store.upsert_labels([[3, "Lbl", "Black", "Active", "Norway", None, "No"], [None, "No ID"] + [None] * 5])
+    store.upsert_band_details([[5, "1990", "Oslo", "Darkness", "Lbl"]])
+    store.replace_roster(3, [5])
+    store.close()
+
+    store = Store(path)
+    assert store.count("labels") == 1
+    assert store.existing_label_ids([3, 4]) == {3}
+    assert store.scraped_label_ids([3]) == {3}
+    assert store.db.execute("SELECT themes FROM band_details").fetchall() == [("Darkness",)]
+    store.close()
+
+
+def test_a_failed_write_is_raised_to_the_caller(tmp_path):
+    store = Store(str(tmp_path / "store.db"))
+    store.upsert_labels([[3, "Too few columns"]])
+    with pytest.raises(sqlite3.Error):
+        store.flush()
+    with pytest.raises(sqlite3.Error):
+        store.replace_roster(3, [5])
+    with pytest.raises(sqlite3.Error):
+        store.close()
+
+
+def test_old_stores_are_migrated(tmp_path):
+    path = str(tmp_path / "store.db")
+    db = sqlite3.connect(path)
+    db.executescript(
+        """CREATE TABLE bands (band_id INTEGER PRIMARY KEY, name TEXT, url TEXT, country TEXT,
+               genre TEXT, status TEXT, photo_url TEXT);
+           CREATE TABLE discography (band_id INTEGER NOT NULL, position INTEGER NOT NULL,
+               album_name TEXT, type TEXT, year INTEGER, reviews TEXT,
+               PRIMARY KEY (band_id, position));
+           INSERT INTO bands VALUES (5, 'Abc', 'u', 'Norway', 'Black Metal', 'Active', NULL);"""
+    )
+    db.commit()
+    db.close()
+
+    store = Store(path)
+    assert list(store.iter_bands(("band_id", "letter"))) == [(5, None)]
+    store.replace_discography(5, [ALBUM])
+    store.flush()
+    assert store.db.execute("SELECT album_id, review_count FROM discography").fetchall() == [(7, None)]
+    store.close()
+
+
+def test_export_all_writes_every_table(tmp_path):
+    path = str(tmp_path / "store.db")
+    store = Store(path)
+    store.upsert_bands([[5, "Abc", "u", "Norway", "Black Metal", "Active", None]], "A")
+    store.replace_discography(5, [ALBUM])
+    store.close()
+    export_all(path, str(tmp_path / "out"))
+    with open(tmp_path / "out" / "metal_bands.csv", newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f))[1] == ["5", "Abc", "u", "Norway", "Black Metal", "Active", ""]
+    assert os.path.exists(tmp_path / "out" / "labels_rosters" / "combined_roster.csv")
+    assert os.path.exists(tmp_path / "out" / "labels" / "labels.csv")
+
+
+def test_failed_fetch_keeps_stored_discography(tmp_path, mock_site):
+    mock_site([mock_band(20)])
+    store = Store(str(tmp_path / "store.db"))
+    store.replace_discography(999, [[7, "Old", "Demo", 1990, None, None, 999]])
+    asyncio.run(
+        band_scraper.scrape_discographies([("Ghost", "999"), ("Band 20", "20")], 2, None, store=store)
+    )
+    assert store.db.execute("SELECT album_name FROM discography WHERE band_id = 999").fetchall() == [("Old",)]
+    assert store.count("discography") == 1 + 20 % 13
+    store.close()
+
+
+def test_queue_releases_failed_bands(tmp_path, mock_site):
+    from work_queue import WorkQueue
+
+    mock_site([mock_band(20)])
+    store = Store(str(tmp_path / "store.db"))
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    queue.enqueue("band", [("20", "Band 20"), ("999", "Ghost")])
+    # Five claims of the unknown band fail before the queue gives up on it.
+    asyncio.run(band_scraper.scrape_queue(queue, 2, None, None, store, claim_size=1))
+    assert queue.counts("band") == {"done": 1, "pending": 1}
+    assert store.scraped_band_ids() == {20}
+    queue.close()
+    store.close()
+
+
+def test_rescrape_lists_stored_bands_again(tmp_path, mock_site, monkeypatch):
+    import pandas as pd
+
+    listed = [mock_band(20), mock_band(21)]
+    mock_site(listed)
+    monkeypatch.chdir(tmp_path)
+    store = Store("store.db")
+    store.replace_discography(20, [[7, "Old", "Demo", 1990, None, None, 20]])
+    store.close()
+    pd.DataFrame({"Name": [b["name"] for b in listed], "URL": [b["url"] for b in listed]}).to_csv(
+        "changed_bands.csv", index=False
+    )
+    argv = ["band_scraper.py", "--no-cache", "--store", "store.db", "--bands-file", "changed_bands.csv"]
+
+    monkeypatch.setattr("sys.argv", argv)
+    band_scraper.main()
+    store = Store("store.db")
+    assert store.db.execute("SELECT album_name FROM discography WHERE band_id = 20").fetchall() == [("Old",)]
+    store.close()
+
+    monkeypatch.setattr("sys.argv", argv + ["--rescrape"])
+    band_scraper.main()
+    store = Store("store.db")
+    assert store.count("discography") == 20 % 13 + 21 % 13
+    store.close()
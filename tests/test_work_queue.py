@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+from work_queue import WorkQueue
+
+
+def make_queues(tmp_path, lease_seconds=0.2):
+    path = str(tmp_path / "queue.db")
+    return (
+        WorkQueue(path, lease_seconds=lease_seconds, worker_id="a"),
+        WorkQueue(path, lease_seconds=lease_seconds, worker_id="b"),
+    )
+
+
+def test_leased_units_are_not_claimed_twice(tmp_path):
+    a, b = make_queues(tmp_path, lease_seconds=60)
+    a.enqueue("band", [(1, "One"), (2, "Two")])
+    assert a.claim("band") == [("1", "One")]
+    assert b.claim("band", limit=5) == [("2", "Two")]
+    assert b.claim("band") == []
+
+
+def test_expired_lease_is_claimable_again(tmp_path):
+    a, b = make_queues(tmp_path)
+    a.enqueue("band", [(1, "One")])
+    assert a.claim("band")
+    time.sleep(0.3)
+    assert b.claim("band") == [("1", "One")]
+    # Only the current owner can complete the unit.
+    a.complete("band", ["1"])
+    assert b.counts("band") == {"leased": 1}
+    b.complete("band", ["1"])
+    assert b.counts("band") == {"done": 1}
+    assert b.outstanding("band") == 0
+
+
+def test_units_stop_being_claimed_after_max_attempts(tmp_path):
+    a, _ = make_queues(tmp_path, lease_seconds=0)
+    a.enqueue("band", [(1, None)])
+    for _ in range(2):
+        assert a.claim("band", max_attempts=2)
+    assert a.claim("band", max_attempts=2) == []
+    assert a.outstanding("band", max_attempts=2) == 0
+
+
+def test_release_returns_unit_to_pending(tmp_path):
+    a, b = make_queues(tmp_path, lease_seconds=60)
+    a.enqueue("listing", [("A:0", None)])
+    a.claim("listing")
+    a.release("listing", ["A:0"])
+    assert b.claim("listing") == [("A:0", None)]
+
+
+def test_renewing_keeps_the_lease(tmp_path):
+    a, b = make_queues(tmp_path, lease_seconds=0.3)
+    a.enqueue("band", [(1, None)])
+
+    async def work():
+        keys = [key for key, _ in a.claim("band")]
+        async with a.renewing("band", keys):
+            await asyncio.sleep(0.7)
+            assert b.claim("band") == []
+        await asyncio.sleep(0.4)
+        assert b.claim("band") == [("1", None)]
+
+    asyncio.run(work())
+
+
+def test_rate_share_splits_between_active_workers(tmp_path):
+    a, b = make_queues(tmp_path, lease_seconds=60)
+    a.heartbeat()
+    assert a.rate_share(4) == 4
+    b.heartbeat()
+    assert a.rate_share(4) == 2
+    b.close()
+    assert a.rate_share(4) == 4
+    assert a.rate_share(None) is None
+
+
+def test_reset_queues_done_units_again(tmp_path):
+    a, b = make_queues(tmp_path, lease_seconds=60)
+    a.enqueue("band", [(1, "One"), (2, "Two")])
+    a.complete("band", [key for key, _ in a.claim("band")])
+    assert b.claim("band") == [("2", "Two")]
+    a.enqueue("band", [(1, "One"), (2, "Two")])
+    assert a.counts("band") == {"done": 1, "leased": 1}
+    a.enqueue("band", [(1, "One again"), (2, "Two")], reset=True)
+    # The leased unit stays with its worker.
+    assert a.counts("band") == {"pending": 1, "leased": 1}
+    assert a.claim("band", limit=5) == [("1", "One again")]
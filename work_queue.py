@@ -0,0 +1,201 @@
+"""Lease-based work queue so several scraper processes or hosts can split a crawl.
+
+Units of work (a listing page, a band ID, a label ID) live in a SQLite file
+that every worker opens. A worker claims units under a lease that expires
+after ``lease_seconds``; finished units are marked done, and units whose lease
+ran out (a worker died or hung) become claimable again; a live worker keeps
+its leases with ``renewing`` while it works on them. Workers also
+heartbeat into the queue so each can take an even share of a global request
+budget.
+"""
+
+import asyncio
+import contextlib
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+DEFAULT_QUEUE = "work_queue.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS units_claimable ON units (kind, status, lease_expires);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class WorkQueue:
+    def __init__(self, path=DEFAULT_QUEUE, lease_seconds=300, worker_id=None):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or default_worker_id()
+        self.db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def enqueue(self, kind, units, reset=False):
+        """Add ``(key, payload)`` units; ones already queued are left alone.
+
+        With ``reset``, queued units that are not leased are made pending
+        again with a fresh attempt count, so finished work is redone.
+        """
+        rows = [(kind, str(key), payload) for key, payload in units]
+        self.db.execute("BEGIN IMMEDIATE")
+        if reset:
+            self.db.executemany(
+                """INSERT INTO units (kind, key, payload) VALUES (?, ?, ?)
+                   ON CONFLICT (kind, key) DO UPDATE
+                   SET payload = excluded.payload, status = 'pending', owner = NULL,
+                       lease_expires = NULL, attempts = 0
+                   WHERE status != 'leased'""",
+                rows,
+            )
+        else:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO units (kind, key, payload) VALUES (?, ?, ?)", rows
+            )
+        self.db.execute("COMMIT")
+        return len(rows)
+
+    def claim(self, kind, limit=1, max_attempts=5):
+        """Lease up to ``limit`` pending or expired units; returns ``(key, payload)`` pairs.
+
+        Units already claimed ``max_attempts`` times are left alone, so one
+        that keeps failing cannot stall the crawl.
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        rows = self.db.execute(
+            """SELECT key, payload FROM units
+               WHERE kind = ? AND attempts < ?
+                 AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+               ORDER BY rowid LIMIT ?""",
+            (kind, max_attempts, now, limit),
+        ).fetchall()
+        self.db.executemany(
+            """UPDATE units SET status = 'leased', owner = ?, lease_expires = ?,
+                                attempts = attempts + 1
+               WHERE kind = ? AND key = ?""",
+            [(self.worker_id, now + self.lease_seconds, kind, key) for key, _ in rows],
+        )
+        self.db.execute(
+            "INSERT OR REPLACE INTO workers VALUES (?, ?)", (self.worker_id, now)
+        )
+        self.db.execute("COMMIT")
+        return rows
+
+    def _update_owned(self, sql, params, kind, keys):
+        self.db.execute("BEGIN IMMEDIATE")
+        self.db.executemany(
+            sql + " WHERE kind = ? AND key = ? AND owner = ?",
+            [params + (kind, str(key), self.worker_id) for key in keys],
+        )
+        self.db.execute("COMMIT")
+
+    def complete(self, kind, keys):
+        """Mark units this worker holds as done."""
+        self._update_owned(
+            "UPDATE units SET status = 'done', lease_expires = NULL", (), kind, keys
+        )
+
+    def release(self, kind, keys):
+        """Give units back unfinished so another claim can pick them up."""
+        self._update_owned(
+            "UPDATE units SET status = 'pending', owner = NULL, lease_expires = NULL",
+            (),
+            kind,
+            keys,
+        )
+
+    def renew(self, kind, keys):
+        """Extend the lease on units that are still being worked on."""
+        self._update_owned(
+            "UPDATE units SET lease_expires = ?",
+            (time.time() + self.lease_seconds,),
+            kind,
+            keys,
+        )
+
+    @contextlib.asynccontextmanager
+    async def renewing(self, kind, keys, interval=None):
+        """Renew the lease on ``keys`` every third of a lease while the block runs."""
+        interval = interval or self.lease_seconds / 3
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(interval)
+                self.renew(kind, keys)
+
+        task = asyncio.create_task(heartbeat())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def outstanding(self, kind, max_attempts=5):
+        """Units not done that are leased or may still be claimed.
+
+        A worker that finds nothing to claim should keep polling while this is
+        non-zero: units in flight elsewhere can still fail back to the queue
+        or, for listing pages, queue the next page.
+        """
+        return self.db.execute(
+            """SELECT COUNT(*) FROM units
+               WHERE kind = ? AND status != 'done'
+                 AND (attempts < ? OR (status = 'leased' AND lease_expires >= ?))""",
+            (kind, max_attempts, time.time()),
+        ).fetchone()[0]
+
+    def active_workers(self):
+        """Workers seen within one lease period, this one included."""
+        cutoff = time.time() - self.lease_seconds
+        count = self.db.execute(
+            "SELECT COUNT(*) FROM workers WHERE last_seen >= ?", (cutoff,)
+        ).fetchone()[0]
+        return max(count, 1)
+
+    def heartbeat(self):
+        """Count this worker as active without claiming anything."""
+        self.db.execute(
+            "INSERT OR REPLACE INTO workers VALUES (?, ?)", (self.worker_id, time.time())
+        )
+
+    def rate_share(self, total_rate):
+        """This worker's slice of a request budget shared by all active workers."""
+        if not total_rate:
+            return None
+        return total_rate / self.active_workers()
+
+    def counts(self, kind):
+        return dict(
+            self.db.execute(
+                "SELECT status, COUNT(*) FROM units WHERE kind = ? GROUP BY status",
+                (kind,),
+            ).fetchall()
+        )
+
+    def close(self):
+        self.db.execute(
+            "DELETE FROM workers WHERE worker_id = ?", (self.worker_id,)
+        )
+        self.db.close()